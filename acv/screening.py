@@ -0,0 +1,52 @@
+"""
+Lectura por bloques de registros de pacientes (CSV o NDJSON) para el tamizaje masivo de ACV
+
+El cuerpo del request se copia a un archivo temporal a medida que llega (en memoria
+solo hasta ``SPOOL_MAX_MEMORY`` bytes) y luego se lee en DataFrames de a lo sumo
+``chunk_rows`` filas, de modo que la memoria no depende del tamaño del registro.
+
+No se lee el cuerpo mientras se transmite la respuesta: con servidores ASGI < 2.4,
+StreamingResponse escucha la desconexión del cliente con ``receive()`` y consumiría
+partes del cuerpo.
+"""
+import tempfile
+from typing import AsyncIterator, Dict, Iterator, IO
+
+import pandas as pd
+
+# Bytes del cuerpo que se mantienen en memoria antes de pasar a disco
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+
+async def spool_request_body(stream: AsyncIterator[bytes], max_memory: int = SPOOL_MAX_MEMORY) -> IO[bytes]:
+    """Copia el cuerpo (p.ej. ``request.stream()``) a un archivo temporal y lo retorna al inicio"""
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    async for data in stream:
+        spool.write(data)
+    spool.seek(0)
+    return spool
+
+
+def iter_record_chunks(source: IO[bytes], is_csv: bool, chunk_rows: int, dtypes: Dict[str, type]) -> Iterator[pd.DataFrame]:
+    """
+    Recorre los registros en bloques.
+
+    Args:
+        source: Archivo con el cuerpo del request
+        is_csv: CSV con encabezado (True) o NDJSON, un objeto JSON por línea (False)
+        chunk_rows: Máximo de filas por bloque
+        dtypes: Tipos de las columnas que se leen como texto
+    """
+    if is_csv:
+        try:
+            reader = pd.read_csv(source, dtype=dtypes, keep_default_na=False, na_values=[''], chunksize=chunk_rows)
+        except pd.errors.EmptyDataError:
+            return
+    else:
+        if not source.read(1):
+            return
+        source.seek(0)
+        reader = pd.read_json(source, lines=True, dtype=dtypes, chunksize=chunk_rows)
+
+    with reader:
+        yield from reader
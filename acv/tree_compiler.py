@@ -0,0 +1,267 @@
+"""
+Compilador del pipeline de ACV (ColumnTransformer + DecisionTreeClassifier)
+
+Convierte el pipeline ajustado de ``ACV_decision_tree_model.pkl`` en dos evaluadores
+equivalentes que retornan clase y probabilidades en una sola pasada:
+
+- ``predict_one``: función Python generada (if/else anidados) para un paciente; la
+  imputación, el escalado y el one-hot quedan como constantes y comparaciones de texto.
+- ``predict_batch``: matriz float32 armada con NumPy y recorrido del árbol aplanado
+  para muchos pacientes.
+
+Igual que scikit-learn, los valores numéricos se llevan a float32 antes de compararlos
+con los umbrales (float64). Los faltantes (None o NaN) se imputan en ambos evaluadores.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _as_float32(value) -> float:
+    return float(np.float32(value))
+
+
+class _NumericColumn:
+    """Columna numérica: imputación y escalado opcional"""
+
+    def __init__(self, name: str, fill_value: float, mean: float = 0.0, scale: float = 1.0, scaled: bool = False):
+        self.name = name
+        self.fill_value = float(fill_value)
+        self.mean = float(mean)
+        self.scale = float(scale)
+        self.scaled = scaled
+
+
+class _CategoricalColumn:
+    """Columna categórica: imputación y one-hot (categorías desconocidas -> todo 0)"""
+
+    def __init__(self, name: str, fill_value, categories: Sequence):
+        self.name = name
+        self.fill_value = fill_value
+        self.categories = list(categories)
+
+
+def _unpack_steps(transformer) -> list:
+    return [step for _, step in transformer.steps] if hasattr(transformer, 'steps') else [transformer]
+
+
+def _parse_preprocessor(preprocessor):
+    """Columnas numéricas y categóricas del ColumnTransformer, en el orden de su salida"""
+    if type(preprocessor).__name__ != 'ColumnTransformer':
+        raise TypeError(f"Preprocesador no soportado: {type(preprocessor).__name__}")
+
+    features = []
+    for name, transformer, columns in preprocessor.transformers_:
+        if transformer == 'drop' or name == 'remainder':
+            continue
+        if transformer == 'passthrough':
+            raise TypeError("Columnas 'passthrough' no soportadas")
+
+        steps = _unpack_steps(transformer)
+        kinds = [type(step).__name__ for step in steps]
+        if kinds and kinds[-1] == 'OneHotEncoder':
+            encoder = steps[-1]
+            if getattr(encoder, 'drop_idx_', None) is not None or encoder.handle_unknown != 'ignore':
+                raise TypeError("OneHotEncoder soportado solo sin 'drop' y con handle_unknown='ignore'")
+            imputer = steps[0] if kinds[0] == 'SimpleImputer' else None
+            if set(kinds[:-1]) - {'SimpleImputer'}:
+                raise TypeError(f"Pasos categóricos no soportados: {kinds}")
+            for i, column in enumerate(columns):
+                fill_value = imputer.statistics_[i] if imputer is not None else None
+                for category in encoder.categories_[i]:
+                    features.append((_CategoricalColumn(column, fill_value, encoder.categories_[i]), category))
+        else:
+            if set(kinds) - {'SimpleImputer', 'StandardScaler'}:
+                raise TypeError(f"Pasos numéricos no soportados: {kinds}")
+            imputer = next((step for step in steps if type(step).__name__ == 'SimpleImputer'), None)
+            scaler = next((step for step in steps if type(step).__name__ == 'StandardScaler'), None)
+            if imputer is None:
+                raise TypeError("Las columnas numéricas deben tener SimpleImputer")
+            for i, column in enumerate(columns):
+                features.append((_NumericColumn(
+                    column,
+                    imputer.statistics_[i],
+                    scaler.mean_[i] if scaler is not None and scaler.mean_ is not None else 0.0,
+                    scaler.scale_[i] if scaler is not None and scaler.scale_ is not None else 1.0,
+                    scaled=scaler is not None
+                ), None))
+    return features
+
+
+class CompiledTreePipeline:
+    """Pipeline de ACV compilado: función generada + árbol aplanado"""
+
+    def __init__(self, pipeline):
+        preprocessor, classifier = pipeline.steps[0][1], pipeline.steps[-1][1]
+        if len(pipeline.steps) != 2 or type(classifier).__name__ != 'DecisionTreeClassifier':
+            raise TypeError("Se espera un Pipeline(preprocesador, DecisionTreeClassifier)")
+        if classifier.n_outputs_ != 1:
+            raise TypeError("Solo se soportan clasificadores de una salida")
+
+        self.features = _parse_preprocessor(preprocessor)
+        self.input_columns: List[str] = list(dict.fromkeys(column.name for column, _ in self.features))
+        self.classes = classifier.classes_
+
+        tree = classifier.tree_
+        self.feature = np.maximum(tree.feature, 0).astype(np.int64)
+        self.threshold = tree.threshold.astype(np.float64)
+        leaf = tree.children_left < 0
+        nodes = np.arange(tree.node_count)
+        # Las hojas apuntan a sí mismas: el recorrido por niveles se estabiliza en ellas
+        self.children_left = np.where(leaf, nodes, tree.children_left).astype(np.int64)
+        self.children_right = np.where(leaf, nodes, tree.children_right).astype(np.int64)
+        self.max_depth = int(tree.max_depth)
+
+        # Clase (argmax de value) y probabilidades como predict/predict_proba: desde
+        # scikit-learn 1.4 value ya guarda fracciones; antes guardaba conteos y
+        # predict_proba los normalizaba
+        value = tree.value[:, 0, :len(self.classes)]
+        normalizer = value.sum(axis=1, keepdims=True)
+        if np.allclose(normalizer, 1.0):
+            self.leaf_proba = value.copy()
+        else:
+            normalizer[normalizer == 0.0] = 1.0
+            self.leaf_proba = value / normalizer
+        self.leaf_class = self.classes.take(np.argmax(value, axis=1))
+
+        self.source = self._generate_source(tree)
+        namespace = {'_f32': _as_float32, '_LEAVES': self._leaf_results()}
+        exec(compile(self.source, '<acv_tree_compiler>', 'exec'), namespace)
+        self._evaluate = namespace['evaluate']
+
+    def _leaf_results(self) -> Dict[int, Tuple]:
+        return {
+            int(node): (self.leaf_class[node].item(), tuple(self.leaf_proba[node].tolist()))
+            for node in np.flatnonzero(self.children_left == np.arange(len(self.children_left)))
+        }
+
+    def _generate_source(self, tree) -> str:
+        """Código Python del evaluador: preparación de columnas + if/else del árbol"""
+        params = [f"v{i}" for i in range(len(self.input_columns))]
+        param_of = {column: param for column, param in zip(self.input_columns, params)}
+        lines = [f"def evaluate({', '.join(params)}):"]
+
+        used = set(self.feature[tree.children_left >= 0].tolist())
+        prepared = set()
+        for index in sorted(used):
+            column, _ = self.features[index]
+            param = param_of[column.name]
+            if column.name in prepared:
+                continue
+            prepared.add(column.name)
+            lines.append(f"    if {param} is None or {param} != {param}:")
+            lines.append(f"        {param} = {column.fill_value!r}")
+            if isinstance(column, _NumericColumn):
+                value = f"({param} - {column.mean!r}) / {column.scale!r}" if column.scaled else param
+                lines.append(f"    {param} = _f32({value})")
+
+        def _emit(node: int, depth: int):
+            indent = "    " * depth
+            if tree.children_left[node] < 0:
+                lines.append(f"{indent}return _LEAVES[{node}]")
+                return
+            column, category = self.features[self.feature[node]]
+            threshold = float(self.threshold[node])
+            param = param_of[column.name]
+            if category is None:
+                condition = f"{param} <= {threshold!r}"
+            elif threshold >= 1.0:
+                return _emit(tree.children_left[node], depth)
+            elif threshold < 0.0:
+                return _emit(tree.children_right[node], depth)
+            else:
+                # El indicador one-hot vale 0 (va a la izquierda) si la categoría no coincide
+                condition = f"{param} != {category!r}"
+            lines.append(f"{indent}if {condition}:")
+            _emit(tree.children_left[node], depth + 1)
+            lines.append(f"{indent}else:")
+            _emit(tree.children_right[node], depth + 1)
+
+        _emit(0, 1)
+        return "\n".join(lines) + "\n"
+
+    def predict_one(self, features: dict) -> Tuple[object, Tuple[float, ...]]:
+        """(clase, probabilidades por clase) de un paciente: {columna: valor}"""
+        return self._evaluate(*[features.get(column) for column in self.input_columns])
+
+    def transform(self, frame: pd.DataFrame) -> np.ndarray:
+        """Matriz float32 equivalente a la salida del preprocesador"""
+        n_rows = len(frame)
+        X = np.empty((n_rows, len(self.features)), dtype=np.float32)
+        cache = {}
+        for index, (column, category) in enumerate(self.features):
+            values = cache.get(column.name)
+            if values is None:
+                raw = frame[column.name] if column.name in frame else pd.Series([None] * n_rows, index=frame.index)
+                if isinstance(column, _NumericColumn):
+                    values = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=np.float64)
+                    values = np.where(np.isnan(values), column.fill_value, values)
+                    if column.scaled:
+                        values = (values - column.mean) / column.scale
+                else:
+                    values = raw.astype(object).where(raw.notna(), column.fill_value).to_numpy()
+                cache[column.name] = values
+            X[:, index] = values if category is None else (values == category)
+        return X
+
+    def predict_batch(self, frame: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """(clases, probabilidades (n_filas, n_clases)) de muchos pacientes"""
+        X = self.transform(frame)
+        rows = np.arange(len(X))
+        nodes = np.zeros(len(X), dtype=np.int64)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+        return self.leaf_class[nodes], self.leaf_proba[nodes]
+
+    def fixture_frame(self, n_rows: int = 2000, seed: int = 0) -> pd.DataFrame:
+        """
+        Pacientes sintéticos para verificar el compilador: umbrales del árbol y sus
+        vecinos, categorías conocidas y desconocidas, y faltantes.
+        """
+        rng = np.random.default_rng(seed)
+        columns = {}
+        for column, category in self.features:
+            if column.name in columns:
+                continue
+            if isinstance(column, _NumericColumn):
+                index = next(i for i, (c, _) in enumerate(self.features) if c.name == column.name)
+                thresholds = self.threshold[(self.feature == index) & (self.children_left != np.arange(len(self.feature)))]
+                thresholds = thresholds * column.scale + column.mean if column.scaled else thresholds
+                base = np.concatenate([thresholds, [column.fill_value, 0.0]])
+                values = rng.choice(base, n_rows) + rng.choice([-1.0, -1e-6, 0.0, 1e-6, 1.0], n_rows)
+                values[rng.random(n_rows) < 0.05] = np.nan
+                columns[column.name] = values
+            else:
+                options = np.array(column.categories + ['desconocido', np.nan], dtype=object)
+                columns[column.name] = rng.choice(options, n_rows)
+        return pd.DataFrame(columns)[self.input_columns]
+
+    def verify(self, pipeline, frame: Optional[pd.DataFrame] = None) -> bool:
+        """Compara clase y probabilidades (bit a bit) contra predict/predict_proba del pipeline"""
+        frame = self.fixture_frame() if frame is None else frame
+        expected_class = pipeline.predict(frame)
+        expected_proba = pipeline.predict_proba(frame)
+
+        batch_class, batch_proba = self.predict_batch(frame)
+        if not (np.array_equal(batch_class, expected_class) and np.array_equal(batch_proba, expected_proba)):
+            return False
+
+        for i, record in enumerate(frame.to_dict('records')):
+            predicted, proba = self.predict_one(record)
+            if predicted != expected_class[i] or not np.array_equal(proba, expected_proba[i]):
+                return False
+        return True
+
+
+def compile_pipeline(pipeline) -> Optional[CompiledTreePipeline]:
+    """
+    Compila y verifica el pipeline; retorna None si no es soportado o si no coincide
+    con scikit-learn (se mantiene el pipeline original).
+    """
+    try:
+        compiled = CompiledTreePipeline(pipeline)
+        return compiled if compiled.verify(pipeline) else None
+    except Exception:
+        return None
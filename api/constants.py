@@ -12,11 +12,38 @@ DATA_DIR = BASE_DIR / "data" / "raw"
 # Nombres de archivos CSV
 BITCOIN_CSV_FILENAME = "bitcoin_price_Training.csv"
 FLIGHTS_CSV_FILENAME = "DelayedFlights.csv"
+AVOCADO_CSV_FILENAME = "avocado.csv"
 
 # Rutas completas a los archivos CSV
 CSV_BITCOIN_PATH = DATA_DIR / BITCOIN_CSV_FILENAME
 CSV_FLIGHTS_PATH = DATA_DIR / FLIGHTS_CSV_FILENAME
+CSV_AVOCADO_PATH = DATA_DIR / AVOCADO_CSV_FILENAME
 
 # Directorio de modelos
 MODELS_DIR = BASE_DIR / "models"
-ML_MODELS_PATH = BASE_DIR / "ml_models"
\ No newline at end of file
+ML_MODELS_PATH = BASE_DIR / "ml_models"
+
+# Modelo CatBoost de aguacate: formato nativo (.cbm) y pickle original del notebook
+AVOCADO_MODEL_CBM_PATH = ML_MODELS_PATH / "avocado_model.cbm"
+AVOCADO_MODEL_PKL_PATH = ML_MODELS_PATH / "avocado_model.pkl"
+
+# Datos de MovieLens (movies.csv / ratings.csv)
+MOVIES_CSV_FILENAME = "movies.csv"
+RATINGS_CSV_FILENAME = "ratings.csv"
+CSV_MOVIES_PATH = DATA_DIR / MOVIES_CSV_FILENAME
+CSV_RATINGS_PATH = DATA_DIR / RATINGS_CSV_FILENAME
+
+# Caché columnar (.npy) generada a partir de los CSV de MovieLens
+CACHE_DIR = BASE_DIR / "data" / "cache"
+MOVIELENS_CACHE_DIR = CACHE_DIR / "movielens"
+
+# Índice de rutas (distancia, duración programada, retraso histórico) generado a partir de DelayedFlights.csv
+ROUTE_INDEX_PATH = CACHE_DIR / "flights" / "route_index.npz"
+
+# Log append-only de ratings recibidos en línea por la API de películas
+RATINGS_LOG_PATH = BASE_DIR / "data" / "ratings_log" / "movies_ratings.jsonl"
+
+# Tabla de propiedades de Zillow (comparables del servicio de propiedades) y su índice compacto
+PROPERTIES_CSV_FILENAME = "properties_2016.csv"
+CSV_PROPERTIES_PATH = DATA_DIR / PROPERTIES_CSV_FILENAME
+COMPARABLES_INDEX_PATH = CACHE_DIR / "properties" / "comparables.npz"
@@ -0,0 +1,42 @@
+"""
+Artefactos derivados de archivos de datos (índices, cachés) y su firma de origen
+
+Cada artefacto guarda en sus metadatos la firma del archivo del que se construyó
+(ruta, tamaño y fecha de modificación). Al cargarlo se compara contra el archivo
+actual y, si cambió, se reconstruye.
+"""
+import os
+from typing import Callable, Optional
+
+
+def source_signature(path) -> dict:
+    """Ruta, tamaño y fecha de modificación de un archivo de origen (para detectar cambios)"""
+    stat = os.stat(path)
+    return {"path": str(path), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def is_source_current(recorded: Optional[dict], path) -> bool:
+    """True si la firma guardada coincide en tamaño y fecha con el archivo actual"""
+    if not recorded:
+        return False
+    current = source_signature(path)
+    return recorded.get('size') == current['size'] and recorded.get('mtime') == current['mtime']
+
+
+def load_or_rebuild(artifact_path, source_path, load: Callable, build: Callable, logger, name: str):
+    """
+    Carga un artefacto con ``load(artifact_path)``. Si el archivo de origen existe y no
+    coincide con la firma guardada en ``meta['source']``, lo reconstruye con
+    ``build(source_path)`` y lo guarda en ``artifact_path``.
+
+    Returns:
+        El artefacto, o None si no hay artefacto guardado ni archivo de origen
+    """
+    artifact = load(artifact_path)
+    if os.path.exists(source_path):
+        recorded = artifact.meta.get('source') if artifact is not None else None
+        if not is_source_current(recorded, source_path):
+            logger.info(f"Construyendo {name} desde: {source_path}")
+            artifact = build(source_path)
+            artifact.save(artifact_path)
+    return artifact
@@ -29,6 +29,14 @@ except ImportError as e:
     logger.warning(f"Bitcoin API no disponible: {e}")
     BITCOIN_AVAILABLE = False
 
+try:
+    from .routes.properties_api import app as properties_app, load_properties_model
+    PROPERTIES_AVAILABLE = True
+    logger.info("Properties API importada exitosamente")
+except ImportError as e:
+    logger.warning(f"Properties API no disponible: {e}")
+    PROPERTIES_AVAILABLE = False
+
 try:
     from .routes.movies_api import app as movies_app, load_movies_model_and_data
     MOVIES_AVAILABLE = True
@@ -105,6 +113,9 @@ app.add_middleware(
 if BITCOIN_AVAILABLE:
     app.mount("/bitcoin", bitcoin_app)
 
+if PROPERTIES_AVAILABLE:
+    app.mount("/properties", properties_app)
+
 if MOVIES_AVAILABLE:
     app.mount("/movies", movies_app)
 
@@ -132,6 +143,8 @@ def root():
     available_models = ["coordinator"]
     if BITCOIN_AVAILABLE:
         available_models.append("bitcoin")
+    if PROPERTIES_AVAILABLE:
+        available_models.append("properties")
     if MOVIES_AVAILABLE:
         available_models.append("movies")
     if FLIGHTS_AVAILABLE:
@@ -213,6 +226,23 @@ def health_check():
             }
             logger.error(f"Bitcoin API: unhealthy - {str(e)}")
     
+    # Verificar Properties API si está disponible
+    if PROPERTIES_AVAILABLE:
+        try:
+            properties_model = load_properties_model()
+            services_status["properties"] = {
+                "status": "healthy",
+                "model_type": properties_model['model_info']['type'],
+                "features_count": properties_model['model_info']['features_count'],
+                "description": "Property Price Prediction Model"
+            }
+            logger.info("Properties API: healthy")
+        except Exception as e:
+            services_status["properties"] = {
+                "status": "unhealthy",
+                "error": str(e)
+            }
+            logger.error(f"Properties API: unhealthy - {str(e)}")
     
     # Verificar Movies API si está disponible
     if MOVIES_AVAILABLE:
@@ -339,6 +369,7 @@ def health_check():
         "overall_status": overall_status,
         "services": services_status,
         "bitcoin_available": BITCOIN_AVAILABLE,
+        "properties_available": PROPERTIES_AVAILABLE,
         "movies_available": MOVIES_AVAILABLE,
         "flights_available": FLIGHTS_AVAILABLE,
         "acv_available": ACV_AVAILABLE,
@@ -369,6 +400,18 @@ def list_models():
             "status": "active"
         })
     
+    if PROPERTIES_AVAILABLE:
+        models.append({
+            "name": "properties",
+            "description": "Predicción de precios de propiedades usando Random Forest",
+            "endpoints": [
+                "/properties/models/properties/predict",
+                "/properties/predict/batch"
+            ],
+            "type": "Random Forest",
+            "status": "active"
+        })
+    
     if MOVIES_AVAILABLE:
         models.append({
             "name": "movies",
@@ -446,6 +489,8 @@ if __name__ == "__main__":
     logger.info("   • LLM Coordinator")
     if BITCOIN_AVAILABLE:
         logger.info("Bitcoin Price Prediction (Random Forest)")
+    if PROPERTIES_AVAILABLE:
+        logger.info("Property Price Prediction (Random Forest)")
     if MOVIES_AVAILABLE:
         logger.info("Movies Recommendation System (KNN)")
     if FLIGHTS_AVAILABLE:
@@ -2,7 +2,7 @@
 Modelos de datos para la API de predicción de ACV (Accidente Cerebrovascular)
 """
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 class ACVPredictionRequest(BaseModel):
     """Modelo para las solicitudes de predicción de ACV"""
@@ -36,6 +36,27 @@ class ACVPredictionResponse(BaseModel):
     model_info: Dict[str, Any] = Field(..., description="Información del modelo utilizado")
     recommendations: list = Field(..., description="Recomendaciones basadas en el resultado")
 
+class ACVSensitivityVariable(BaseModel):
+    """Variable que se recorre en el análisis de sensibilidad"""
+    name: str = Field(..., description="Variable: 'age', 'avg_glucose_level', 'bmi', 'hypertension' o 'heart_disease'")
+    start: float = Field(..., description="Valor inicial")
+    stop: float = Field(..., description="Valor final (incluido)")
+    steps: int = Field(50, description="Cantidad de valores entre start y stop (las variables binarias solo toman 0 y 1)", ge=2, le=200)
+
+class ACVSensitivityRequest(ACVPredictionRequest):
+    """Paciente base (mismos campos que ACVPredictionRequest) y una o dos variables a recorrer"""
+    query: str = Field("", description="Consulta del usuario en lenguaje natural")
+    variables: List[ACVSensitivityVariable] = Field(..., description="Una o dos variables con sus rangos")
+
+class ACVSensitivityResponse(BaseModel):
+    """Superficie de riesgo del análisis de sensibilidad"""
+    variables: List[Dict[str, Any]] = Field(..., description="Nombre y valores de cada eje")
+    probabilities: list = Field(..., description="Probabilidad de ACV por punto (lista o matriz [eje 1][eje 2])")
+    risk_levels: list = Field(..., description="Nivel de riesgo por punto, con la misma forma")
+    base: Dict[str, Any] = Field(..., description="Riesgo del paciente base")
+    extremes: Dict[str, Any] = Field(..., description="Puntos de menor y mayor probabilidad")
+    model_info: Dict[str, Any] = Field(..., description="Información del modelo y de la evaluación")
+
 class ACVHealthResponse(BaseModel):
     """Modelo para el estado de salud de la API de ACV"""
     status: str = Field(..., description="Estado del servicio")
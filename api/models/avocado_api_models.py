@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Dict, Optional, Literal
+from typing import Dict, List, Optional, Literal
 from datetime import datetime
 
 class AvocadoPredictionRequest(BaseModel):
@@ -46,6 +46,36 @@ class AvocadoHealthResponse(BaseModel):
     supported_regions: list[str] = Field(..., description="Regiones soportadas")
     supported_types: list[str] = Field(..., description="Tipos de aguacate soportados")
     model_metrics: Optional[Dict] = Field(default=None, description="Métricas del modelo")
+    price_history: Optional[Dict] = Field(default=None, description="Estado del historial de precios por región/tipo")
+
+class AvocadoObservation(BaseModel):
+    """Observación semanal real de una serie (región, tipo)"""
+    
+    date: str = Field(..., description="Fecha de la semana (YYYY-MM-DD)", example="2018-04-01")
+    region: str = Field(..., description="Región geográfica", example="California")
+    type: Literal["conventional", "organic"] = Field(..., description="Tipo de aguacate", example="conventional")
+    average_price: float = Field(..., description="Precio promedio observado", gt=0)
+    total_volume: float = Field(..., description="Volumen total observado", ge=0)
+
+class AvocadoHistoryIngestRequest(BaseModel):
+    """Request para agregar observaciones al historial de precios"""
+    
+    observations: List[AvocadoObservation] = Field(..., description="Observaciones semanales (cualquier orden)")
+
+class AvocadoForecastRequest(BaseModel):
+    """Request para pronóstico recursivo a varias semanas"""
+    
+    regions: Optional[List[str]] = Field(default=None, description="Regiones a pronosticar (todas las que tienen historial si se omite)")
+    types: Optional[List[Literal["conventional", "organic"]]] = Field(default=None, description="Tipos a pronosticar (ambos si se omite)")
+    horizon_weeks: int = Field(default=12, description="Semanas a pronosticar desde la última observación", ge=1, le=104)
+
+class AvocadoForecastResponse(BaseModel):
+    """Response con el pronóstico semanal de cada serie (región, tipo)"""
+    
+    horizon_weeks: int = Field(..., description="Semanas pronosticadas")
+    series: List[Dict] = Field(..., description="Pronóstico por serie: región, tipo, última observación y precios semanales")
+    missing_series: List[Dict] = Field(default_factory=list, description="Series solicitadas sin historial")
+    model_info: Dict = Field(..., description="Información del modelo y de la evaluación")
 
 class AvocadoMarketAnalysisRequest(BaseModel):
     """Request para análisis de mercado de aguacate"""
@@ -54,6 +84,7 @@ class AvocadoMarketAnalysisRequest(BaseModel):
     start_date: str = Field(..., description="Fecha de inicio (YYYY-MM-DD)")
     end_date: str = Field(..., description="Fecha de fin (YYYY-MM-DD)")
     type: Optional[Literal["conventional", "organic"]] = Field(default="conventional", description="Tipo de aguacate")
+    include_all_regions: Optional[bool] = Field(default=False, description="Pronosticar también todas las regiones soportadas")
 
 class AvocadoMarketAnalysisResponse(BaseModel):
     """Response con análisis de mercado de aguacate"""
@@ -63,4 +94,7 @@ class AvocadoMarketAnalysisResponse(BaseModel):
     price_trend: str = Field(..., description="Tendencia del precio (alcista, bajista, estable)")
     seasonal_patterns: Dict = Field(..., description="Patrones estacionales identificados")
     recommendations: list[str] = Field(..., description="Recomendaciones basadas en el análisis")
-    forecast_next_month: float = Field(..., description="Pronóstico del precio para el próximo mes")
\ No newline at end of file
+    forecast_next_month: float = Field(..., description="Pronóstico del precio para el próximo mes")
+    weekly_forecast: Optional[List[Dict]] = Field(default=None, description="Pronóstico semanal de la región analizada")
+    regions: Optional[Dict[str, Dict]] = Field(default=None, description="Resumen por región (si include_all_regions)")
+    model_info: Optional[Dict] = Field(default=None, description="Información del modelo y de la evaluación (price_features: base de los lags de precio)")
\ No newline at end of file
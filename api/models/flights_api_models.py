@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 class FlightPredictionRequest(BaseModel):
     query: str
@@ -18,4 +18,23 @@ class FlightPredictionResponse(BaseModel):
     confidence: float
     flight_info: Dict
     model_info: Dict
-    interpretation: str
\ No newline at end of file
+    interpretation: str
+
+class FlightDepartureSweepRequest(BaseModel):
+    origin: str                                   # "DEN"
+    destination: str                              # "LAS"
+    airline: Optional[str] = None                 # "WN"
+    date: Optional[str] = None                    # "2025-10-25" (centro del barrido)
+    days_around: int = 3                          # días antes y después de la fecha
+    slot_minutes: int = 15                        # separación entre horarios de salida
+    earliest_departure: Optional[str] = None      # "06:00"
+    latest_departure: Optional[str] = None        # "22:00"
+    distance: Optional[float] = None              # 628
+
+class FlightDepartureSweepResponse(BaseModel):
+    route: str
+    airline: str
+    departure_times: List[str]
+    days: List[Dict]
+    best: Dict
+    model_info: Dict
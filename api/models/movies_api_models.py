@@ -20,6 +20,18 @@ class MovieRatingRequest(BaseModel):
     user_id: int
     movie_id: int
 
+class MovieRatingBatchRequest(BaseModel):
+    user_ids: List[int]
+    movie_ids: List[int]
+    # Pares por bloque en la respuesta NDJSON
+    chunk_size: Optional[int] = 10000
+
+class MovieRatingIngestRequest(BaseModel):
+    user_id: int
+    movie_id: int
+    rating: float
+    timestamp: Optional[int] = None
+
 class MovieRatingResponse(BaseModel):
     predicted_rating: float
     confidence: float
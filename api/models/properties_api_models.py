@@ -1,8 +1,7 @@
-from pydantic import BaseModel
-from typing import Dict, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 
-class PropertyPredictionRequest(BaseModel):
-    query: str
+class PropertyFeatures(BaseModel):
     # Características de la propiedad
     bathroomcnt: Optional[float] = None
     bedroomcnt: Optional[float] = None
@@ -17,8 +16,40 @@ class PropertyPredictionRequest(BaseModel):
     structuretaxvaluedollarcnt: Optional[float] = None
     censustractandblock: Optional[float] = None
 
+class PropertyPredictionRequest(PropertyFeatures):
+    query: str
+    # Propiedades comparables cercanas a incluir en la respuesta (0: ninguna)
+    comparables: int = Field(default=5, ge=0, le=50)
+
+class PropertyComparable(BaseModel):
+    parcel_id: int
+    latitude: float
+    longitude: float
+    distance_km: float
+    price: float
+    sqft: Optional[float] = None
+    bedrooms: Optional[float] = None
+    bathrooms: Optional[float] = None
+    year_built: Optional[int] = None
+
 class PropertyPredictionResponse(BaseModel):
     prediction: float
     confidence: float
     model_info: Dict
-    interpretation: str
\ No newline at end of file
+    interpretation: str
+    comparables: Optional[List[PropertyComparable]] = None
+
+class PropertyBatchPredictionRequest(BaseModel):
+    properties: List[PropertyFeatures] = Field(..., min_length=1, max_length=50000)
+
+class PropertyBatchPrediction(BaseModel):
+    index: int
+    prediction: Optional[float] = None
+    confidence: Optional[float] = None
+    error: Optional[str] = None
+
+class PropertyBatchPredictionResponse(BaseModel):
+    predictions: List[PropertyBatchPrediction]
+    total: int
+    failed: int
+    model_info: Dict
@@ -1,13 +1,19 @@
 """
 API de Predicción de ACV (Accidente Cerebrovascular) usando Árbol de Decisión
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import pickle
 import pandas as pd
 import numpy as np
 import os
 import time
-from ..models.acv_api_models import ACVPredictionRequest, ACVPredictionResponse
+from typing import Optional
+from ..models.acv_api_models import (ACVPredictionRequest, ACVPredictionResponse,
+                                     ACVSensitivityRequest, ACVSensitivityResponse)
+from acv.tree_compiler import compile_pipeline
+from acv.screening import iter_record_chunks, spool_request_body
 
 # Importar constantes y logger
 from .. import constants as const
@@ -21,6 +27,38 @@ logger = get_api_logger("acv_api", console_output=False)
 # Variable global para el modelo
 _loaded_model_data = None
 
+# Valores por defecto de cada característica (población general), con los nombres del modelo
+ACV_DEFAULTS = {
+    'gender': 'Female',  # Más común en el dataset
+    'age': 45.0,  # Edad promedio adulta
+    'hypertension': 0,
+    'heart_disease': 0,
+    'ever_married': 'Yes',  # Más común
+    'work_type': 'Private',  # Más común
+    'Residence_type': 'Urban',  # Ligeramente más común
+    'avg_glucose_level': 106.0,  # Normal
+    'bmi': 28.9,  # Promedio del dataset
+    'smoking_status': 'never smoked'  # Más común
+}
+
+# Columnas donde solo la ausencia (no el 0) usa el valor por defecto
+ACV_NONE_ONLY_DEFAULTS = ('hypertension', 'heart_disease')
+
+# Tamizaje masivo: columnas de entrada (campos de ACVPredictionRequest), rangos válidos,
+# columnas de identificación que se copian a la salida y filas por bloque
+SCREENING_NUMERIC_RANGES = {
+    'age': (0, 120), 'hypertension': (0, 1), 'heart_disease': (0, 1),
+    'avg_glucose_level': (0, None), 'bmi': (10, 100)
+}
+SCREENING_TEXT_COLUMNS = ['gender', 'ever_married', 'work_type', 'residence_type', 'smoking_status']
+SCREENING_ID_COLUMNS = ['patient_id', 'id']
+SCREENING_CHUNK_ROWS = 50000
+
+# Análisis de sensibilidad: variables que se pueden recorrer (mismos rangos que el tamizaje);
+# las binarias solo toman 0 y 1, así que su eje se redondea a esos valores
+SENSITIVITY_VARIABLES = SCREENING_NUMERIC_RANGES
+SENSITIVITY_BINARY_VARIABLES = ('hypertension', 'heart_disease')
+
 def load_acv_model():
     """Carga el modelo de Árbol de Decisión para predicción de ACV"""
     global _loaded_model_data
@@ -41,8 +79,16 @@ def load_acv_model():
             'work_type', 'Residence_type', 'avg_glucose_level', 'bmi', 'smoking_status', 'stroke'
         ]
         
+        # Pipeline compilado (función generada), verificado contra scikit-learn
+        compiled = compile_pipeline(modelo)
+        if compiled is not None:
+            logger.info("Pipeline ACV compilado y verificado contra scikit-learn")
+        else:
+            logger.warning("No se pudo compilar el pipeline ACV; se usa predict/predict_proba de scikit-learn")
+        
         _loaded_model_data = {
             'model': modelo,
+            'compiled': compiled,
             'expected_features': expected_features,
             'model_info': {
                 'type': 'Decision Tree Pipeline',
@@ -67,18 +113,18 @@ def create_features_from_acv_data(request: ACVPredictionRequest):
     Crea las características para el modelo desde el request.
     Usa valores por defecto médicamente razonables si no se proporcionan.
     """
-    # Valores por defecto basados en la población general
+    # Valores por defecto basados en la población general (ver ACV_DEFAULTS)
     features_dict = {
-        'gender': request.gender if request.gender else 'Female',  # Más común en el dataset
-        'age': request.age if request.age else 45.0,  # Edad promedio adulta
-        'hypertension': request.hypertension if request.hypertension is not None else 0,
-        'heart_disease': request.heart_disease if request.heart_disease is not None else 0,
-        'ever_married': request.ever_married if request.ever_married else 'Yes',  # Más común
-        'work_type': request.work_type if request.work_type else 'Private',  # Más común
-        'Residence_type': request.residence_type if request.residence_type else 'Urban',  # Ligeramente más común
-        'avg_glucose_level': request.avg_glucose_level if request.avg_glucose_level else 106.0,  # Normal
-        'bmi': request.bmi if request.bmi else 28.9,  # Promedio del dataset
-        'smoking_status': request.smoking_status if request.smoking_status else 'never smoked'  # Más común
+        'gender': request.gender if request.gender else ACV_DEFAULTS['gender'],
+        'age': request.age if request.age else ACV_DEFAULTS['age'],
+        'hypertension': request.hypertension if request.hypertension is not None else ACV_DEFAULTS['hypertension'],
+        'heart_disease': request.heart_disease if request.heart_disease is not None else ACV_DEFAULTS['heart_disease'],
+        'ever_married': request.ever_married if request.ever_married else ACV_DEFAULTS['ever_married'],
+        'work_type': request.work_type if request.work_type else ACV_DEFAULTS['work_type'],
+        'Residence_type': request.residence_type if request.residence_type else ACV_DEFAULTS['Residence_type'],
+        'avg_glucose_level': request.avg_glucose_level if request.avg_glucose_level else ACV_DEFAULTS['avg_glucose_level'],
+        'bmi': request.bmi if request.bmi else ACV_DEFAULTS['bmi'],
+        'smoking_status': request.smoking_status if request.smoking_status else ACV_DEFAULTS['smoking_status']
     }
     
     print(f"🔍 Features de ACV creadas: {features_dict}")
@@ -93,6 +139,114 @@ def calculate_risk_level(probability):
     else:
         return "Alto"
 
+def calculate_risk_levels(probabilities: np.ndarray) -> np.ndarray:
+    """Versión vectorizada de calculate_risk_level"""
+    return np.select([probabilities < 0.3, probabilities < 0.7], ["Bajo", "Moderado"], default="Alto")
+
+def fill_acv_defaults_batch(patients: pd.DataFrame):
+    """
+    Versión vectorizada de create_features_from_acv_data para un bloque de pacientes.
+    
+    Valida los rangos de ACVPredictionRequest (las filas inválidas quedan con error)
+    y completa los faltantes con ACV_DEFAULTS con el mismo criterio del endpoint individual.
+    
+    Returns:
+        (DataFrame con las columnas del modelo, errores por fila o None)
+    """
+    patients = patients.rename(columns={'Residence_type': 'residence_type'})
+    errors = pd.Series([None] * len(patients), index=patients.index, dtype=object)
+    features = {}
+    
+    for column, (low, high) in SCREENING_NUMERIC_RANGES.items():
+        raw = patients[column] if column in patients else pd.Series(np.nan, index=patients.index)
+        values = pd.to_numeric(raw, errors='coerce')
+        invalid = raw.notna() & values.isna()
+        out_of_range = (values < low) if high is None else ~values.between(low, high)
+        if column in ACV_NONE_ONLY_DEFAULTS:
+            out_of_range |= values.notna() & (values % 1 != 0)
+        errors[(invalid | (values.notna() & out_of_range)) & errors.isna()] = f"{column} inválido"
+        
+        if column in ACV_NONE_ONLY_DEFAULTS:
+            features[column] = values.fillna(ACV_DEFAULTS[column])
+        else:
+            features[column] = values.where(values.notna() & (values != 0), ACV_DEFAULTS[column])
+    
+    for column in SCREENING_TEXT_COLUMNS:
+        model_column = 'Residence_type' if column == 'residence_type' else column
+        raw = patients[column] if column in patients else pd.Series(None, index=patients.index, dtype=object)
+        values = raw.astype(object)
+        features[model_column] = values.where(values.notna() & (values != ''), ACV_DEFAULTS[model_column])
+    
+    features = pd.DataFrame(features, index=patients.index)[list(ACV_DEFAULTS)]
+    return features, errors.to_numpy()
+
+def evaluate_acv_features(model_data, features: pd.DataFrame):
+    """
+    Clase y probabilidad de ACV de muchas filas (columnas del modelo) en una sola llamada:
+    evaluador compilado o, si no está disponible, el pipeline de scikit-learn.
+    """
+    compiled = model_data.get('compiled')
+    if compiled is not None:
+        classes, proba = compiled.predict_batch(features)
+    else:
+        input_df = features.assign(stroke=0)[model_data['expected_features']]
+        classes, proba = model_data['model'].predict(input_df), model_data['model'].predict_proba(input_df)
+    return classes, (proba[:, 1] if proba.shape[1] > 1 else np.zeros(len(features)))
+
+def screen_patients(model_data, patients: pd.DataFrame, offset: int = 0) -> pd.DataFrame:
+    """
+    Riesgo de ACV de un bloque de pacientes con una sola llamada al modelo.
+    
+    Returns:
+        DataFrame con row (posición en el archivo), columnas de identificación si vienen,
+        prediction, probability, risk_level y error
+    """
+    features, errors = fill_acv_defaults_batch(patients)
+    valid = pd.isna(errors)
+    n_rows = len(patients)
+    
+    predictions = np.zeros(n_rows, dtype=np.int64)
+    probabilities = np.full(n_rows, np.nan)
+    if valid.any():
+        predictions[valid], probabilities[valid] = evaluate_acv_features(model_data, features[valid])
+    
+    result = pd.DataFrame({'row': np.arange(offset, offset + n_rows)})
+    for column in SCREENING_ID_COLUMNS:
+        if column in patients:
+            result[column] = patients[column].to_numpy()
+    result['prediction'] = pd.array(predictions, dtype='Int64')
+    result.loc[~valid, 'prediction'] = pd.NA
+    result['probability'] = probabilities
+    result['risk_level'] = np.where(valid, calculate_risk_levels(probabilities), None)
+    result['error'] = errors
+    return result
+
+def sensitivity_axis(variable) -> np.ndarray:
+    """Valores de un eje: ``steps`` valores equiespaciados o, si la variable es binaria, 0 y/o 1"""
+    values = np.linspace(variable.start, variable.stop, variable.steps)
+    if variable.name not in SENSITIVITY_BINARY_VARIABLES:
+        return values
+    values = np.rint(values)
+    return values[np.r_[True, values[1:] != values[:-1]]]
+
+def build_sensitivity_grid(base_features: dict, variables) -> tuple:
+    """
+    Grilla del análisis de sensibilidad: el paciente base repetido con las variables
+    recorridas (producto cartesiano, la primera variable es el eje externo).
+    
+    Returns:
+        (DataFrame con las columnas del modelo, valores de cada eje)
+    """
+    axes = [sensitivity_axis(variable) for variable in variables]
+    mesh = np.meshgrid(*axes, indexing='ij')
+    n_points = mesh[0].size
+    
+    grid = pd.DataFrame({column: np.full(n_points, value, dtype=object if isinstance(value, str) else None)
+                         for column, value in base_features.items()})
+    for variable, values in zip(variables, mesh):
+        grid[variable.name] = values.ravel()
+    return grid[list(ACV_DEFAULTS)], axes
+
 def get_recommendations(prediction, probability, features_dict):
     """Genera recomendaciones basadas en la predicción y características del paciente"""
     recommendations = []
@@ -157,17 +311,19 @@ def predict_acv_risk(request: ACVPredictionRequest):
         # Crear características de entrada
         features_dict = create_features_from_acv_data(request)
         
-        # Convertir a DataFrame con las columnas en el orden correcto
-        # Agregar 'stroke' con valor dummy (0) ya que el modelo lo espera pero no lo usa
-        features_dict['stroke'] = 0  # Valor dummy, no afecta la predicción
-        input_df = pd.DataFrame([features_dict])[expected_features]
-        
-        logger.info(f"Input DataFrame preparado con shape: {input_df.shape}")
-        logger.debug(f"Características de entrada: {input_df.iloc[0].to_dict()}")
-        
-        # Hacer predicción
-        prediction = modelo.predict(input_df)[0]
-        probabilities = modelo.predict_proba(input_df)[0]
+        compiled = model_data.get('compiled')
+        if compiled is not None:
+            # Clase y probabilidades en una sola pasada del evaluador compilado
+            prediction, probabilities = compiled.predict_one(features_dict)
+        else:
+            # Convertir a DataFrame con las columnas en el orden correcto
+            # Agregar 'stroke' con valor dummy (0) ya que el modelo lo espera pero no lo usa
+            input_df = pd.DataFrame([{**features_dict, 'stroke': 0}])[expected_features]
+            logger.debug(f"Características de entrada: {input_df.iloc[0].to_dict()}")
+            
+            # Hacer predicción
+            prediction = modelo.predict(input_df)[0]
+            probabilities = modelo.predict_proba(input_df)[0]
         
         # La probabilidad de ACV es la probabilidad de la clase 1
         acv_probability = probabilities[1] if len(probabilities) > 1 else 0.0
@@ -219,6 +375,134 @@ def predict_acv_risk(request: ACVPredictionRequest):
         logger.error(f"Traceback completo: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error en predicción: {str(e)}")
 
+@app.post("/sensitivity", response_model=ACVSensitivityResponse)
+def acv_sensitivity(request: ACVSensitivityRequest):
+    """
+    Curvas/superficies "qué pasaría si": cómo cambia el riesgo de ACV del paciente base
+    al recorrer una o dos variables, evaluando toda la grilla en una sola llamada al modelo.
+    """
+    start_time = time.time()
+    names = [variable.name for variable in request.variables]
+    logger.info(f"Análisis de sensibilidad ACV solicitado: {names}")
+    
+    if not 1 <= len(request.variables) <= 2:
+        raise HTTPException(status_code=400, detail="Se requieren una o dos variables")
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=400, detail="Las variables no pueden repetirse")
+    for variable in request.variables:
+        if variable.name not in SENSITIVITY_VARIABLES:
+            raise HTTPException(status_code=400, detail=f"Variable no soportada: {variable.name}. Opciones: {list(SENSITIVITY_VARIABLES)}")
+        low, high = SENSITIVITY_VARIABLES[variable.name]
+        if min(variable.start, variable.stop) < low or (high is not None and max(variable.start, variable.stop) > high):
+            raise HTTPException(status_code=400, detail=f"Rango fuera de los límites para {variable.name}: [{low}, {high}]")
+    
+    model_data = load_acv_model()
+    if model_data is None:
+        raise HTTPException(status_code=503, detail="El modelo ACV no está disponible")
+    
+    try:
+        base_features = create_features_from_acv_data(request)
+        grid, axes = build_sensitivity_grid(base_features, request.variables)
+        _, probabilities = evaluate_acv_features(model_data, pd.concat([pd.DataFrame([base_features]), grid], ignore_index=True))
+    except Exception as e:
+        logger.error(f"Error en análisis de sensibilidad ACV: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error en análisis de sensibilidad: {str(e)}")
+    
+    base_probability, probabilities = float(probabilities[0]), probabilities[1:]
+    surface = probabilities.reshape([len(axis) for axis in axes])
+    risk_levels = calculate_risk_levels(surface)
+    
+    def _point(flat_index):
+        index = np.unravel_index(flat_index, surface.shape)
+        return {
+            **{name: float(axis[i]) for name, axis, i in zip(names, axes, index)},
+            'probability': float(surface[index]),
+            'risk_level': str(risk_levels[index])
+        }
+    
+    execution_time = time.time() - start_time
+    log_prediction(logger, endpoint="/acv/sensitivity", input_payload={"variables": names, "points": int(surface.size)},
+                   output_summary={"base_probability": round(base_probability, 4)})
+    logger.info(f"Análisis de sensibilidad ACV completado en {execution_time * 1000:.1f} ms: {surface.size} puntos")
+    
+    return ACVSensitivityResponse(
+        variables=[{'name': name, 'values': axis.tolist()} for name, axis in zip(names, axes)],
+        probabilities=surface.tolist(),
+        risk_levels=risk_levels.tolist(),
+        base={'features': base_features, 'probability': base_probability, 'risk_level': calculate_risk_level(base_probability)},
+        extremes={'min': _point(surface.argmin()), 'max': _point(surface.argmax())},
+        model_info={
+            **model_data['model_info'],
+            'points': int(surface.size),
+            'compiled': model_data.get('compiled') is not None,
+            'execution_time_ms': round(execution_time * 1000, 2)
+        }
+    )
+
+@app.post("/screen")
+async def screen_acv_population(request: Request, format: Optional[str] = None):
+    """
+    Tamizaje masivo: riesgo de ACV para un registro completo de pacientes.
+    
+    Entrada: CSV (Content-Type: text/csv) o NDJSON con los campos de ACVPredictionRequest
+    (age, gender, hypertension, heart_disease, ever_married, work_type, residence_type,
+    smoking_status, avg_glucose_level, bmi) y opcionalmente patient_id / id.
+    El registro se procesa y se responde por bloques de SCREENING_CHUNK_ROWS filas (memoria acotada).
+    Salida: mismo formato de entrada (o ?format=csv|ndjson) con row, prediction,
+    probability, risk_level y error por paciente.
+    """
+    start_time = time.time()
+    content_type = request.headers.get('content-type', '')
+    is_csv = 'csv' in content_type
+    output_format = (format or ('csv' if is_csv else 'ndjson')).lower()
+    if output_format not in ('csv', 'ndjson'):
+        raise HTTPException(status_code=400, detail="format debe ser 'csv' o 'ndjson'")
+    
+    model_data = await run_in_threadpool(load_acv_model)
+    if model_data is None:
+        raise HTTPException(status_code=503, detail="El modelo ACV no está disponible")
+    
+    source = await spool_request_body(request.stream())
+    text_dtypes = {column: str for column in SCREENING_TEXT_COLUMNS + SCREENING_ID_COLUMNS}
+    chunks = iter_record_chunks(source, is_csv, SCREENING_CHUNK_ROWS, text_dtypes)
+    
+    # El primer bloque se lee antes de responder para poder rechazar un cuerpo inválido con 400
+    try:
+        first_chunk = await run_in_threadpool(next, chunks, None)
+    except Exception as e:
+        source.close()
+        logger.warning(f"Cuerpo inválido en tamizaje ACV: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"No se pudo leer el registro de pacientes: {str(e)}")
+    
+    logger.info(f"Tamizaje ACV iniciado ({'csv' if is_csv else 'ndjson'} -> {output_format})")
+    
+    def _results():
+        patients, offset, failed, high_risk = first_chunk, 0, 0, 0
+        try:
+            while patients is not None:
+                result = screen_patients(model_data, patients, offset)
+                if output_format == 'csv':
+                    yield result.to_csv(index=False, header=(offset == 0))
+                else:
+                    yield result.to_json(orient='records', lines=True, double_precision=15, force_ascii=False).rstrip("\n") + "\n"
+                offset += len(result)
+                failed += int(result['error'].notna().sum())
+                high_risk += int((result['risk_level'] == "Alto").sum())
+                patients = next(chunks, None)
+        except Exception as e:
+            logger.error(f"Tamizaje ACV interrumpido después de {offset} pacientes: {str(e)}")
+            raise
+        finally:
+            source.close()
+        
+        log_prediction(logger, endpoint="/acv/screen", input_payload={"patients": offset},
+                       output_summary={"failed": failed, "high_risk": high_risk})
+        logger.info(f"Tamizaje ACV completado en {time.time() - start_time:.3f}s: {offset} pacientes, "
+                    f"{high_risk} con riesgo alto, {failed} con error")
+    
+    media_type = "text/csv" if output_format == 'csv' else "application/x-ndjson"
+    return StreamingResponse(_results(), media_type=media_type)
+
 @app.get("/health")
 def health():
     logger.info("Health check solicitado para ACV API")
@@ -231,7 +515,8 @@ def health():
             "model_type": model_data['model_info']['type'],
             "features_count": model_data['model_info']['features_count'],
             "preprocessing": model_data['model_info']['preprocessing'],
-            "accuracy": model_data['model_info']['accuracy']
+            "accuracy": model_data['model_info']['accuracy'],
+            "compiled": model_data.get('compiled') is not None
         }
     except Exception as e:
         logger.error(f"Health check ACV falló: {str(e)}")
@@ -2,12 +2,11 @@
 API de Predicción de Precios de Aguacate usando CatBoost
 """
 from fastapi import FastAPI, HTTPException
-import pickle
 import pandas as pd
 import numpy as np
 import os
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import warnings
 import time
 warnings.filterwarnings('ignore')
@@ -17,12 +16,18 @@ from ..models.avocado_api_models import (
     AvocadoPredictionResponse,
     AvocadoHealthResponse,
     AvocadoMarketAnalysisRequest,
-    AvocadoMarketAnalysisResponse
+    AvocadoMarketAnalysisResponse,
+    AvocadoHistoryIngestRequest,
+    AvocadoForecastRequest,
+    AvocadoForecastResponse
 )
 
 # Importar constantes y logger
 from .. import constants as const
 from ..config_logger import get_api_logger, log_model_loading, log_prediction
+from avocado.price_history import PriceHistoryStore, load_price_history
+from avocado.forecaster import RecursiveForecaster, calendar_features
+from avocado.catboost_model import CatBoostPredictor, load_catboost_model
 
 app = FastAPI(title="Avocado Price Prediction API", version="1.0.0")
 
@@ -32,17 +37,38 @@ logger = get_api_logger("avocado_api", console_output=False)
 # Variable global para el modelo
 _loaded_model_data = None
 
+# Hilos de CatBoost para lotes grandes (-1: todos los núcleos); los lotes de menos de
+# CATBOOST_PARALLEL_MIN_ROWS filas (p.ej. /predict) se predicen con un solo hilo
+CATBOOST_THREAD_COUNT = -1
+CATBOOST_PARALLEL_MIN_ROWS = 256
+
+# Análisis de mercado: semanas máximas del período y semanas del pronóstico del próximo mes
+MARKET_ANALYSIS_MAX_WEEKS = 156
+FORECAST_NEXT_MONTH_WEEKS = 4
+# Cambio relativo del precio en el período a partir del cual la tendencia no es estable
+TREND_THRESHOLD = 0.03
+
+# Estación de cada mes (índice 0 = enero)
+MONTH_SEASONS = np.array(["invierno", "invierno", "primavera", "primavera", "primavera", "verano",
+                          "verano", "verano", "otoño", "otoño", "otoño", "invierno"])
+
+# Historial de precios por (región, tipo) cargado desde avocado.csv
+_price_history = None
+_price_history_loaded = False
+
 def load_avocado_model():
     """Carga el modelo CatBoost para predicción de precios de aguacate"""
     global _loaded_model_data
     if _loaded_model_data is not None:
         return _loaded_model_data
     
+    model_path = const.AVOCADO_MODEL_CBM_PATH
     try:
-        model_path = os.path.join(const.BASE_DIR, 'ml_models', 'avocado_model.pkl')
-        
-        with open(model_path, 'rb') as f:
-            modelo = pickle.load(f)
+        # Formato nativo .cbm (python avocado/catboost_model.py lo genera desde el pickle)
+        modelo, model_format = load_catboost_model(const.AVOCADO_MODEL_CBM_PATH, const.AVOCADO_MODEL_PKL_PATH)
+        if model_format == 'pickle':
+            model_path = const.AVOCADO_MODEL_PKL_PATH
+            logger.warning("No se encontró avocado_model.cbm; se usa el pickle")
         
         # Características que espera el modelo según el notebook
         feature_cols = [
@@ -74,8 +100,12 @@ def load_avocado_model():
         
         supported_types = ["conventional", "organic"]
         
-        _loaded_model_data = {
+        predictor = CatBoostPredictor(modelo, feature_cols, thread_count=CATBOOST_THREAD_COUNT,
+                                      parallel_min_rows=CATBOOST_PARALLEL_MIN_ROWS)
+        
+        model_data = {
             'model': modelo,
+            'predictor': predictor,
             'feature_cols': feature_cols,
             'cat_features': cat_features,
             'supported_regions': supported_regions,
@@ -88,19 +118,86 @@ def load_avocado_model():
                     'rmse': 0.25,
                     'mape': 10.5
                 },
-                'preprocessing': 'Feature Engineering + Temporal Lags + Rolling Means'
+                'preprocessing': 'Feature Engineering + Temporal Lags + Rolling Means',
+                'format': model_format
             }
         }
         
-        log_model_loading(logger, "Avocado CatBoost", model_path, True)
-
+        # Verificar los Pool contra el DataFrame y calentar el evaluador antes del primer request
+        _loaded_model_data = model_data
+        load_price_history_data()
+        if not predictor.verify():
+            logger.warning("Los Pool preparados no coinciden con model.predict; se usa DataFrame")
+        predictor.warm_up(create_features_from_avocado_data(AvocadoPredictionRequest(
+            date=datetime.now().strftime("%Y-%m-%d"), region=supported_regions[0], type=supported_types[0])))
+        model_data['model_info']['prepared_pool'] = predictor.use_pool
+        
+        log_model_loading(logger, "Avocado CatBoost", str(model_path), True)
         
         return _loaded_model_data
         
     except Exception as e:
-        log_model_loading(logger, "Avocado CatBoost", model_path, False, str(e))
+        _loaded_model_data = None
+        log_model_loading(logger, "Avocado CatBoost", str(model_path), False, str(e))
         raise HTTPException(status_code=500, detail=f"Error cargando modelo: {str(e)}")
 
+def load_price_history_data() -> PriceHistoryStore:
+    """
+    Carga el historial de precios desde avocado.csv (una vez). Sin el CSV el historial
+    queda vacío y se llena con /history; las series sin historia usan valores por defecto.
+    """
+    global _price_history, _price_history_loaded
+    
+    if _price_history_loaded:
+        return _price_history
+    
+    csv_path = const.CSV_AVOCADO_PATH
+    try:
+        if os.path.exists(csv_path):
+            _price_history = load_price_history(csv_path)
+            logger.info(f"Historial de precios cargado: {len(_price_history)} series, {_price_history.observations} semanas")
+        else:
+            _price_history = PriceHistoryStore()
+            logger.warning(f"No se encontró {csv_path}; historial de precios vacío")
+    except Exception as e:
+        logger.error(f"Error cargando historial de precios: {str(e)}")
+        _price_history = PriceHistoryStore()
+    
+    _price_history_loaded = True
+    return _price_history
+
+def get_history_features(region: str, avocado_type: str) -> Optional[Dict[str, float]]:
+    """Lags y medias móviles reales de la serie (None si no tiene historia)"""
+    history = load_price_history_data()
+    return history.series_features(region, avocado_type)
+
+def default_price_features(avocado_type: str, month) -> Dict[str, Any]:
+    """
+    Lags y medias móviles de precio por defecto (promedios típicos con factor estacional)
+    para series sin historia; ``month`` puede ser un número o un arreglo de meses.
+    """
+    base_price = 1.5 if avocado_type == "conventional" else 1.8
+    seasonal_factor = np.where(np.isin(month, [6, 7, 8]), 1.1, 0.95)  # Verano más caro
+    
+    avg_price = base_price * seasonal_factor
+    return {
+        'AveragePrice_lag_1': avg_price,
+        'AveragePrice_lag_4': avg_price * 0.98,
+        'AveragePrice_lag_12': avg_price * 1.02,
+        'AveragePrice_lag_52': avg_price * 0.95,
+        'AveragePrice_roll_mean_4': avg_price,
+        'AveragePrice_roll_mean_12': avg_price * 1.01,
+        'AveragePrice_roll_mean_52': avg_price * 0.97
+    }
+
+def default_volume_features(total_volume) -> Dict[str, Any]:
+    """Lags de volumen por defecto a partir del volumen total"""
+    return {
+        'TotalVolume_lag_1': total_volume * 0.95,
+        'TotalVolume_lag_4': total_volume * 1.05,
+        'TotalVolume_lag_12': total_volume * 0.90
+    }
+
 def create_features_from_avocado_data(request: AvocadoPredictionRequest) -> pd.DataFrame:
     """
     Convierte los datos del request en features para el modelo
@@ -141,7 +238,8 @@ def create_features_from_avocado_data(request: AvocadoPredictionRequest) -> pd.D
         data['log1p_4770'] = np.log1p(request.plu_4770)
         data['log1p_Total_Bags'] = np.log1p(request.total_bags)
         
-        # Lags de precio (usar valores por defecto si no se proporcionan)
+        # Lags de precio: precios enviados por el cliente, historial de la serie o valores por defecto
+        history_features = get_history_features(request.region, request.type)
         if request.historical_prices and len(request.historical_prices) >= 52:
             # Si se proporcionan precios históricos, usar los valores reales
             prices = request.historical_prices
@@ -167,22 +265,19 @@ def create_features_from_avocado_data(request: AvocadoPredictionRequest) -> pd.D
                 data['AveragePrice_roll_mean_52'] = 1.5
         else:
             # Usar valores por defecto basados en promedios típicos
-            base_price = 1.5 if request.type == "conventional" else 1.8
-            seasonal_factor = 1.1 if date_obj.month in [6, 7, 8] else 0.95  # Verano más caro
-            
-            avg_price = base_price * seasonal_factor
-            data['AveragePrice_lag_1'] = avg_price
-            data['AveragePrice_lag_4'] = avg_price * 0.98
-            data['AveragePrice_lag_12'] = avg_price * 1.02
-            data['AveragePrice_lag_52'] = avg_price * 0.95
-            data['AveragePrice_roll_mean_4'] = avg_price
-            data['AveragePrice_roll_mean_12'] = avg_price * 1.01
-            data['AveragePrice_roll_mean_52'] = avg_price * 0.97
+            data.update({name: float(value) for name, value in default_price_features(request.type, date_obj.month).items()})
         
         # Lags de volumen (usar valores por defecto)
-        data['TotalVolume_lag_1'] = request.total_volume * 0.95
-        data['TotalVolume_lag_4'] = request.total_volume * 1.05
-        data['TotalVolume_lag_12'] = request.total_volume * 0.90
+        data.update(default_volume_features(request.total_volume))
+        
+        # Historia real de la serie: reemplaza los valores por defecto disponibles
+        # (los precios enviados por el cliente tienen prioridad)
+        if history_features is not None:
+            client_prices = bool(request.historical_prices and len(request.historical_prices) >= 52)
+            for name, value in history_features.items():
+                if np.isnan(value) or (client_prices and name.startswith('AveragePrice')):
+                    continue
+                data[name] = value
         
         # Convertir a DataFrame
         df = pd.DataFrame([data])
@@ -287,7 +382,11 @@ def health_check():
             features_count=model_data['model_info']['features_count'],
             supported_regions=model_data['supported_regions'][:10],  # Primeras 10
             supported_types=model_data['supported_types'],
-            model_metrics=model_data['model_info']['training_metrics']
+            model_metrics=model_data['model_info']['training_metrics'],
+            price_history={
+                "series": len(_price_history) if _price_history is not None else 0,
+                "observations": _price_history.observations if _price_history is not None else 0
+            }
         )
     except Exception as e:
         return AvocadoHealthResponse(
@@ -311,13 +410,12 @@ def predict_avocado_price(request: AvocadoPredictionRequest):
     try:
         # Cargar modelo
         model_data = load_avocado_model()
-        model = model_data['model']
         
         # Preparar características
         features_df = create_features_from_avocado_data(request)
         
         # Realizar predicción
-        prediction = float(model.predict(features_df)[0])
+        prediction = float(model_data['predictor'].predict(features_df)[0])
         
         # Calcular confianza
         confidence = calculate_confidence_score(prediction, features_df)
@@ -357,7 +455,8 @@ def predict_avocado_price(request: AvocadoPredictionRequest):
                 "features_used": len(model_data['feature_cols']),
                 "region": request.region,
                 "type": request.type,
-                "prediction_date": request.date
+                "prediction_date": request.date,
+                "price_history": load_price_history_data().series_info(request.region, request.type)
             },
             interpretation=interpretation,
             price_category=price_category,
@@ -369,6 +468,316 @@ def predict_avocado_price(request: AvocadoPredictionRequest):
         logger.error(f"Error en predicción después de {execution_time:.3f}s: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error en predicción: {str(e)}")
 
+def build_series_features(series: List[tuple], dates) -> pd.DataFrame:
+    """
+    Features de /predict (volúmenes por defecto) para muchas filas (región, tipo) y fechas
+    a la vez: calendario de cada fecha, historial de la serie y, donde no hay historia,
+    los lags por defecto del mes de cada fecha.
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    regions = np.array([region for region, _ in series], dtype=object)
+    types = np.array([avocado_type for _, avocado_type in series], dtype=object)
+    
+    # Fila con los volúmenes por defecto de AvocadoPredictionRequest, repetida
+    template = AvocadoPredictionRequest(date=str(dates[0]), region=str(regions[0]), type=str(types[0]))
+    features = create_features_from_avocado_data(template).iloc[np.zeros(len(series), dtype=np.int64)].reset_index(drop=True)
+    features['region'] = regions
+    features['type'] = types
+    for column, values in calendar_features(dates).items():
+        features[column] = values
+    
+    month = features['month'].to_numpy()
+    conventional = types == "conventional"
+    organic_defaults = default_price_features("organic", month)
+    for name, values in default_price_features("conventional", month).items():
+        features[name] = np.where(conventional, values, organic_defaults[name])
+    for name, value in default_volume_features(template.total_volume).items():
+        features[name] = float(value)
+    
+    # Historia real (vectorizada por serie) donde existe
+    history = load_price_history_data()
+    rows = np.array([-1 if index is None else index for index in (history.series_index(*key) for key in series)], dtype=np.int64)
+    known = np.flatnonzero(rows >= 0)
+    if known.size:
+        for name, values in history.features(rows[known]).items():
+            column = features[name].to_numpy(dtype=np.float64, copy=True)
+            observed = ~np.isnan(values)
+            column[known[observed]] = values[observed]
+            features[name] = column
+    return features
+
+def build_market_features(regions: List[str], avocado_type: str, weeks: pd.DatetimeIndex) -> pd.DataFrame:
+    """
+    Matriz de features de todas las combinaciones (región, semana), ordenada por región.
+    Entre semanas solo cambia el calendario: los lags y medias móviles son los de la
+    semana siguiente a la última observación de cada serie (sin historia, los del mes).
+    """
+    series = [(region, avocado_type) for region in regions for _ in range(len(weeks))]
+    return build_series_features(series, np.tile(weeks.to_numpy(dtype='datetime64[D]'), len(regions)))
+
+def linear_trend(prices: np.ndarray) -> np.ndarray:
+    """Cambio relativo de la recta de mínimos cuadrados en el período, por fila de ``prices``"""
+    t = np.arange(prices.shape[-1], dtype=np.float64)
+    t -= t.mean()
+    denominator = (t ** 2).sum()
+    slope = (prices * t).sum(axis=-1) / denominator if denominator > 0 else np.zeros(prices.shape[:-1])
+    return slope * (prices.shape[-1] - 1) / prices.mean(axis=-1)
+
+def describe_trend(change: float) -> str:
+    if change > TREND_THRESHOLD:
+        return "alcista"
+    if change < -TREND_THRESHOLD:
+        return "bajista"
+    return "estable"
+
+@app.post("/market-analysis", response_model=AvocadoMarketAnalysisResponse)
+def market_analysis(request: AvocadoMarketAnalysisRequest):
+    """
+    Pronóstico semanal del período para la región (y opcionalmente todas las regiones
+    soportadas) con una sola llamada al modelo, más tendencia y patrones estacionales.
+    
+    Limitación: los lags y medias móviles de precio no avanzan entre semanas (son los de
+    la semana siguiente a la última observación de la serie o, sin historia, los valores
+    por defecto del mes); solo cambian las columnas de calendario. Las variaciones del
+    período reflejan la estacionalidad aprendida, no la dinámica de precios semana a
+    semana, también para fechas dentro del historial. Para un pronóstico recursivo a
+    varias semanas se usa /forecast. La respuesta lo indica en
+    ``model_info['price_features']``.
+    """
+    start_time = time.time()
+    avocado_type = request.type or "conventional"
+    logger.info(f"Análisis de mercado solicitado: {avocado_type} en {request.region} de {request.start_date} a {request.end_date}")
+    
+    try:
+        start_date = pd.Timestamp(datetime.strptime(request.start_date, "%Y-%m-%d"))
+        end_date = pd.Timestamp(datetime.strptime(request.end_date, "%Y-%m-%d"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Fecha inválida: {str(e)}")
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date debe ser posterior a start_date")
+    
+    # Semanas del período (domingos, como el dataset) y semanas siguientes para el próximo mes
+    weeks = pd.date_range(start_date, end_date, freq="W-SUN")
+    if len(weeks) == 0:
+        weeks = pd.DatetimeIndex([start_date])
+    if len(weeks) > MARKET_ANALYSIS_MAX_WEEKS:
+        raise HTTPException(status_code=400, detail=f"El período no puede superar {MARKET_ANALYSIS_MAX_WEEKS} semanas")
+    n_weeks = len(weeks)
+    all_weeks = weeks.append(pd.date_range(weeks[-1] + timedelta(weeks=1), periods=FORECAST_NEXT_MONTH_WEEKS, freq="7D"))
+    
+    model_data = load_avocado_model()
+    regions = [request.region]
+    if request.include_all_regions:
+        regions += [region for region in model_data['supported_regions'] if region != request.region]
+    
+    try:
+        features = build_market_features(regions, avocado_type, all_weeks)
+        predictions = model_data['predictor'].predict(features)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error en análisis de mercado: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error en análisis de mercado: {str(e)}")
+    
+    forecast = predictions.reshape(len(regions), len(all_weeks))
+    period, next_month = forecast[:, :n_weeks], forecast[:, n_weeks:].mean(axis=1)
+    average = period.mean(axis=1)
+    trends = linear_trend(period)
+    
+    # Patrones estacionales de la región analizada
+    months = weeks.month.to_numpy() - 1
+    month_counts = np.bincount(months, minlength=12)
+    month_sums = np.bincount(months, weights=period[0], minlength=12)
+    observed_months = np.flatnonzero(month_counts)
+    monthly = month_sums[observed_months] / month_counts[observed_months]
+    seasons = MONTH_SEASONS[months]
+    seasonal_patterns = {
+        "monthly_average": {int(m + 1): round(float(v), 3) for m, v in zip(observed_months, monthly)},
+        "season_average": {str(season): round(float(period[0][seasons == season].mean()), 3) for season in pd.unique(seasons)},
+        "peak_month": int(observed_months[monthly.argmax()] + 1),
+        "lowest_month": int(observed_months[monthly.argmin()] + 1),
+        "volatility": round(float(period[0].std() / average[0]), 4),
+        "min_price": round(float(period[0].min()), 3),
+        "max_price": round(float(period[0].max()), 3)
+    }
+    
+    price_trend = describe_trend(float(trends[0]))
+    recommendations = []
+    if price_trend == "alcista":
+        recommendations.append("Precios al alza: conviene adelantar compras y asegurar contratos de suministro.")
+    elif price_trend == "bajista":
+        recommendations.append("Precios a la baja: conviene postergar compras grandes y negociar precios.")
+    else:
+        recommendations.append("Precios estables: mantener la estrategia actual de compras.")
+    if seasonal_patterns["peak_month"] != seasonal_patterns["lowest_month"]:
+        recommendations.append(
+            f"El mes más caro del período es {seasonal_patterns['peak_month']} y el más barato {seasonal_patterns['lowest_month']}; "
+            "planificar inventario en torno a esos meses."
+        )
+    if next_month[0] > period[0][-1] * (1 + TREND_THRESHOLD):
+        recommendations.append("Se espera un aumento de precio el próximo mes.")
+    elif next_month[0] < period[0][-1] * (1 - TREND_THRESHOLD):
+        recommendations.append("Se espera una baja de precio el próximo mes.")
+    
+    regions_summary = None
+    if request.include_all_regions:
+        regions_summary = {
+            region: {
+                "average_price": round(float(average[i]), 3),
+                "min_price": round(float(period[i].min()), 3),
+                "max_price": round(float(period[i].max()), 3),
+                "price_trend": describe_trend(float(trends[i])),
+                "forecast_next_month": round(float(next_month[i]), 3)
+            }
+            for i, region in enumerate(regions)
+        }
+        cheapest, priciest = regions[int(average.argmin())], regions[int(average.argmax())]
+        recommendations.append(f"Región más barata en el período: {cheapest}; más cara: {priciest}.")
+    
+    history = load_price_history_data()
+    series_index = history.series_index(request.region, avocado_type)
+    last_observed = history.last_date[series_index] if series_index is not None else None
+    
+    execution_time = time.time() - start_time
+    log_prediction(logger, endpoint="/avocado/market-analysis",
+                   input_payload={"region": request.region, "type": avocado_type, "weeks": n_weeks, "regions": len(regions)},
+                   output_summary={"average_price": round(float(average[0]), 3), "trend": price_trend})
+    logger.info(f"Análisis de mercado completado en {execution_time:.3f}s: {forecast.size} predicciones")
+    
+    return AvocadoMarketAnalysisResponse(
+        region=request.region,
+        average_price=float(average[0]),
+        price_trend=price_trend,
+        seasonal_patterns=seasonal_patterns,
+        recommendations=recommendations,
+        forecast_next_month=float(next_month[0]),
+        weekly_forecast=[
+            {"date": week.strftime("%Y-%m-%d"), "price": round(float(price), 4)}
+            for week, price in zip(weeks, period[0])
+        ],
+        regions=regions_summary,
+        model_info={
+            "model_type": model_data['model_info']['type'],
+            "type": avocado_type,
+            "weeks": n_weeks,
+            "regions": len(regions),
+            "predictions": int(forecast.size),
+            "price_features": {
+                # Sin historia de la serie se usan los lags por defecto del mes de cada semana
+                "basis": "last_observation" if last_observed is not None else "defaults",
+                "last_observed_date": str(last_observed) if last_observed is not None else None,
+                "note": ("Los lags y medias móviles de precio no se actualizan semana a semana (última "
+                         "observación de la serie o valores por defecto del mes): las variaciones del período "
+                         "reflejan el calendario. Para un pronóstico recursivo usar /forecast.")
+            },
+            "execution_time_ms": round(execution_time * 1000, 2)
+        }
+    )
+
+@app.post("/forecast", response_model=AvocadoForecastResponse)
+def forecast_prices(request: AvocadoForecastRequest):
+    """
+    Pronóstico recursivo semana a semana: cada predicción alimenta los lags y medias
+    móviles de la semana siguiente. Todas las series avanzan con una llamada al modelo por semana.
+    """
+    start_time = time.time()
+    model_data = load_avocado_model()
+    history = load_price_history_data()
+    
+    types = list(dict.fromkeys(request.types or model_data['supported_types']))
+    if request.regions:
+        requested = list(dict.fromkeys((region, avocado_type) for region in request.regions for avocado_type in types))
+    else:
+        requested = [key for key in history.series_keys() if key[1] in types]
+    logger.info(f"Pronóstico recursivo solicitado: {len(requested)} series, {request.horizon_weeks} semanas")
+    
+    series = [key for key in requested if history.series_index(*key) is not None]
+    missing = [{"region": region, "type": avocado_type} for region, avocado_type in requested
+               if history.series_index(region, avocado_type) is None]
+    if not series:
+        raise HTTPException(status_code=404, detail="Ninguna de las series solicitadas tiene historial de precios")
+    
+    try:
+        indices = [history.series_index(*key) for key in series]
+        base_rows = build_series_features(series, history.last_date[indices] + np.timedelta64(7, 'D'))
+        forecaster = RecursiveForecaster(model_data['predictor'])
+        dates, prices = forecaster.forecast(history, indices, base_rows, request.horizon_weeks)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error en pronóstico recursivo: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error en pronóstico: {str(e)}")
+    
+    execution_time = time.time() - start_time
+    log_prediction(logger, endpoint="/avocado/forecast",
+                   input_payload={"series": len(series), "horizon_weeks": request.horizon_weeks},
+                   output_summary={"predictions": int(prices.size)})
+    logger.info(f"Pronóstico recursivo completado en {execution_time:.3f}s: {prices.size} predicciones")
+    
+    return AvocadoForecastResponse(
+        horizon_weeks=request.horizon_weeks,
+        series=[
+            {
+                "region": region,
+                "type": avocado_type,
+                "last_observed_date": str(history.last_date[index]),
+                "forecast": [{"date": str(date), "price": round(float(price), 4)} for date, price in zip(dates[i], prices[i])]
+            }
+            for i, (index, (region, avocado_type)) in enumerate(zip(indices, series))
+        ],
+        missing_series=missing,
+        model_info={
+            "model_type": model_data['model_info']['type'],
+            "series": len(series),
+            "predictions": int(prices.size),
+            "model_calls": request.horizon_weeks,
+            "execution_time_ms": round(execution_time * 1000, 2)
+        }
+    )
+
+@app.post("/history")
+def ingest_price_history(request: AvocadoHistoryIngestRequest):
+    """
+    Agrega observaciones semanales reales al historial. Se aplican en orden de fecha;
+    las que no son posteriores a la última semana de su serie se descartan.
+    """
+    history = load_price_history_data()
+    try:
+        dated = [(datetime.strptime(o.date, "%Y-%m-%d"), o) for o in request.observations]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Fecha inválida: {str(e)}")
+    
+    accepted, rejected = 0, []
+    for date_obj, observation in sorted(dated, key=lambda item: item[0]):
+        if history.append(observation.region, observation.type, date_obj, observation.average_price, observation.total_volume):
+            accepted += 1
+        else:
+            rejected.append({"region": observation.region, "type": observation.type, "date": observation.date})
+    
+    logger.info(f"Historial de precios: {accepted} observaciones agregadas, {len(rejected)} descartadas")
+    return {
+        "status": "ok",
+        "accepted": accepted,
+        "rejected": rejected,
+        "series": len(history),
+        "observations": history.observations
+    }
+
+@app.get("/history/{region}/{avocado_type}")
+def get_price_history(region: str, avocado_type: str):
+    """Lags y medias móviles actuales de una serie (región, tipo)"""
+    history = load_price_history_data()
+    info = history.series_info(region, avocado_type)
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"Sin historial para {region}/{avocado_type}")
+    features = history.series_features(region, avocado_type)
+    return {
+        "region": region,
+        "type": avocado_type,
+        **info,
+        "features": {name: (None if np.isnan(value) else value) for name, value in features.items()}
+    }
+
 @app.get("/regions")
 def get_supported_regions():
     """Retorna las regiones soportadas por el modelo"""
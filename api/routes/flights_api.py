@@ -1,17 +1,29 @@
 """
 API de Vuelos - Predicción de retrasos usando Machine Learning
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor
+import io
 import joblib
 import pandas as pd
 import numpy as np
 import os
 import sys
+import threading
 import time
+import warnings
 from typing import Dict, Optional
 from datetime import datetime
-from ..models.flights_api_models import FlightPredictionRequest, FlightPredictionResponse
+from ..models.flights_api_models import (FlightPredictionRequest, FlightPredictionResponse,
+                                         FlightDepartureSweepRequest, FlightDepartureSweepResponse)
+from flights.feature_encoder import FlightFeatureEncoder
+from flights.route_index import RouteIndex, build_route_index, load_route_index
+from flights.prediction_cache import TIME_OF_DAY_COLUMNS, PredictionCache
+from ..tree_engine import CompiledForest, compile_model, predict_rows
+from ..data_sources import load_or_rebuild
 
 # Importar constantes y logger
 from .. import constants as const
@@ -22,14 +34,71 @@ app = FastAPI(title="Flight Delay Prediction API", version="1.0.0")
 # Configurar logger específico para esta API
 logger = get_api_logger("flights_api", console_output=False)
 
-# Variable global para el modelo
+# Variable global para el modelo, su codificador de features y su versión compilada
 _loaded_model_data = None
+_feature_encoder = None
+_compiled_model = None
+
+# Caché LRU de predicciones por fila codificada: tamaño máximo y redondeo de horas
+# HHMM a la hora (más aciertos, menos precisión)
+PREDICTION_CACHE_SIZE = 50000
+PREDICTION_CACHE_QUANTIZE_HOUR = False
+_prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE)
+
+# Índice de rutas (origen, destino) construido a partir de DelayedFlights.csv
+_route_index = None
+_route_index_loaded = False
+_route_index_lock = threading.Lock()
+
+# Mapeo de aerolíneas (estos valores deben coincidir con el entrenamiento)
+AIRLINE_MAPPING = {
+    'WN': 0, 'AA': 1, 'DL': 2, 'UA': 3, 'US': 4, 'NW': 5, 'CO': 6, 
+    'FL': 7, 'AS': 8, 'B6': 9, 'YV': 10, 'OO': 11, 'XE': 12, 'EV': 13,
+    'F9': 14, '9E': 15, 'HA': 16, 'MQ': 17, 'OH': 18, 'TZ': 19
+}
+
+# Mapeo de aeropuertos (muestra - estos deben coincidir con el entrenamiento)
+AIRPORT_MAPPING = {
+    'ATL': 0, 'BOS': 1, 'BWI': 2, 'CLT': 3, 'DCA': 4, 'DEN': 5, 'DFW': 6,
+    'DTW': 7, 'EWR': 8, 'FLL': 9, 'IAD': 10, 'IAH': 11, 'JFK': 12, 'LAS': 13,
+    'LAX': 14, 'LGA': 15, 'MCO': 16, 'MDW': 17, 'MIA': 18, 'MSP': 19, 'ORD': 20,
+    'PHL': 21, 'PHX': 22, 'SEA': 23, 'SFO': 24, 'SLC': 25, 'TPA': 26
+}
+
+# Distancias conocidas por ruta (millas) cuando el request no trae distancia
+ROUTE_DISTANCES = {
+    ('LAX', 'SFO'): 337, ('SFO', 'LAX'): 337,
+    ('DEN', 'LAS'): 628, ('LAS', 'DEN'): 628,
+    ('JFK', 'LAX'): 2475, ('LAX', 'JFK'): 2475,
+    ('ORD', 'LAX'): 1745, ('LAX', 'ORD'): 1745,
+}
+
+# Valores por defecto cuando faltan datos del vuelo
+DEFAULT_ORIGIN = 'LAX'
+DEFAULT_DESTINATION = 'SFO'
+DEFAULT_AIRLINE = 'AA'
+DEFAULT_DISTANCE = 1000
+
+# Mapeos de respaldo si los metadatos del modelo no los incluyen
+FALLBACK_MAPPINGS = {'UniqueCarrier': AIRLINE_MAPPING, 'Origin': AIRPORT_MAPPING, 'Dest': AIRPORT_MAPPING}
+CATEGORY_DEFAULTS = {'UniqueCarrier': DEFAULT_AIRLINE, 'Origin': DEFAULT_ORIGIN, 'Dest': DEFAULT_DESTINATION}
+
+# Predicción en lote: filas por bloque de respuesta y mínimo de filas para repartir entre núcleos
+BATCH_CHUNK_SIZE = 10000
+PARALLEL_MIN_ROWS = 50000
+
+# Columnas de entrada del endpoint en lote (mismos campos que FlightPredictionRequest)
+BATCH_INPUT_COLUMNS = ['date', 'departure_time', 'origin', 'destination', 'airline', 'distance', 'delay_at_departure']
+
+# Barrido de horarios de salida: límites de días alrededor de la fecha y de separación entre horarios
+SWEEP_MAX_DAYS_AROUND = 14
+SWEEP_MIN_SLOT_MINUTES = 5
 
 def load_flights_model():
     """
     Carga el modelo REAL de predicción de retrasos de vuelos.
     """
-    global _loaded_model_data
+    global _loaded_model_data, _feature_encoder, _compiled_model
     
     if _loaded_model_data is not None:
         return _loaded_model_data
@@ -42,7 +111,26 @@ def load_flights_model():
             raise FileNotFoundError(f"Modelo no encontrado en: {model_path}")
         
         # Cargar el modelo real usando joblib
-        _loaded_model_data = joblib.load(model_path)
+        model_data = joblib.load(model_path)
+        
+        # Codificador precompilado: orden de columnas y mapeos del entrenamiento
+        _feature_encoder = FlightFeatureEncoder.from_model_data(model_data, FALLBACK_MAPPINGS, CATEGORY_DEFAULTS)
+        
+        # Las predicciones guardadas corresponden al modelo anterior
+        quantize_columns = [
+            _feature_encoder.column_index[column] for column in TIME_OF_DAY_COLUMNS
+            if PREDICTION_CACHE_QUANTIZE_HOUR and column in _feature_encoder.column_index
+        ]
+        _prediction_cache.invalidate(quantize_columns)
+        
+        # Árboles aplanados para requests pequeños (verificados bit a bit contra scikit-learn)
+        _compiled_model = compile_model(model_data['model'])
+        if _compiled_model is not None:
+            logger.info(f"Motor compilado activo: {_compiled_model.n_trees} árboles, {_compiled_model.n_nodes} nodos")
+        else:
+            logger.warning("Motor compilado no disponible para el modelo de vuelos; se usa model.predict")
+        load_route_index_data()
+        _loaded_model_data = model_data
         
         log_model_loading(logger, "Flight Delay Model", model_path, True)
         logger.info(f"Modelo de vuelos cargado exitosamente con tipo: {type(_loaded_model_data)}")
@@ -53,6 +141,56 @@ def load_flights_model():
         log_model_loading(logger, "Flight Delay Model", model_path, False, str(e))
         raise HTTPException(status_code=500, detail=f"Error cargando modelo: {str(e)}")
 
+def load_route_index_data() -> Optional[RouteIndex]:
+    """
+    Carga el índice de rutas; si no existe (o el CSV cambió) y DelayedFlights.csv está
+    disponible, lo construye una vez. Sin CSV ni índice se usan las estimaciones fijas.
+    """
+    if _route_index_loaded:
+        return _route_index
+    
+    # Los primeros requests concurrentes esperan al que lee DelayedFlights.csv
+    with _route_index_lock:
+        if not _route_index_loaded:
+            _load_route_index_locked()
+    return _route_index
+
+def _load_route_index_locked():
+    """Carga (o construye) el índice de rutas; se llama con ``_route_index_lock`` tomado"""
+    global _route_index, _route_index_loaded
+    
+    index_path = const.ROUTE_INDEX_PATH
+    csv_path = const.CSV_FLIGHTS_PATH
+    try:
+        index = load_or_rebuild(index_path, csv_path, load_route_index, build_route_index, logger, "índice de rutas")
+        
+        if index is None:
+            logger.warning(f"Índice de rutas no disponible ({index_path}); se usan distancias y duraciones estimadas")
+        else:
+            logger.info(f"Índice de rutas cargado: {len(index)} rutas ({index_path})")
+        _route_index = index
+    except Exception as e:
+        logger.error(f"Error cargando índice de rutas: {str(e)}")
+        _route_index = None
+    
+    _route_index_loaded = True
+
+def reload_flights_model():
+    """Descarta el modelo cargado (y sus predicciones en caché) y lo vuelve a cargar"""
+    global _loaded_model_data
+    _loaded_model_data = None
+    return load_flights_model()
+
+def get_feature_encoder() -> FlightFeatureEncoder:
+    """Retorna el codificador de features del modelo cargado"""
+    load_flights_model()
+    return _feature_encoder
+
+def get_compiled_model() -> Optional[CompiledForest]:
+    """Retorna el motor compilado del modelo cargado (None si no es soportado)"""
+    load_flights_model()
+    return _compiled_model
+
 def transform_user_data_to_model_format(flight_data):
     """
     Transforma los datos del coordinador al formato esperado por el modelo ML.
@@ -87,40 +225,48 @@ def transform_user_data_to_model_format(flight_data):
         destination = flight_data.get('destination')
         
         if not origin:
-            origin = 'LAX'
+            origin = DEFAULT_ORIGIN
         if not destination:
-            destination = 'SFO'
+            destination = DEFAULT_DESTINATION
             
-        print(f"🔍 Origin: {origin}, Destination: {destination}")
+        logger.debug(f"Origin: {origin}, Destination: {destination}")
+        
+        # Estadísticas históricas de la ruta (si hay índice y la ruta se observó); una
+        # mediana NaN (la ruta no tenía el dato en ningún vuelo) usa la estimación fija
+        route_index = _route_index
+        route_row = route_index.row(origin, destination) if route_index is not None else None
+        known_distance = route_row is not None and np.isfinite(route_index.distance[route_row])
+        known_elapsed = route_row is not None and np.isfinite(route_index.crs_elapsed[route_row])
         
         # Estimar distancia
         distance = flight_data.get('distance')
         if not distance:
-            distance_map = {
-                ('LAX', 'SFO'): 337, ('SFO', 'LAX'): 337,
-                ('DEN', 'LAS'): 628, ('LAS', 'DEN'): 628,
-                ('JFK', 'LAX'): 2475, ('LAX', 'JFK'): 2475,
-                ('ORD', 'LAX'): 1745, ('LAX', 'ORD'): 1745,
-            }
-            distance = distance_map.get((origin, destination), 1000)
-        
-        # Calcular hora de llegada
-        flight_duration_hours = distance / 500
-        total_minutes = int(flight_duration_hours * 60) + 30
-        
-        dep_hour = dep_time // 100
-        dep_minute = dep_time % 100
-        total_dep_minutes = dep_hour * 60 + dep_minute
-        arr_minutes = total_dep_minutes + total_minutes
-        
-        arr_hour = (arr_minutes // 60) % 24
-        arr_min = arr_minutes % 60
-        crs_arr_time = arr_hour * 100 + arr_min
+            if known_distance:
+                distance = float(route_index.distance[route_row])
+            else:
+                distance = ROUTE_DISTANCES.get((origin, destination), DEFAULT_DISTANCE)
+        
+        # Calcular hora de llegada: duración programada mediana de la ruta (con la
+        # diferencia horaria del destino) o estimación a 500 mph + 30 minutos
+        if known_elapsed:
+            crs_arr_time = int(route_index.scheduled_arrival(dep_time, route_row))
+        else:
+            flight_duration_hours = distance / 500
+            total_minutes = int(flight_duration_hours * 60) + 30
+            
+            dep_hour = dep_time // 100
+            dep_minute = dep_time % 100
+            total_dep_minutes = dep_hour * 60 + dep_minute
+            arr_minutes = total_dep_minutes + total_minutes
+            
+            arr_hour = (arr_minutes // 60) % 24
+            arr_min = arr_minutes % 60
+            crs_arr_time = arr_hour * 100 + arr_min
         
         # Obtener aerolínea con valor por defecto
         airline = flight_data.get('airline')
         if not airline:
-            airline = 'AA'
+            airline = DEFAULT_AIRLINE
             
         # Formatear datos para el modelo
         model_input = {
@@ -137,7 +283,7 @@ def transform_user_data_to_model_format(flight_data):
             "DepDelay": float(flight_data.get('delay_at_departure') or 0)
         }
         
-        print(f"🔍 Datos transformados: {model_input}")
+        logger.debug(f"Datos transformados: {model_input}")
         return model_input
         
     except Exception as e:
@@ -151,50 +297,25 @@ def make_flight_prediction(model_data, flight_data):
     try:
         # Extraer el modelo real del diccionario
         model = model_data['model']
-        feature_columns = model_data['feature_columns']
         
         # Transformar datos al formato del modelo
         model_input = transform_user_data_to_model_format(flight_data)
         
-        # El modelo espera valores numéricos para las variables categóricas
-        # Mapear las variables categóricas manualmente según el entrenamiento
-        
-        # Mapeo de aerolíneas (estos valores deben coincidir con el entrenamiento)
-        airline_mapping = {
-            'WN': 0, 'AA': 1, 'DL': 2, 'UA': 3, 'US': 4, 'NW': 5, 'CO': 6, 
-            'FL': 7, 'AS': 8, 'B6': 9, 'YV': 10, 'OO': 11, 'XE': 12, 'EV': 13,
-            'F9': 14, '9E': 15, 'HA': 16, 'MQ': 17, 'OH': 18, 'TZ': 19
-        }
-        
-        # Mapeo de aeropuertos (muestra - estos deben coincidir con el entrenamiento)
-        airport_mapping = {
-            'ATL': 0, 'BOS': 1, 'BWI': 2, 'CLT': 3, 'DCA': 4, 'DEN': 5, 'DFW': 6,
-            'DTW': 7, 'EWR': 8, 'FLL': 9, 'IAD': 10, 'IAH': 11, 'JFK': 12, 'LAS': 13,
-            'LAX': 14, 'LGA': 15, 'MCO': 16, 'MDW': 17, 'MIA': 18, 'MSP': 19, 'ORD': 20,
-            'PHL': 21, 'PHX': 22, 'SEA': 23, 'SFO': 24, 'SLC': 25, 'TPA': 26
-        }
-        
-        # Aplicar mapeos
-        if 'UniqueCarrier' in model_input:
-            carrier = model_input['UniqueCarrier']
-            model_input['UniqueCarrier'] = airline_mapping.get(carrier, 1)  # Default AA
-            
-        if 'Origin' in model_input:
-            origin = model_input['Origin']
-            model_input['Origin'] = airport_mapping.get(origin, 14)  # Default LAX
-            
-        if 'Dest' in model_input:
-            dest = model_input['Dest']
-            model_input['Dest'] = airport_mapping.get(dest, 24)  # Default SFO
-        
-        # Crear DataFrame con el orden correcto de columnas
-        input_df = pd.DataFrame([model_input])
-        input_df = input_df.reindex(columns=feature_columns, fill_value=0)
-        
-        print(f"🔍 Input final para el modelo: {input_df.iloc[0].to_dict()}")
-        
-        # Hacer predicción con el modelo REAL
-        prediction = model.predict(input_df)[0]
+        # Fila float32 en el orden de feature_columns, con las variables categóricas
+        # codificadas según los mapeos del entrenamiento
+        input_row = get_feature_encoder().encode(model_input)
+        
+        # Predicción en caché para la misma fila codificada o con el modelo REAL
+        # (motor compilado si está disponible)
+        cache_key = _prediction_cache.key(input_row)
+        cache_generation = _prediction_cache.generation
+        prediction = _prediction_cache.get(cache_key)
+        if prediction is None:
+            with warnings.catch_warnings():
+                # El modelo se entrenó con un DataFrame; la fila NumPy tiene el mismo orden de columnas
+                warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+                prediction = float(predict_rows(model, get_compiled_model(), input_row)[0])
+            _prediction_cache.put(cache_key, prediction, cache_generation)
         
         # Calcular confianza basada en el R² del entrenamiento
         training_info = model_data.get('training_info', {})
@@ -209,6 +330,204 @@ def make_flight_prediction(model_data, flight_data):
         traceback.print_exc()
         raise ValueError(f"Error en predicción: {str(e)}")
 
+def validate_flight_dates(dates: pd.Series) -> pd.Series:
+    """
+    Valida fechas "YYYY-MM-DD" en lote: las vacías, inválidas o anteriores a 2020
+    se reemplazan por la fecha actual (mismo criterio que el endpoint individual).
+    """
+    today = datetime.now().strftime("%Y-%m-%d")
+    parsed = pd.to_datetime(dates, format="%Y-%m-%d", errors='coerce')
+    valid = parsed.notna() & (parsed.dt.year >= 2020)
+    return dates.where(valid, today)
+
+def transform_flights_batch(flights: pd.DataFrame, encoder: FlightFeatureEncoder):
+    """
+    Versión vectorizada de transform_user_data_to_model_format + mapeos categóricos.
+    
+    Args:
+        flights: DataFrame con las columnas de BATCH_INPUT_COLUMNS (fechas ya validadas)
+        encoder: Codificador del modelo (orden de columnas y mapeos categóricos)
+    
+    Returns:
+        (matriz de features en el orden de feature_columns, errores por fila o None)
+    """
+    n_rows = len(flights)
+    flights = flights.reindex(columns=BATCH_INPUT_COLUMNS)
+    errors = pd.Series([None] * n_rows, index=flights.index, dtype=object)
+    
+    def _text(column, default):
+        values = flights[column].astype(object).where(flights[column].notna(), '')
+        values = values.map(str)
+        return values.where(values != '', default)
+    
+    # Fecha: se usa 2008 como año (el del dataset de entrenamiento)
+    dates = pd.to_datetime(flights['date'], format="%Y-%m-%d")
+    dates_2008 = pd.to_datetime(pd.DataFrame({'year': 2008, 'month': dates.dt.month, 'day': dates.dt.day}))
+    
+    # Hora de salida "HH:MM" (sin ":" se usa 12:00)
+    departure = _text('departure_time', '12:00')
+    parts = departure.str.extract(r'^\s*([+-]?\d+)\s*:\s*([+-]?\d+)\s*$')
+    has_colon = departure.str.contains(':', regex=False)
+    invalid_time = has_colon & parts[0].isna()
+    errors[invalid_time] = "departure_time inválido (se espera HH:MM)"
+    dep_time = np.where(
+        has_colon & ~invalid_time,
+        pd.to_numeric(parts[0], errors='coerce').fillna(0) * 100 + pd.to_numeric(parts[1], errors='coerce').fillna(0),
+        1200
+    ).astype(np.int64)
+    
+    origin = _text('origin', DEFAULT_ORIGIN)
+    destination = _text('destination', DEFAULT_DESTINATION)
+    airline = _text('airline', DEFAULT_AIRLINE)
+    
+    # Filas del índice de rutas (-1 si no hay índice o la ruta no se observó); las
+    # medianas NaN (sin el dato en ningún vuelo de la ruta) usan la estimación fija
+    route_index = _route_index
+    if route_index is not None:
+        route_rows = route_index.rows(origin.tolist(), destination.tolist())
+        known_route = route_rows >= 0
+        known_distance, known_elapsed = known_route.copy(), known_route.copy()
+        known_distance[known_route] = np.isfinite(route_index.distance[route_rows[known_route]])
+        known_elapsed[known_route] = np.isfinite(route_index.crs_elapsed[route_rows[known_route]])
+    else:
+        route_rows = np.full(n_rows, -1, dtype=np.int64)
+        known_distance = known_elapsed = np.zeros(n_rows, dtype=bool)
+    
+    # Distancia: si falta (o es 0) se toma del índice de rutas o se estima por ruta
+    distance = pd.to_numeric(flights['distance'], errors='coerce')
+    missing_distance = distance.isna() | (distance == 0)
+    route_distance = pd.Series(list(zip(origin, destination)), index=flights.index).map(ROUTE_DISTANCES).fillna(DEFAULT_DISTANCE)
+    if known_distance.any():
+        route_distance[known_distance] = route_index.distance[route_rows[known_distance]]
+    distance = distance.where(~missing_distance, route_distance).to_numpy(dtype=np.float64)
+    
+    # Hora de llegada: duración programada de la ruta o estimación (500 mph + 30 minutos)
+    total_minutes = np.trunc(distance / 500 * 60).astype(np.int64) + 30
+    arr_minutes = (dep_time // 100) * 60 + dep_time % 100 + total_minutes
+    crs_arr_time = ((arr_minutes // 60) % 24) * 100 + arr_minutes % 60
+    if known_elapsed.any():
+        crs_arr_time[known_elapsed] = route_index.scheduled_arrival(dep_time[known_elapsed], route_rows[known_elapsed])
+    
+    features = pd.DataFrame({
+        "Month": dates_2008.dt.month.to_numpy(dtype=np.int64),
+        "DayofMonth": dates_2008.dt.day.to_numpy(dtype=np.int64),
+        "DayOfWeek": dates_2008.dt.dayofweek.to_numpy(dtype=np.int64) + 1,
+        "DepTime": dep_time,
+        "CRSDepTime": dep_time,
+        "CRSArrTime": crs_arr_time,
+        "UniqueCarrier": airline.map(encoder.mappings['UniqueCarrier']).fillna(encoder.default_codes['UniqueCarrier']).to_numpy(dtype=np.int64),
+        "Origin": origin.map(encoder.mappings['Origin']).fillna(encoder.default_codes['Origin']).to_numpy(dtype=np.int64),
+        "Dest": destination.map(encoder.mappings['Dest']).fillna(encoder.default_codes['Dest']).to_numpy(dtype=np.int64),
+        "Distance": np.trunc(distance).astype(np.int64),
+        "DepDelay": pd.to_numeric(flights['delay_at_departure'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    })
+    features = features.reindex(columns=encoder.feature_columns, fill_value=0)
+    return features, errors.to_numpy()
+
+def predict_delays(model, features: pd.DataFrame, engine: Optional[CompiledForest] = None) -> np.ndarray:
+    """
+    Predice todas las filas con el modelo.
+    
+    Los lotes pequeños usan el motor compilado (si se pasa). Con entradas muy grandes
+    y un modelo sin paralelismo propio (n_jobs), las filas se reparten en bloques
+    entre los núcleos disponibles (los árboles liberan el GIL).
+    """
+    n_jobs = getattr(model, 'n_jobs', None)
+    n_workers = os.cpu_count() or 1
+    if len(features) < PARALLEL_MIN_ROWS or n_workers == 1 or n_jobs not in (None, 1):
+        return predict_rows(model, engine, features)
+    
+    bounds = np.linspace(0, len(features), n_workers + 1, dtype=int)
+    chunks = [features.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+    with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+        return np.concatenate(list(executor.map(model.predict, chunks)))
+
+def categorize_delays(predictions: np.ndarray) -> np.ndarray:
+    """Categoría de retraso para cada predicción (mismos cortes que la interpretación)"""
+    return np.select(
+        [predictions <= 5, predictions <= 15, predictions <= 30],
+        ["puntual", "retraso leve", "retraso moderado"],
+        default="retraso significativo"
+    )
+
+def predict_flights_batch(model_data, flights: pd.DataFrame) -> pd.DataFrame:
+    """
+    Predice el retraso de muchos vuelos con una sola llamada al modelo.
+    
+    Returns:
+        DataFrame de entrada con las columnas prediction, delay_category, confidence y error
+    """
+    flights = flights.reset_index(drop=True)
+    validated = flights.reindex(columns=BATCH_INPUT_COLUMNS)
+    validated['date'] = validate_flight_dates(validated['date'].astype(object).where(validated['date'].notna(), ''))
+    
+    features, errors = transform_flights_batch(validated, get_feature_encoder())
+    valid = pd.isna(errors)
+    
+    predictions = np.full(len(flights), np.nan)
+    if valid.any():
+        predictions[valid] = predict_delays(model_data['model'], features[valid], get_compiled_model())
+    
+    training_info = model_data.get('training_info', {})
+    confidence = min(training_info.get('r2_score', 0.8) * 100, 95.0)
+    
+    result = flights.copy()
+    result['prediction'] = predictions
+    result['delay_category'] = np.where(valid, categorize_delays(predictions), None)
+    result['confidence'] = np.where(valid, confidence, np.nan)
+    result['error'] = errors
+    return result
+
+def parse_departure_minutes(value: Optional[str], default: int) -> int:
+    """Convierte "HH:MM" a minutos desde medianoche (default si no se indica)"""
+    if not value:
+        return default
+    hour, minute = value.split(':')
+    minutes = int(hour) * 60 + int(minute)
+    if not 0 <= int(minute) < 60 or not 0 <= minutes < 24 * 60:
+        raise ValueError(f"hora fuera de rango: {value}")
+    return minutes
+
+def build_departure_sweep(origin: str, destination: str, airline: str, center_date: datetime, days_around: int,
+                          slot_minutes: int, earliest: int, latest: int, distance: Optional[float] = None):
+    """
+    Grilla de vuelos (día x horario de salida) para el barrido, con las columnas de BATCH_INPUT_COLUMNS.
+    
+    Returns:
+        (DataFrame de días * horarios filas, fechas "YYYY-MM-DD", horarios "HH:MM")
+    """
+    dates = pd.date_range(center_date - pd.Timedelta(days=days_around), periods=2 * days_around + 1, freq='D')
+    date_labels = dates.strftime("%Y-%m-%d").tolist()
+    slots = np.arange(earliest, latest + 1, slot_minutes)
+    slot_labels = [f"{minutes // 60:02d}:{minutes % 60:02d}" for minutes in slots.tolist()]
+    
+    grid = pd.DataFrame({
+        'date': np.repeat(date_labels, len(slot_labels)),
+        'departure_time': np.tile(slot_labels, len(date_labels)),
+        'origin': origin,
+        'destination': destination,
+        'airline': airline,
+        'distance': distance,
+        'delay_at_departure': 0.0
+    }, columns=BATCH_INPUT_COLUMNS)
+    return grid, date_labels, slot_labels
+
+def sweep_departures(model_data, grid: pd.DataFrame, n_days: int, n_slots: int) -> np.ndarray:
+    """Predice toda la grilla del barrido con una sola llamada al modelo: matriz (días, horarios)"""
+    features, _ = transform_flights_batch(grid, get_feature_encoder())
+    predictions = predict_delays(model_data['model'], features, get_compiled_model())
+    return np.asarray(predictions, dtype=np.float64).reshape(n_days, n_slots)
+
+def parse_flights_batch(body: bytes, content_type: str) -> pd.DataFrame:
+    """Lee el cuerpo del request en lote: CSV (text/csv) o NDJSON (una línea JSON por vuelo)"""
+    if not body.strip():
+        return pd.DataFrame(columns=BATCH_INPUT_COLUMNS)
+    dtypes = {'date': str, 'departure_time': str, 'origin': str, 'destination': str, 'airline': str}
+    if 'csv' in content_type:
+        return pd.read_csv(io.BytesIO(body), dtype=dtypes, keep_default_na=False, na_values=[''])
+    # Sin conversión de fechas: pandas convertiría 'date' y las columnas '*_time' a epoch
+    return pd.read_json(io.BytesIO(body), lines=True, dtype=dtypes, convert_dates=False, keep_default_dates=False)
+
 @app.get("/")
 def root():
     return {
@@ -279,6 +598,15 @@ def predict_flight_delay(request: FlightPredictionRequest):
             'departure_delay': request.delay_at_departure
         }
         
+        # Historial de la ruta (índice construido a partir de DelayedFlights.csv)
+        route_stats = _route_index.route_stats(request.origin, request.destination) if _route_index is not None else None
+        if route_stats is not None:
+            flight_info['route_history'] = {
+                'historical_mean_delay': round(route_stats['mean_delay'], 2) if route_stats['mean_delay'] is not None else None,
+                'scheduled_duration_min': route_stats['crs_elapsed'],
+                'flights': route_stats['flights']
+            }
+        
         # Información del modelo REAL
         model_info = {
             'model_type': 'Machine Learning',
@@ -321,6 +649,148 @@ def predict_flight_delay(request: FlightPredictionRequest):
         logger.error(f"Error en predicción de vuelo después de {execution_time:.3f}s: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error en predicción de vuelos: {str(e)}")
 
+@app.post("/models/flights/predict-batch")
+async def predict_flight_delay_batch(request: Request, format: Optional[str] = None):
+    """
+    Predice el retraso de muchos vuelos (p.ej. la programación de un día completo).
+    
+    Entrada: CSV (Content-Type: text/csv) o NDJSON con los campos de FlightPredictionRequest
+    (date, departure_time, origin, destination, airline, distance, delay_at_departure).
+    Salida: mismo formato de entrada (o el indicado en ?format=csv|ndjson), con las
+    columnas prediction, delay_category, confidence y error por vuelo.
+    """
+    start_time = time.time()
+    content_type = request.headers.get('content-type', '')
+    output_format = (format or ('csv' if 'csv' in content_type else 'ndjson')).lower()
+    if output_format not in ('csv', 'ndjson'):
+        raise HTTPException(status_code=400, detail="format debe ser 'csv' o 'ndjson'")
+    
+    body = await request.body()
+    try:
+        flights = parse_flights_batch(body, content_type)
+    except Exception as e:
+        logger.warning(f"Cuerpo inválido en predicción en lote: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"No se pudo leer el lote de vuelos: {str(e)}")
+    
+    logger.info(f"Solicitud de predicción en lote recibida: {len(flights)} vuelos ({output_format})")
+    
+    try:
+        model_data = await run_in_threadpool(load_flights_model)
+        result = await run_in_threadpool(predict_flights_batch, model_data, flights)
+    except HTTPException:
+        raise
+    except Exception as e:
+        execution_time = time.time() - start_time
+        logger.error(f"Error en predicción en lote después de {execution_time:.3f}s: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error en predicción de vuelos: {str(e)}")
+    
+    failed = int(result['error'].notna().sum())
+    log_prediction(logger, endpoint="/models/flights/predict-batch", input_payload={"flights": len(result)}, output_summary={"failed": failed})
+    logger.info(f"Predicción en lote completada en {time.time() - start_time:.3f}s: {len(result)} vuelos, {failed} con error")
+    
+    def _chunks():
+        for start in range(0, len(result), BATCH_CHUNK_SIZE):
+            chunk = result.iloc[start:start + BATCH_CHUNK_SIZE]
+            if output_format == 'csv':
+                yield chunk.to_csv(index=False, header=(start == 0))
+            else:
+                yield chunk.to_json(orient='records', lines=True, double_precision=15, force_ascii=False).rstrip("\n") + "\n"
+    
+    media_type = "text/csv" if output_format == 'csv' else "application/x-ndjson"
+    return StreamingResponse(_chunks(), media_type=media_type)
+
+@app.post("/models/flights/departure-sweep", response_model=FlightDepartureSweepResponse)
+def departure_sweep(request: FlightDepartureSweepRequest):
+    """
+    Barrido de horarios de salida para una ruta: predice el retraso para cada horario
+    (cada slot_minutes) de cada día cercano a la fecha y retorna la curva y el mejor horario.
+    """
+    start_time = time.time()
+    airline = request.airline or DEFAULT_AIRLINE
+    logger.info(f"Barrido de horarios solicitado: {airline} {request.origin} → {request.destination} ({request.date})")
+    
+    if not 0 <= request.days_around <= SWEEP_MAX_DAYS_AROUND:
+        raise HTTPException(status_code=400, detail=f"days_around debe estar entre 0 y {SWEEP_MAX_DAYS_AROUND}")
+    if not SWEEP_MIN_SLOT_MINUTES <= request.slot_minutes <= 24 * 60:
+        raise HTTPException(status_code=400, detail=f"slot_minutes debe estar entre {SWEEP_MIN_SLOT_MINUTES} y 1440")
+    try:
+        center_date = datetime.strptime(request.date, "%Y-%m-%d") if request.date else datetime.now()
+        earliest = parse_departure_minutes(request.earliest_departure, 0)
+        latest = parse_departure_minutes(request.latest_departure, 24 * 60 - 1)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Parámetros de barrido inválidos: {str(e)}")
+    if earliest > latest:
+        raise HTTPException(status_code=400, detail="earliest_departure debe ser anterior a latest_departure")
+    
+    try:
+        model_data = load_flights_model()
+        grid, date_labels, slot_labels = build_departure_sweep(
+            request.origin, request.destination, airline, center_date, request.days_around,
+            request.slot_minutes, earliest, latest, request.distance
+        )
+        delays = sweep_departures(model_data, grid, len(date_labels), len(slot_labels))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error en barrido de horarios después de {time.time() - start_time:.3f}s: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error en barrido de horarios: {str(e)}")
+    
+    # Mejor horario por día y global (en empate, el más temprano)
+    best_slots = delays.argmin(axis=1)
+    best_day, best_slot = np.unravel_index(delays.argmin(), delays.shape)
+    best_delay = float(delays[best_day, best_slot])
+    
+    days = [
+        {
+            'date': date_label,
+            'predicted_delays': np.round(delays[i], 2).tolist(),
+            'best_departure_time': slot_labels[best_slots[i]],
+            'best_predicted_delay': round(float(delays[i, best_slots[i]]), 2)
+        }
+        for i, date_label in enumerate(date_labels)
+    ]
+    best = {
+        'date': date_labels[best_day],
+        'departure_time': slot_labels[best_slot],
+        'predicted_delay': round(best_delay, 2),
+        'delay_category': str(categorize_delays(np.array([best_delay]))[0])
+    }
+    
+    training_info = model_data.get('training_info', {})
+    execution_time = time.time() - start_time
+    log_prediction(
+        logger, endpoint="/models/flights/departure-sweep",
+        input_payload={"route": f"{request.origin}-{request.destination}", "airline": airline, "slots": int(delays.size)},
+        output_summary={"best": f"{best['date']} {best['departure_time']}", "predicted_delay": best['predicted_delay']}
+    )
+    logger.info(f"Barrido de horarios completado en {execution_time:.3f}s: {delays.size} predicciones")
+    
+    return FlightDepartureSweepResponse(
+        route=f"{request.origin} → {request.destination}",
+        airline=airline,
+        departure_times=slot_labels,
+        days=days,
+        best=best,
+        model_info={
+            'predictions': int(delays.size),
+            'slot_minutes': request.slot_minutes,
+            'confidence_level': min(training_info.get('r2_score', 0.8) * 100, 95.0),
+            'execution_time': round(execution_time, 4)
+        }
+    )
+
+@app.get("/models/flights/prediction-cache")
+def prediction_cache_stats():
+    """Métricas de la caché de predicciones (aciertos, tamaño, invalidaciones)"""
+    return _prediction_cache.stats()
+
+@app.post("/models/flights/reload")
+def reload_model():
+    """Recarga el modelo de vuelos desde disco e invalida la caché de predicciones"""
+    logger.info("Recarga del modelo de vuelos solicitada")
+    reload_flights_model()
+    return {"status": "reloaded", "prediction_cache": _prediction_cache.stats()}
+
 @app.get("/health")
 def health():
     logger.info("Health check solicitado para Flights API")
@@ -333,7 +803,11 @@ def health():
             "model_available": True,
             "model_type": "Machine Learning - Random Forest",
             "model_file": "flight_delay_v1_2025-10-25.pkl",
-            "endpoints": ["/models/flights/predict"],
+            "compiled_engine": _compiled_model is not None,
+            "prediction_cache": _prediction_cache.stats(),
+            "route_index_routes": len(_route_index) if _route_index is not None else 0,
+            "endpoints": ["/models/flights/predict", "/models/flights/predict-batch", "/models/flights/departure-sweep",
+                          "/models/flights/prediction-cache", "/models/flights/reload"],
             "supported_airlines": ["UA", "AA", "DL", "WN", "B6", "AS", "NK", "F9", "G4", "SY"],
             "supported_airports": ["SFO", "JFK", "LAX", "ORD", "DFW", "DEN", "ATL", "SEA", "LAS", "PHX"]
         }
@@ -1,15 +1,25 @@
 """
 API de Películas - Sistema de Recomendación usando KNN
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import pickle
 import pandas as pd
 import numpy as np
 import os
 import sys
+import json
+import threading
 from typing import Dict, List, Optional
-from ..models.movies_api_models import MovieRecommendationRequest, MovieRecommendationResponse, MovieRatingRequest, MovieRatingResponse
+from ..models.movies_api_models import MovieRecommendationRequest, MovieRecommendationResponse, MovieRatingRequest, MovieRatingResponse, MovieRatingBatchRequest, MovieRatingIngestRequest
+from movies.ratings_index import RatingsIndex
+from movies.movielens_cache import RatingsTable, load_movielens, read_cache_meta
+from movies.item_neighbors import ItemNeighbors, load_or_build_item_neighbors, recompute_item_neighbors_row
+from movies.ratings_log import RatingsLog, RatingsOverlay
+from movies.search_index import TitleIndex, GenreIndex
+from movies.recommenders import genre_similar_movies, recommend_for_user
+from movies.topn_cache import TopNStore, TopNTable, rebuild_topn_cache
 
 # Logging utilities
 from ..config_logger import get_api_logger, log_model_loading, log_prediction
@@ -27,10 +37,63 @@ logger = get_api_logger("movies_api")
 _loaded_model_data = None
 _movies_data = None
 _ratings_data = None
+_ratings_index = None
+_item_neighbors = None
+_title_index = None
+_genre_index = None
+_topn_store = None
+_topn_source = None
+_ratings_overlay = None
+_ratings_log = None
+_ingest_lock = threading.Lock()
+# Ratings en línea aplicados (reaplicados del log + recibidos): forma parte de la firma
+# de la tabla top-N, que se calcula con los promedios y vecinos vigentes
+_ingest_generation = 0
+_topn_refresh_lock = threading.Lock()
+
+def load_sample_movies_data():
+    """Datos de ejemplo usados cuando no están disponibles los CSV de MovieLens"""
+    movies_df = pd.DataFrame({
+        'movieId': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+        'title': [
+            'Toy Story (1995)',
+            'Jumanji (1995)', 
+            'Grumpier Old Men (1995)',
+            'Waiting to Exhale (1995)',
+            'Father of the Bride Part II (1995)',
+            'Heat (1995)',
+            'Sabrina (1995)',
+            'Tom and Huck (1995)',
+            'Sudden Death (1995)',
+            'GoldenEye (1995)'
+        ],
+        'genres': [
+            'Adventure|Animation|Children|Comedy|Fantasy',
+            'Adventure|Children|Fantasy',
+            'Comedy|Romance',
+            'Comedy|Drama|Romance',
+            'Comedy',
+            'Action|Crime|Thriller',
+            'Comedy|Romance',
+            'Adventure|Children',
+            'Action',
+            'Action|Adventure|Thriller'
+        ]
+    })
+    
+    # Datos de ratings simulados
+    ratings_df = pd.DataFrame({
+        'userId': [1, 1, 1, 2, 2, 3, 3, 3],
+        'movieId': [1, 2, 3, 1, 4, 2, 3, 5],
+        'rating': [4.0, 3.5, 4.5, 5.0, 3.0, 4.0, 4.5, 3.5]
+    })
+    
+    return movies_df, RatingsTable.from_dataframes(movies_df, ratings_df)
 
 def load_movies_model_and_data():
     """Carga el modelo KNN y los datos de películas"""
-    global _loaded_model_data, _movies_data, _ratings_data
+    global _loaded_model_data, _movies_data, _ratings_data, _ratings_index, _item_neighbors, _title_index, _genre_index
+    global _topn_store, _topn_source, _ratings_overlay, _ratings_log
     
     if _loaded_model_data is not None:
         return _loaded_model_data, _movies_data, _ratings_data
@@ -41,49 +104,61 @@ def load_movies_model_and_data():
         with open(model_path, 'rb') as f:
             knn_model = pickle.load(f)
         
-        # Cargar datos de películas (simulados para el ejemplo)
-        # En un caso real, cargarías desde archivos CSV
-        _movies_data = pd.DataFrame({
-            'movieId': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
-            'title': [
-                'Toy Story (1995)',
-                'Jumanji (1995)', 
-                'Grumpier Old Men (1995)',
-                'Waiting to Exhale (1995)',
-                'Father of the Bride Part II (1995)',
-                'Heat (1995)',
-                'Sabrina (1995)',
-                'Tom and Huck (1995)',
-                'Sudden Death (1995)',
-                'GoldenEye (1995)'
-            ],
-            'genres': [
-                'Adventure|Animation|Children|Comedy|Fantasy',
-                'Adventure|Children|Fantasy',
-                'Comedy|Romance',
-                'Comedy|Drama|Romance',
-                'Comedy',
-                'Action|Crime|Thriller',
-                'Comedy|Romance',
-                'Adventure|Children',
-                'Action',
-                'Action|Adventure|Thriller'
-            ]
-        })
+        # Cargar catálogo y ratings de MovieLens (caché columnar con memory-map)
+        try:
+            _movies_data, _ratings_data = load_movielens(const.CSV_MOVIES_PATH, const.CSV_RATINGS_PATH, const.MOVIELENS_CACHE_DIR)
+            data_source = 'movielens'
+        except FileNotFoundError as e:
+            logger.warning(f"MovieLens no disponible, usando datos de ejemplo: {str(e)}")
+            _movies_data, _ratings_data = load_sample_movies_data()
+            data_source = 'sample'
         
-        # Datos de ratings simulados
-        _ratings_data = pd.DataFrame({
-            'userId': [1, 1, 1, 2, 2, 3, 3, 3],
-            'movieId': [1, 2, 3, 1, 4, 2, 3, 5],
-            'rating': [4.0, 3.5, 4.5, 5.0, 3.0, 4.0, 4.5, 3.5]
-        })
+        # El catálogo está ordenado por movieId: la posición de cada fila coincide
+        # con el índice denso de la película en la tabla e índice de ratings
+        _ratings_index = RatingsIndex.from_table(_ratings_data)
+        _ratings_overlay = RatingsOverlay(_ratings_data)
+        
+        # Vecinos item-item precalculados sobre la matriz CSR usuario x película
+        if data_source == 'movielens':
+            _item_neighbors = load_or_build_item_neighbors(
+                _ratings_data, knn_model,
+                out_dir=const.MOVIELENS_CACHE_DIR / 'neighbors',
+                source=read_cache_meta(const.MOVIELENS_CACHE_DIR)
+            )
+        else:
+            _item_neighbors = load_or_build_item_neighbors(_ratings_data, knn_model)
+        
+        # Reaplicar los ratings recibidos en línea (log append-only) sobre la tabla base;
+        # con los datos de ejemplo los ratings nuevos solo viven en memoria
+        _ratings_log = RatingsLog(const.RATINGS_LOG_PATH) if data_source == 'movielens' else None
+        replayed = 0
+        for record in (_ratings_log.replay() if _ratings_log is not None else []):
+            if apply_rating(record['userId'], record['movieId'], record['rating']) is not False:
+                replayed += 1
+        if replayed:
+            logger.info(f"Ratings en línea reaplicados desde el log: {replayed}")
+        
+        # Índices de búsqueda por título (desempate por popularidad) y por género
+        _title_index = TitleIndex(_movies_data['title'].tolist(), popularity=_ratings_index.movie_count)
+        _genre_index = GenreIndex(_movies_data['genres'].tolist())
+        
+        # Tabla top-N versionada (solo con MovieLens); si falta o está desactualizada
+        # se reconstruye en segundo plano y mientras tanto se calcula en línea
+        if data_source == 'movielens':
+            _topn_store = TopNStore(const.MOVIELENS_CACHE_DIR / 'topn')
+            _topn_source = {"movielens": read_cache_meta(const.MOVIELENS_CACHE_DIR), "neighbors_k": _item_neighbors.k}
+            if get_topn_table() is None:
+                threading.Thread(target=refresh_topn_cache, daemon=True).start()
+        logger.info(f"Datos de películas cargados ({data_source}): {len(_movies_data)} películas, {len(_ratings_data)} ratings")
         
         _loaded_model_data = {
             'model': knn_model,
             'model_info': {
                 'type': 'K-Nearest Neighbors',
-                'algorithm': 'cosine similarity',
-                'n_neighbors': getattr(knn_model, 'n_neighbors', 11)
+                'algorithm': 'item-item cosine similarity (CSR user-item matrix)',
+                'n_neighbors': getattr(knn_model, 'n_neighbors', 11),
+                'precomputed_neighbors': _item_neighbors.k,
+                'data_source': data_source
             }
         }
         
@@ -104,125 +179,234 @@ def load_movies_model_and_data():
 
         raise HTTPException(status_code=500, detail=f"Error cargando modelo: {str(e)}")
 
-def get_movie_recommendations_by_similarity(movie_id, num_recommendations=5):
-    """Obtiene recomendaciones basadas en similitud de películas"""
-    model_data, movies_df, ratings_df = load_movies_model_and_data()
+def get_ratings_index() -> RatingsIndex:
+    """Retorna el índice de estadísticas de ratings (cargando los datos si es necesario)"""
+    load_movies_model_and_data()
+    return _ratings_index
+
+def get_item_neighbors() -> ItemNeighbors:
+    """Retorna los vecinos item-item precalculados (cargando los datos si es necesario)"""
+    load_movies_model_and_data()
+    return _item_neighbors
+
+def get_title_index() -> TitleIndex:
+    """Retorna el índice de búsqueda por título (cargando los datos si es necesario)"""
+    load_movies_model_and_data()
+    return _title_index
+
+def get_genre_index() -> GenreIndex:
+    """Retorna el índice invertido de géneros (cargando los datos si es necesario)"""
+    load_movies_model_and_data()
+    return _genre_index
+
+def get_ratings_overlay() -> RatingsOverlay:
+    """Retorna los ratings en línea sobre la tabla base (cargando los datos si es necesario)"""
+    load_movies_model_and_data()
+    return _ratings_overlay
+
+def apply_rating(user_id, movie_id, rating, ratings_log=None, timestamp=None):
+    """
+    Aplica un rating en memoria: estadísticas incrementales, ratings en línea y
+    vecinos afectados marcados para recalcular.
     
-    # Buscar película
-    movie_info = movies_df[movies_df['movieId'] == movie_id]
-    if movie_info.empty:
-        return []
+    Si se pasa ``ratings_log``, el rating se agrega al log bajo el mismo lock, de modo
+    que el orden del log coincide con el orden en que se aplicaron los ratings.
     
-    movie_title = movie_info.iloc[0]['title']
-    movie_genres = movie_info.iloc[0]['genres'].split('|')
+    Returns:
+        Rating anterior del usuario para la película (None si no había) o False
+        si la película no está en el catálogo
+    """
+    movie_code = _ratings_index.movie_code(movie_id)
+    if movie_code is None:
+        return False
     
-    # Encontrar películas similares por género
-    similar_movies = []
-    for _, movie in movies_df.iterrows():
-        if movie['movieId'] != movie_id:
-            movie_genres_list = movie['genres'].split('|')
-            # Calcular similitud de géneros
-            common_genres = set(movie_genres).intersection(set(movie_genres_list))
-            similarity = len(common_genres) / len(set(movie_genres).union(set(movie_genres_list)))
-            
-            if similarity > 0:
-                # Obtener rating promedio
-                movie_ratings = ratings_df[ratings_df['movieId'] == movie['movieId']]
-                avg_rating = movie_ratings['rating'].mean() if not movie_ratings.empty else 3.5
-                
-                similar_movies.append({
-                    'movieId': movie['movieId'],
-                    'title': movie['title'],
-                    'genres': movie['genres'],
-                    'similarity': similarity,
-                    'avg_rating': avg_rating,
-                    'common_genres': list(common_genres)
-                })
+    global _ingest_generation
+    with _ingest_lock:
+        if ratings_log is not None:
+            ratings_log.append(user_id, movie_id, rating, timestamp)
+        _ingest_generation += 1
+        user_code = _ratings_index.user_code(user_id)
+        previous = _ratings_overlay.current_rating(user_code, movie_code) if user_code is not None else None
+        user_code = _ratings_index.add_rating(user_id, movie_code, rating, previous)
+        _ratings_overlay.set(user_code, movie_code, rating)
+        
+        # La película calificada y las demás del usuario cambian su similitud coseno entre sí
+        rated_codes, _ = _ratings_overlay.user_ratings(user_code)
+        _item_neighbors.mark_stale(rated_codes)
+    return previous
+
+def current_topn_source() -> Optional[dict]:
+    """Firma de las entradas de la tabla top-N: caché de MovieLens, k y ratings en línea aplicados"""
+    if _topn_source is None:
+        return None
+    return {**_topn_source, "online_ratings": _ingest_generation}
+
+def get_topn_table() -> Optional[TopNTable]:
+    """Versión vigente de la tabla top-N si corresponde a los datos cargados, o None"""
+    if _topn_store is None:
+        return None
+    table = _topn_store.current()
+    if table is None or table.meta.get("source") != current_topn_source():
+        return None
+    return table
+
+def schedule_topn_refresh():
+    """
+    Reconstruye la tabla top-N en segundo plano tras recibir ratings. Hay a lo sumo una
+    reconstrucción en curso: si llegan ratings mientras tanto, al terminar se repite.
+    """
+    if _topn_store is None or not _topn_refresh_lock.acquire(blocking=False):
+        return
     
-    # Ordenar por similitud y rating
-    similar_movies.sort(key=lambda x: (x['similarity'], x['avg_rating']), reverse=True)
+    def _refresh():
+        try:
+            while True:
+                generation = _ingest_generation
+                refresh_topn_cache()
+                if generation == _ingest_generation:
+                    break
+        finally:
+            _topn_refresh_lock.release()
     
-    return similar_movies[:num_recommendations]
+    threading.Thread(target=_refresh, daemon=True).start()
 
-def get_user_recommendations(user_id, num_recommendations=5):
-    """Obtiene recomendaciones para un usuario específico"""
-    model_data, movies_df, ratings_df = load_movies_model_and_data()
+def refresh_topn_cache(force=False):
+    """Reconstruye la tabla top-N si sus entradas cambiaron (o si force=True)"""
+    if _topn_store is None:
+        return None
+    try:
+        logger.info("Reconstruyendo tabla top-N de recomendaciones")
+        version = rebuild_topn_cache(
+            _topn_store.root, _ratings_data, _ratings_index, _genre_index, _item_neighbors,
+            source=current_topn_source(), force=force
+        )
+        _topn_store.reload()
+        logger.info(f"Tabla top-N vigente: {version}")
+        return version
+    except Exception as e:
+        logger.error(f"Error reconstruyendo la tabla top-N: {str(e)}")
+        return None
+
+def _similar_movies_payload(movie_code, codes, similarities):
+    """Arma la respuesta de películas similares a partir de índices densos"""
+    model_data, movies_df, ratings_table = load_movies_model_and_data()
+    ratings_index = get_ratings_index()
     
-    # Obtener las películas que el usuario ha calificado positivamente (>= 4.0)
-    user_ratings = ratings_df[ratings_df['userId'] == user_id]
-    if user_ratings.empty:
+    movie_genres = set(movies_df['genres'].iat[movie_code].split('|'))
+    recommendations = []
+    for code, similarity in zip(codes, similarities):
+        genres = movies_df['genres'].iat[code]
+        recommendations.append({
+            'movieId': int(ratings_index.movie_ids[code]),
+            'title': movies_df['title'].iat[code],
+            'genres': genres,
+            'similarity': float(similarity),
+            'avg_rating': float(ratings_index.movie_mean[code]),
+            'common_genres': list(movie_genres.intersection(genres.split('|')))
+        })
+    return recommendations
+
+def get_movie_recommendations_by_similarity(movie_id, num_recommendations=5, genre_mask=None):
+    """Obtiene recomendaciones basadas en similitud de películas (vecinos item-item)"""
+    ratings_index = get_ratings_index()
+    
+    # Buscar película
+    movie_code = ratings_index.movie_code(movie_id)
+    if movie_code is None:
         return []
     
-    liked_movies = user_ratings[user_ratings['rating'] >= 4.0]['movieId'].tolist()
+    # Lista precalculada en la tabla top-N (solo sin filtros ni ratings en línea que la afecten)
+    item_neighbors = get_item_neighbors()
+    topn_table = get_topn_table() if genre_mask is None and not item_neighbors.is_modified(movie_code) else None
+    cached = topn_table.movie_list(movie_code, num_recommendations) if topn_table is not None else None
+    if cached is not None:
+        return _similar_movies_payload(movie_code, *cached)
     
-    # Encontrar géneros preferidos del usuario
-    preferred_genres = []
-    for movie_id in liked_movies:
-        movie_info = movies_df[movies_df['movieId'] == movie_id]
-        if not movie_info.empty:
-            genres = movie_info.iloc[0]['genres'].split('|')
-            preferred_genres.extend(genres)
+    # Fila afectada por ratings en línea: se recalcula al consultarla
+    if item_neighbors.is_stale(movie_code):
+        with _ingest_lock:
+            codes, similarities = recompute_item_neighbors_row(_ratings_data, _ratings_overlay, movie_code, item_neighbors.k)
+            item_neighbors.set_row(movie_code, codes, similarities)
     
-    # Contar géneros más frecuentes
-    from collections import Counter
-    genre_counts = Counter(preferred_genres)
-    top_genres = [genre for genre, count in genre_counts.most_common(3)]
+    # Vecinos colaborativos precalculados: un solo slice por película
+    if genre_mask is None:
+        neighbor_codes, similarities = item_neighbors.neighbors_of(movie_code, num_recommendations)
+    else:
+        # Con filtro de género se recorre la fila completa de vecinos antes de recortar
+        neighbor_codes, similarities = item_neighbors.neighbors_of(movie_code)
+        in_genre = genre_mask[neighbor_codes]
+        neighbor_codes = neighbor_codes[in_genre][:num_recommendations]
+        similarities = similarities[in_genre][:num_recommendations]
+    if len(neighbor_codes) == 0:
+        # Película sin ratings suficientes: usar similitud por género
+        return get_movie_recommendations_by_genre(movie_code, num_recommendations, genre_mask)
     
-    # Recomendar películas no vistas con géneros similares
-    unrated_movies = movies_df[~movies_df['movieId'].isin(user_ratings['movieId'])]
-    recommendations = []
+    return _similar_movies_payload(movie_code, neighbor_codes, similarities)
+
+def get_movie_recommendations_by_genre(movie_code, num_recommendations=5, genre_mask=None):
+    """Obtiene recomendaciones basadas en similitud de géneros (respaldo sin ratings)"""
+    codes, similarities = genre_similar_movies(
+        get_genre_index(), get_ratings_index().movie_mean, movie_code, num_recommendations, genre_mask
+    )
+    return _similar_movies_payload(movie_code, codes, similarities)
+
+def get_user_recommendations(user_id, num_recommendations=5, genre_mask=None):
+    """Obtiene recomendaciones para un usuario específico"""
+    model_data, movies_df, ratings_table = load_movies_model_and_data()
+    ratings_index = get_ratings_index()
+    genre_index = get_genre_index()
     
-    for _, movie in unrated_movies.iterrows():
-        movie_genres = movie['genres'].split('|')
-        genre_match = any(genre in top_genres for genre in movie_genres)
-        
-        if genre_match:
-            # Calcular score basado en rating promedio
-            movie_ratings = ratings_df[ratings_df['movieId'] == movie['movieId']]
-            avg_rating = movie_ratings['rating'].mean() if not movie_ratings.empty else 3.5
-            
-            # Calcular similitud con géneros preferidos
-            common_genres = set(top_genres).intersection(set(movie_genres))
-            genre_similarity = len(common_genres) / len(top_genres) if top_genres else 0
-            
-            recommendations.append({
-                'movieId': movie['movieId'],
-                'title': movie['title'],
-                'genres': movie['genres'],
-                'predicted_rating': avg_rating + (genre_similarity * 0.5),
-                'avg_rating': avg_rating,
-                'genre_match': list(common_genres)
-            })
+    user_code = ratings_index.user_code(user_id)
+    if user_code is None:
+        return []
+    
+    # Lista precalculada en la tabla top-N (solo sin filtros ni ratings en línea del usuario)
+    ratings_overlay = get_ratings_overlay()
+    topn_table = get_topn_table() if genre_mask is None and user_code not in ratings_overlay.users else None
+    cached = topn_table.user_list(user_code, num_recommendations) if topn_table is not None else None
+    if cached is not None:
+        codes, scores, genre_cols = cached
+    else:
+        # Películas no vistas de los géneros preferidos (ratings >= 4.0) del usuario
+        rated_codes, user_scores = ratings_overlay.user_ratings(user_code)
+        if len(rated_codes) == 0:
+            return []
+        codes, scores, genre_cols = recommend_for_user(
+            genre_index, ratings_index.movie_mean, rated_codes, user_scores, num_recommendations, genre_mask
+        )
     
-    # Ordenar por predicción de rating
-    recommendations.sort(key=lambda x: x['predicted_rating'], reverse=True)
+    top_genres = [genre_index.names[col] for col in genre_cols]
+    recommendations = []
+    for code, predicted_rating in zip(codes, scores):
+        genres = movies_df['genres'].iat[code]
+        movie_genres = genres.split('|')
+        recommendations.append({
+            'movieId': int(ratings_index.movie_ids[code]),
+            'title': movies_df['title'].iat[code],
+            'genres': genres,
+            'predicted_rating': float(predicted_rating),
+            'avg_rating': float(ratings_index.movie_mean[code]),
+            'genre_match': [genre for genre in top_genres if genre in movie_genres]
+        })
     
-    return recommendations[:num_recommendations]
+    return recommendations
 
 def predict_user_rating(user_id, movie_id):
     """Predice el rating que un usuario daría a una película"""
-    model_data, movies_df, ratings_df = load_movies_model_and_data()
-    
-    # Obtener ratings del usuario
-    user_ratings = ratings_df[ratings_df['userId'] == user_id]
-    user_avg = user_ratings['rating'].mean() if not user_ratings.empty else 3.5
-    
-    # Obtener info de la película
-    movie_info = movies_df[movies_df['movieId'] == movie_id]
-    if movie_info.empty:
-        return user_avg, 50.0
-    
-    # Calcular rating promedio de la película
-    movie_ratings = ratings_df[ratings_df['movieId'] == movie_id]
-    movie_avg = movie_ratings['rating'].mean() if not movie_ratings.empty else 3.5
-    
-    # Predicción simple basada en promedios y preferencias del usuario
-    prediction = (user_avg * 0.6) + (movie_avg * 0.4)
+    prediction, confidence = predict_user_ratings_batch([user_id], [movie_id])
+    return float(prediction[0]), float(confidence[0])
+
+def predict_user_ratings_batch(user_ids, movie_ids):
+    """
+    Predice ratings para arreglos de user_id / movie_id (misma fórmula que predict_user_rating)
     
-    # Confianza basada en datos disponibles
-    confidence = 60 + min(30, len(user_ratings) * 3) + min(10, len(movie_ratings))
+    Predicción simple basada en promedios del usuario y de la película; la confianza
+    depende de la cantidad de ratings disponibles.
     
-    return prediction, confidence
+    Returns:
+        (ratings predichos, confianza en %) como arreglos de NumPy
+    """
+    return get_ratings_index().predict_batch(user_ids, movie_ids)
 
 @app.get("/")
 def root():
@@ -234,46 +418,65 @@ def recommend_movies(request: MovieRecommendationRequest):
     Recomienda películas basadas en similitud o preferencias del usuario
     """
     try:
-        logger.info(f"Recomendación solicitada: user_id={request.user_id} movie_id={request.movie_id} num_recs={request.num_recommendations}")
+        logger.info(f"Recomendación solicitada: user_id={request.user_id} movie_id={request.movie_id} movie_title={request.movie_title} genre={request.genre} num_recs={request.num_recommendations}")
         num_recs = request.num_recommendations or 5
         recommendations = []
+        model_data, movies_df, ratings_df = load_movies_model_and_data()
+        ratings_index = get_ratings_index()
         
-        if request.movie_id:
+        # Resolver el título aproximado a un movieId
+        movie_id = request.movie_id
+        resolved_title = None
+        if not movie_id and request.movie_title:
+            movie_code = get_title_index().resolve(request.movie_title)
+            if movie_code is not None:
+                movie_id = int(ratings_index.movie_ids[movie_code])
+                resolved_title = movies_df['title'].iat[movie_code]
+            else:
+                logger.warning(f"Título no encontrado en el catálogo: {request.movie_title}")
+        
+        # Filtro de género: se aplica sobre los candidatos antes de calcular scores
+        genre_name = genre_mask = genre_codes = None
+        if request.genre:
+            genre_index = get_genre_index()
+            genre_name = genre_index.resolve(request.genre)
+            if genre_name is not None:
+                genre_codes = genre_index.codes(genre_name)
+                genre_mask = genre_index.mask(genre_name)
+            else:
+                logger.warning(f"Género no reconocido: {request.genre}")
+        
+        if movie_id:
             # Recomendaciones basadas en película específica
-            recommendations = get_movie_recommendations_by_similarity(request.movie_id, num_recs)
-            recommendation_type = f"películas similares a ID {request.movie_id}"
+            recommendations = get_movie_recommendations_by_similarity(movie_id, num_recs, genre_mask)
+            if resolved_title:
+                recommendation_type = f"películas similares a '{resolved_title}'"
+            else:
+                recommendation_type = f"películas similares a ID {movie_id}"
             
         elif request.user_id:
             # Recomendaciones para usuario específico
-            recommendations = get_user_recommendations(request.user_id, num_recs)
+            recommendations = get_user_recommendations(request.user_id, num_recs, genre_mask)
             recommendation_type = f"recomendaciones personalizadas para usuario {request.user_id}"
             
         else:
-            # Recomendaciones generales (películas mejor calificadas)
-            model_data, movies_df, ratings_df = load_movies_model_and_data()
-            movie_scores = []
-            
-            for _, movie in movies_df.iterrows():
-                movie_ratings = ratings_df[ratings_df['movieId'] == movie['movieId']]
-                avg_rating = movie_ratings['rating'].mean() if not movie_ratings.empty else 3.5
-                rating_count = len(movie_ratings)
-                
-                # Score combinado de rating y popularidad
-                score = avg_rating + (rating_count * 0.1)
-                
-                movie_scores.append({
-                    'movieId': movie['movieId'],
-                    'title': movie['title'],
-                    'genres': movie['genres'],
-                    'avg_rating': avg_rating,
-                    'rating_count': rating_count,
-                    'score': score
-                })
-            
-            movie_scores.sort(key=lambda x: x['score'], reverse=True)
-            recommendations = movie_scores[:num_recs]
+            # Recomendaciones generales (películas mejor calificadas según el score bayesiano)
+            recommendations = [
+                {
+                    'movieId': int(ratings_index.movie_ids[code]),
+                    'title': movies_df['title'].iat[code],
+                    'genres': movies_df['genres'].iat[code],
+                    'avg_rating': float(ratings_index.movie_mean[code]),
+                    'rating_count': int(ratings_index.movie_count[code]),
+                    'score': float(ratings_index.movie_score[code])
+                }
+                for code in ratings_index.top_rated(num_recs, genre_codes)
+            ]
             recommendation_type = "películas mejor calificadas"
         
+        if genre_name:
+            recommendation_type += f" (género: {genre_name})"
+        
         # Crear interpretación
         if recommendations:
             top_movie = recommendations[0]
@@ -296,8 +499,6 @@ def recommend_movies(request: MovieRecommendationRequest):
         else:
             interpretation = "❌ No se encontraron recomendaciones con los criterios especificados."
         
-        model_data, _, _ = load_movies_model_and_data()
-        
         # Log prediction / recommendation
         try:
             log_prediction(logger, endpoint="/models/movies/recommend", input_payload=request.dict(), output_summary={"recommendations_count": len(recommendations)})
@@ -310,7 +511,9 @@ def recommend_movies(request: MovieRecommendationRequest):
                 "model_type": model_data['model_info']['type'],
                 "algorithm": model_data['model_info']['algorithm'],
                 "recommendations_count": len(recommendations),
-                "recommendation_type": recommendation_type
+                "recommendation_type": recommendation_type,
+                "resolved_movie_id": movie_id,
+                "genre_filter": genre_name
             },
             interpretation=interpretation
         )
@@ -330,11 +533,11 @@ def predict_movie_rating(request: MovieRatingRequest):
         
         # Obtener información de la película
         model_data, movies_df, ratings_df = load_movies_model_and_data()
-        movie_info = movies_df[movies_df['movieId'] == request.movie_id]
+        movie_code = get_ratings_index().movie_code(request.movie_id)
         
-        if not movie_info.empty:
-            movie_title = movie_info.iloc[0]['title']
-            movie_genres = movie_info.iloc[0]['genres']
+        if movie_code is not None:
+            movie_title = movies_df['title'].iat[movie_code]
+            movie_genres = movies_df['genres'].iat[movie_code]
         else:
             movie_title = f"Película ID {request.movie_id}"
             movie_genres = "Desconocido"
@@ -388,6 +591,120 @@ def predict_movie_rating(request: MovieRatingRequest):
         logger.error(f"Error en predict_movie_rating: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+@app.post("/models/movies/predict-rating/batch")
+def predict_movie_ratings_batch(request: MovieRatingBatchRequest):
+    """
+    Predice ratings para muchos pares (usuario, película).
+    
+    La respuesta es NDJSON: una línea por bloque con los ratings y la confianza
+    de los pares [offset, offset + count) en el mismo orden de la solicitud.
+    """
+    if len(request.user_ids) != len(request.movie_ids):
+        raise HTTPException(status_code=400, detail="user_ids y movie_ids deben tener la misma longitud")
+    
+    try:
+        user_ids = np.asarray(request.user_ids, dtype=np.int64)
+        movie_ids = np.asarray(request.movie_ids, dtype=np.int64)
+        get_ratings_index()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error en predict_movie_ratings_batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    
+    chunk_size = max(1, request.chunk_size or 10000)
+    logger.info(f"Predict rating batch solicitado: {len(user_ids)} pares, bloques de {chunk_size}")
+    
+    def _chunks():
+        for start in range(0, len(user_ids), chunk_size):
+            prediction, confidence = predict_user_ratings_batch(
+                user_ids[start:start + chunk_size], movie_ids[start:start + chunk_size]
+            )
+            yield json.dumps({
+                "offset": start,
+                "count": len(prediction),
+                "predicted_rating": np.round(prediction, 2).tolist(),
+                "confidence": np.round(confidence, 1).tolist()
+            }) + "\n"
+        
+        try:
+            log_prediction(logger, endpoint="/models/movies/predict-rating/batch", input_payload={"pairs": len(user_ids)}, output_summary={"chunks": -(-len(user_ids) // chunk_size)})
+        except Exception:
+            logger.debug("log_prediction falló al registrar la predicción de ratings en lote")
+    
+    return StreamingResponse(_chunks(), media_type="application/x-ndjson")
+
+@app.post("/models/movies/ratings")
+def ingest_movie_rating(request: MovieRatingIngestRequest):
+    """
+    Registra un rating nuevo (o modificado) sin recargar los datos.
+    
+    El rating se agrega al log append-only y actualiza en memoria los promedios
+    de la película y del usuario; los vecinos afectados se recalculan al consultarlos.
+    """
+    if not 0.5 <= request.rating <= 5.0:
+        raise HTTPException(status_code=400, detail="El rating debe estar entre 0.5 y 5.0")
+    
+    ratings_index = get_ratings_index()
+    if ratings_index.movie_code(request.movie_id) is None:
+        raise HTTPException(status_code=404, detail=f"Película {request.movie_id} no encontrada en el catálogo")
+    
+    try:
+        logger.info(f"Rating recibido: user_id={request.user_id} movie_id={request.movie_id} rating={request.rating}")
+        previous = apply_rating(request.user_id, request.movie_id, request.rating,
+                                ratings_log=_ratings_log, timestamp=request.timestamp)
+        # Los promedios cambiaron: la tabla top-N vigente deja de corresponder
+        schedule_topn_refresh()
+        
+        movie_avg, movie_count = ratings_index.movie_stats(request.movie_id)
+        user_avg, user_count = ratings_index.user_stats(request.user_id)
+        
+        try:
+            log_prediction(logger, endpoint="/models/movies/ratings", input_payload=request.dict(), output_summary={"previous_rating": previous, "movie_rating_count": movie_count})
+        except Exception:
+            logger.debug("log_prediction falló al registrar el rating recibido")
+        
+        return {
+            "status": "ok",
+            "user_id": request.user_id,
+            "movie_id": request.movie_id,
+            "rating": request.rating,
+            "previous_rating": previous,
+            "movie_avg_rating": round(movie_avg, 3),
+            "movie_rating_count": movie_count,
+            "user_avg_rating": round(user_avg, 3),
+            "user_rating_count": user_count
+        }
+    except Exception as e:
+        logger.error(f"Error en ingest_movie_rating: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+@app.get("/models/movies/topn")
+def topn_status():
+    """Estado de la tabla top-N precalculada"""
+    load_movies_model_and_data()
+    table = get_topn_table()
+    if table is None:
+        return {"available": False, "building": _topn_store is not None}
+    return {
+        "available": True,
+        "version": table.version,
+        "built_at": table.meta.get("built_at"),
+        "top_n": table.top_n,
+        "active_users": table.meta.get("active_users"),
+        "movies_count": table.meta.get("movies_count")
+    }
+
+@app.post("/models/movies/topn/rebuild")
+def rebuild_topn(background_tasks: BackgroundTasks, force: bool = False):
+    """Programa la reconstrucción de la tabla top-N (solo si las entradas cambiaron, salvo force)"""
+    load_movies_model_and_data()
+    if _topn_store is None:
+        raise HTTPException(status_code=400, detail="La tabla top-N solo está disponible con los datos de MovieLens")
+    background_tasks.add_task(refresh_topn_cache, force)
+    logger.info(f"Reconstrucción de tabla top-N programada (force={force})")
+    return {"status": "scheduled", "force": force}
+
 @app.get("/health")
 def health():
     logger.info("Health check solicitado para Movies API")
@@ -399,7 +716,7 @@ def health():
             "model_loaded": True,
             "model_type": model_data['model_info']['type'],
             "movies_count": len(movies_df),
-            "ratings_count": len(ratings_df)
+            "ratings_count": len(get_ratings_overlay())
         }
     except Exception as e:
         error_msg = f"Error en health check de Movies: {str(e)}"
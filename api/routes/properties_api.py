@@ -2,192 +2,342 @@
 API de Propiedades - Predicción de Precios usando Random Forest
 """
 from fastapi import FastAPI, HTTPException
+from joblib import parallel_backend
 import pickle
 import pandas as pd
 import numpy as np
 import os
-from ..models.properties_api_models import PropertyPredictionRequest, PropertyPredictionResponse
+import time
+from typing import List, Optional
+from ..models.properties_api_models import (PropertyFeatures, PropertyPredictionRequest, PropertyPredictionResponse,
+                                            PropertyBatchPredictionRequest, PropertyBatchPredictionResponse,
+                                            PropertyBatchPrediction, PropertyComparable)
+from ..tree_engine import compile_model, predict_rows
+from ..data_sources import load_or_rebuild
 
-# Importar constantes desde el paquete api
+# Importar constantes y logger
 from .. import constants as const
+from ..config_logger import get_api_logger, log_model_loading, log_prediction
+from properties.comparables import ComparablesIndex, build_comparables_index, load_comparables_index
 
 app = FastAPI(title="Properties Price Prediction API", version="1.0.0")
 
-# Variable global para el modelo
+# Configurar logger específico para esta API
+logger = get_api_logger("properties_api", console_output=False)
+
+# Variable global para el modelo y su versión compilada (árboles aplanados)
 _loaded_model_data = None
+_compiled_model = None
+
+# Índice de propiedades comparables (KD-tree) construido a partir de properties_2016.csv
+_comparables_index = None
+_comparables_loaded = False
+
+# Desde cuántas filas los árboles se recorren en paralelo en todos los núcleos (n_jobs=-1)
+PARALLEL_MIN_ROWS = 1024
+
+# Estas son todas las características que el modelo espera (del modelo.feature_names_in_)
+EXPECTED_COLUMNS = [
+    'airconditioningtypeid', 'architecturalstyletypeid', 'basementsqft',
+    'bathroomcnt', 'bedroomcnt', 'buildingclasstypeid', 'buildingqualitytypeid',
+    'calculatedbathnbr', 'finishedfloor1squarefeet',
+    'calculatedfinishedsquarefeet', 'finishedsquarefeet12',
+    'finishedsquarefeet13', 'finishedsquarefeet15', 'finishedsquarefeet50',
+    'finishedsquarefeet6', 'fips', 'fullbathcnt', 'garagecarcnt',
+    'garagetotalsqft', 'heatingorsystemtypeid', 'latitude', 'longitude',
+    'lotsizesquarefeet', 'poolcnt', 'propertylandusetypeid',
+    'rawcensustractandblock', 'regionidcity', 'regionidcounty',
+    'regionidneighborhood', 'regionidzip', 'roomcnt', 'threequarterbathnbr',
+    'typeconstructiontypeid', 'unitcnt', 'yardbuildingsqft17',
+    'yardbuildingsqft26', 'yearbuilt', 'numberofstories',
+    'structuretaxvaluedollarcnt', 'assessmentyear', 'landtaxvaluedollarcnt',
+    'taxamount', 'taxdelinquencyflag', 'taxdelinquencyyear',
+    'censustractandblock'
+]
+
+# Valores por defecto razonables para características no proporcionadas (el resto es 0)
+DEFAULT_FEATURE_VALUES = {
+    'bathroomcnt': 2.0,
+    'bedroomcnt': 3.0,
+    'calculatedbathnbr': 2.0,
+    'calculatedfinishedsquarefeet': 1500.0,
+    'fips': 6037.0,  # Los Angeles County
+    'fullbathcnt': 2.0,
+    'latitude': 34.0522,
+    'longitude': -118.2437,
+    'lotsizesquarefeet': 5000.0,
+    'roomcnt': 4.0,  # Habitaciones + sala
+    'unitcnt': 1.0,
+    'yearbuilt': 1990.0,
+    'structuretaxvaluedollarcnt': 300000.0,
+    'assessmentyear': 2016.0,
+    'landtaxvaluedollarcnt': 200000.0,
+    'taxamount': 5000.0,
+    'censustractandblock': 6037.0
+}
+
+# Campos del request en el orden de las columnas de la matriz de entrada
+REQUEST_FIELDS = list(PropertyFeatures.model_fields)
+
+# Columnas del modelo que llena cada campo del request (además de las derivadas)
+REQUEST_FIELD_COLUMNS = {
+    'bathroomcnt': ['bathroomcnt', 'calculatedbathnbr'],
+    'finishedsquarefeet': ['calculatedfinishedsquarefeet']
+}
+
+def build_feature_template(expected_columns: List[str]):
+    """
+    Fila de características por defecto (float64, orden del modelo) y el índice de
+    columna de cada característica; se arman una sola vez al cargar el modelo.
+    """
+    column_index = {name: i for i, name in enumerate(expected_columns)}
+    template = np.zeros(len(expected_columns), dtype=np.float64)
+    for name, value in DEFAULT_FEATURE_VALUES.items():
+        template[column_index[name]] = value
+    return template, column_index
 
 def load_properties_model():
     """Carga el modelo Random Forest de propiedades (modelo ya entrenado, NO Pipeline)"""
-    global _loaded_model_data
+    global _loaded_model_data, _compiled_model
     if _loaded_model_data is not None:
         return _loaded_model_data
-    
+
+    model_path = os.path.join(const.BASE_DIR, 'ml_models', 'random_forest_properties.pkl')
     try:
-        model_path = os.path.join(const.BASE_DIR, 'ml_models', 'random_forest_properties.pkl')
+        logger.info(f"Iniciando carga del modelo de propiedades desde: {model_path}")
         with open(model_path, 'rb') as f:
             # El modelo guardado es solo el RandomForestRegressor, no un Pipeline
             model = pickle.load(f)
-        
-        # Estas son todas las características que el modelo espera (del modelo.feature_names_in_)
-        expected_columns = [
-            'airconditioningtypeid', 'architecturalstyletypeid', 'basementsqft',
-            'bathroomcnt', 'bedroomcnt', 'buildingclasstypeid', 'buildingqualitytypeid',
-            'calculatedbathnbr', 'finishedfloor1squarefeet',
-            'calculatedfinishedsquarefeet', 'finishedsquarefeet12',
-            'finishedsquarefeet13', 'finishedsquarefeet15', 'finishedsquarefeet50',
-            'finishedsquarefeet6', 'fips', 'fullbathcnt', 'garagecarcnt',
-            'garagetotalsqft', 'heatingorsystemtypeid', 'latitude', 'longitude',
-            'lotsizesquarefeet', 'poolcnt', 'propertylandusetypeid',
-            'rawcensustractandblock', 'regionidcity', 'regionidcounty',
-            'regionidneighborhood', 'regionidzip', 'roomcnt', 'threequarterbathnbr',
-            'typeconstructiontypeid', 'unitcnt', 'yardbuildingsqft17',
-            'yardbuildingsqft26', 'yearbuilt', 'numberofstories',
-            'structuretaxvaluedollarcnt', 'assessmentyear', 'landtaxvaluedollarcnt',
-            'taxamount', 'taxdelinquencyflag', 'taxdelinquencyyear',
-            'censustractandblock'
-        ]
-        
+
+        feature_template, column_index = build_feature_template(EXPECTED_COLUMNS)
         _loaded_model_data = {
             'model': model,  # RandomForestRegressor directo
-            'expected_columns': expected_columns,
+            'expected_columns': EXPECTED_COLUMNS,
+            'feature_template': feature_template,
+            'column_index': column_index,
             'model_info': {
                 'type': 'Random Forest Regressor',
-                'features_count': len(expected_columns),
+                'features_count': len(EXPECTED_COLUMNS),
                 'preprocessing': 'Modelo entrenado con todas las características del dataset'
             }
         }
-        print("✅ Modelo Random Forest de propiedades cargado exitosamente")
+        log_model_loading(logger, "Properties Price Model", model_path, True)
+
+        # Motor compilado verificado bit a bit contra scikit-learn (None si no aplica)
+        _compiled_model = compile_model(model)
+        if _compiled_model is not None:
+            logger.info(f"Motor compilado activo: {_compiled_model.n_trees} árboles, {_compiled_model.n_nodes} nodos")
+        else:
+            logger.warning("Motor compilado no disponible para el modelo de propiedades; se usa model.predict")
+
+        load_comparables_data()
         return _loaded_model_data
-        
+
     except Exception as e:
-        print(f"❌ Error cargando modelo: {e}")
+        log_model_loading(logger, "Properties Price Model", model_path, False, str(e))
         raise HTTPException(status_code=500, detail=f"Error cargando modelo: {str(e)}")
 
-def create_features_from_property_data(request: PropertyPredictionRequest):
+def load_comparables_data() -> Optional[ComparablesIndex]:
+    """
+    Carga el índice de comparables y construye su KD-tree; si no existe (o el CSV cambió)
+    y properties_2016.csv está disponible, lo construye una vez. Sin CSV ni índice las
+    predicciones se responden sin comparables.
+    """
+    global _comparables_index, _comparables_loaded
+
+    if _comparables_loaded:
+        return _comparables_index
+
+    index_path = const.COMPARABLES_INDEX_PATH
+    csv_path = const.CSV_PROPERTIES_PATH
+    try:
+        index = load_or_rebuild(index_path, csv_path, load_comparables_index, build_comparables_index, logger,
+                                "índice de comparables")
+
+        if index is None:
+            logger.warning(f"Índice de comparables no disponible ({index_path}); se responde sin comparables")
+        else:
+            start_time = time.time()
+            index.build_tree()
+            logger.info(f"Índice de comparables cargado: {len(index)} propiedades, "
+                        f"KD-tree en {time.time() - start_time:.2f}s ({index_path})")
+        _comparables_index = index
+    except Exception as e:
+        logger.error(f"Error cargando índice de comparables: {str(e)}")
+        _comparables_index = None
+
+    _comparables_loaded = True
+    return _comparables_index
+
+def find_comparables(request: PropertyPredictionRequest) -> Optional[List[PropertyComparable]]:
+    """Comparables más cercanos a la propiedad (en coordenadas y tamaño); None sin índice"""
+    index = load_comparables_data()
+    if index is None or request.comparables == 0:
+        return None
+    latitude = request.latitude if request.latitude is not None else DEFAULT_FEATURE_VALUES['latitude']
+    longitude = request.longitude if request.longitude is not None else DEFAULT_FEATURE_VALUES['longitude']
+    neighbors = index.query(latitude, longitude, k=request.comparables, sqft=request.finishedsquarefeet)
+    return [PropertyComparable(**neighbor) for neighbor in neighbors]
+
+def properties_to_matrix(properties: List[PropertyFeatures]) -> np.ndarray:
+    """Campos de los requests como matriz (n_propiedades, n_campos) con NaN donde no vienen"""
+    values = [[getattr(prop, field) for field in REQUEST_FIELDS] for prop in properties]
+    return np.array(values, dtype=np.float64)
+
+def build_feature_matrix(model_data, values: np.ndarray) -> np.ndarray:
     """
-    Crea todas las 45 características que el modelo espera desde el request.
-    Usa valores por defecto razonables para características no proporcionadas.
+    Crea las 45 características que el modelo espera para cada fila de ``values``
+    (salida de ``properties_to_matrix``): se copia la fila por defecto y se
+    sobrescriben por columna los campos proporcionados.
     """
+    column_index = model_data['column_index']
+    X = np.repeat(model_data['feature_template'][None, :], len(values), axis=0)
+
+    for i, field in enumerate(REQUEST_FIELDS):
+        column = values[:, i]
+        provided = ~np.isnan(column)
+        if not provided.any():
+            continue
+        for name in REQUEST_FIELD_COLUMNS.get(field, [field]):
+            X[provided, column_index[name]] = column[provided]
+        if field == 'bathroomcnt':
+            X[provided, column_index['fullbathcnt']] = np.maximum(1.0, np.trunc(column[provided]))
+        elif field == 'bedroomcnt':
+            X[provided, column_index['roomcnt']] = column[provided] + 1  # Habitaciones + sala
+    return X
+
+def create_features_from_property_data(request: PropertyFeatures) -> pd.DataFrame:
+    """DataFrame de una fila con las 45 características en el orden del modelo"""
     model_data = load_properties_model()
-    expected_columns = model_data["expected_columns"]
-    
-    # Características básicas que pueden venir del request
-    bedrooms = request.bedrooms if hasattr(request, 'bedrooms') and request.bedrooms else 3.0
-    bathrooms = request.bathrooms if hasattr(request, 'bathrooms') and request.bathrooms else 2.0
-    square_feet = request.square_feet if hasattr(request, 'square_feet') and request.square_feet else 1500.0
-    latitude = request.latitude if hasattr(request, 'latitude') and request.latitude else 34.0522
-    longitude = request.longitude if hasattr(request, 'longitude') and request.longitude else -118.2437
-    lot_size = request.lot_size if hasattr(request, 'lot_size') and request.lot_size else 5000.0
-    year_built = request.year_built if hasattr(request, 'year_built') and request.year_built else 1990
-    tax_amount = request.tax_amount if hasattr(request, 'tax_amount') and request.tax_amount else 5000.0
-    land_value = request.land_value if hasattr(request, 'land_value') and request.land_value else 200000.0
-    structure_value = request.structure_value if hasattr(request, 'structure_value') and request.structure_value else 300000.0
-    
-    # Crear el diccionario en el orden EXACTO que espera el modelo
-    features_dict = {
-        'airconditioningtypeid': 0.0,
-        'architecturalstyletypeid': 0.0,
-        'basementsqft': 0.0,
-        'bathroomcnt': bathrooms,
-        'bedroomcnt': bedrooms,
-        'buildingclasstypeid': 0.0,
-        'buildingqualitytypeid': 0.0,
-        'calculatedbathnbr': bathrooms,
-        'finishedfloor1squarefeet': 0.0,
-        'calculatedfinishedsquarefeet': square_feet,
-        'finishedsquarefeet12': 0.0,
-        'finishedsquarefeet13': 0.0,
-        'finishedsquarefeet15': 0.0,
-        'finishedsquarefeet50': 0.0,
-        'finishedsquarefeet6': 0.0,
-        'fips': 6037.0,  # Los Angeles County
-        'fullbathcnt': max(1, int(bathrooms)),
-        'garagecarcnt': 0.0,
-        'garagetotalsqft': 0.0,
-        'heatingorsystemtypeid': 0.0,
-        'latitude': latitude,
-        'longitude': longitude,
-        'lotsizesquarefeet': lot_size,
-        'poolcnt': 0.0,
-        'propertylandusetypeid': 0.0,
-        'rawcensustractandblock': 0.0,
-        'regionidcity': 0.0,
-        'regionidcounty': 0.0,
-        'regionidneighborhood': 0.0,
-        'regionidzip': 0.0,
-        'roomcnt': bedrooms + 1,  # Habitaciones + sala
-        'threequarterbathnbr': 0.0,
-        'typeconstructiontypeid': 0.0,
-        'unitcnt': 1.0,
-        'yardbuildingsqft17': 0.0,
-        'yardbuildingsqft26': 0.0,
-        'yearbuilt': year_built,
-        'numberofstories': 0.0,
-        'structuretaxvaluedollarcnt': structure_value,
-        'assessmentyear': 2016,
-        'landtaxvaluedollarcnt': land_value,
-        'taxamount': tax_amount,
-        'taxdelinquencyflag': 0.0,
-        'taxdelinquencyyear': 0.0,
-        'censustractandblock': 6037.0
-    }
-    
-    print(f"🔍 Features creadas ({len(features_dict)}): {list(features_dict.keys())}")
-    return features_dict
+    X = build_feature_matrix(model_data, properties_to_matrix([request]))
+    return pd.DataFrame(X, columns=model_data['expected_columns'])
+
+def predict_prices(model_data, features: pd.DataFrame) -> np.ndarray:
+    """
+    Predice todas las filas con una sola llamada al modelo. Los lotes pequeños usan el
+    motor compilado; los grandes, los árboles de scikit-learn en todos los núcleos.
+    """
+    model = model_data['model']
+    if len(features) < PARALLEL_MIN_ROWS or model.n_jobs is not None:
+        return np.asarray(predict_rows(model, _compiled_model, features), dtype=np.float64)
+    # Modelo sin n_jobs propio: todos los núcleos sin modificar el objeto compartido
+    # (la configuración de joblib es por hilo)
+    with parallel_backend('threading', n_jobs=-1):
+        return np.asarray(model.predict(features), dtype=np.float64)
+
+def calculate_confidence_scores(values: np.ndarray) -> np.ndarray:
+    """
+    Confianza (0-100) por propiedad según cuántas características se proporcionaron:
+    con menos datos pesan más los valores por defecto.
+    """
+    provided = (~np.isnan(values)).sum(axis=1) / values.shape[1]
+    return np.clip(50.0 + 45.0 * provided, 50.0, 95.0)
+
+def interpret_price(prediction: float, request: PropertyFeatures) -> str:
+    """Interpretación en lenguaje natural del precio estimado"""
+    if prediction < 200000:
+        category = "económico"
+    elif prediction < 600000:
+        category = "medio"
+    elif prediction < 1500000:
+        category = "alto"
+    else:
+        category = "de lujo"
+
+    details = []
+    if request.bedroomcnt is not None:
+        details.append(f"{request.bedroomcnt:g} habitaciones")
+    if request.bathroomcnt is not None:
+        details.append(f"{request.bathroomcnt:g} baños")
+    if request.finishedsquarefeet is not None:
+        details.append(f"{request.finishedsquarefeet:,.0f} pies cuadrados")
+    description = f" ({', '.join(details)})" if details else ""
+    return f"Precio estimado de ${prediction:,.2f} USD para la propiedad{description}, en el rango de precio {category}"
 
 @app.get("/")
 def root():
     return {"message": "Properties Price Prediction API", "version": "1.0.0"}
 
 @app.post("/predict", response_model=PropertyPredictionResponse)
+@app.post("/models/properties/predict", response_model=PropertyPredictionResponse)
 def predict_property_price(request: PropertyPredictionRequest):
     """Predice el precio de una propiedad usando el modelo Random Forest entrenado"""
+    start_time = time.time()
     try:
-        # Cargar modelo
         model_data = load_properties_model()
-        model = model_data['model']  # RandomForestRegressor directo
-        expected_columns = model_data['expected_columns']
-        
-        # Crear DataFrame de entrada
-        feature_data = create_features_from_property_data(request)
-        
-        # Verificar que tenemos todas las columnas esperadas
-        if len(feature_data) != len(expected_columns):
-            print(f"❌ Error: Número incorrecto de features. Esperado: {len(expected_columns)}, Recibido: {len(feature_data)}")
-            print(f"Features esperadas: {expected_columns}")
-            print(f"Features recibidas: {list(feature_data.keys())}")
-            raise HTTPException(status_code=400, detail="Número incorrecto de características")
-        
-        # Convertir a DataFrame con el orden correcto
-        df_input = pd.DataFrame([feature_data])[expected_columns]
-        
-        print(f"📊 Input DataFrame shape: {df_input.shape}")
-        print(f"📊 Input values: {df_input.iloc[0].to_dict()}")
-        
+        values = properties_to_matrix([request])
+        df_input = pd.DataFrame(build_feature_matrix(model_data, values), columns=model_data['expected_columns'])
+
         # Hacer predicción directa (el modelo ya está entrenado y no necesita preprocessing)
-        prediction = model.predict(df_input)[0]
-        
+        prediction = float(predict_prices(model_data, df_input)[0])
+
         # Validar predicción
-        if pd.isna(prediction) or prediction <= 0:
-            print(f"❌ Predicción inválida: {prediction}")
+        if np.isnan(prediction) or prediction <= 0:
+            logger.error(f"Predicción inválida: {prediction}")
             raise HTTPException(status_code=500, detail="Predicción inválida generada por el modelo")
-        
-        print(f"✅ Predicción exitosa: ${prediction:,.2f}")
-        
+
+        confidence = float(calculate_confidence_scores(values)[0])
+        log_prediction(
+            logger,
+            "Properties Price Model",
+            request.model_dump(exclude={'query'}, exclude_none=True),
+            prediction,
+            confidence
+        )
+        logger.info(f"Predicción de propiedad completada en {time.time() - start_time:.3f}s: ${prediction:,.2f}")
+
         return PropertyPredictionResponse(
-            prediction=float(prediction),
-            message="Predicción exitosa usando Random Forest",
-            model_info=model_data['model_info']
+            prediction=prediction,
+            confidence=confidence,
+            model_info=model_data['model_info'],
+            interpretation=interpret_price(prediction, request),
+            comparables=find_comparables(request)
         )
-        
+
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error en predicción: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Error en predicción de propiedad después de {time.time() - start_time:.3f}s: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error en predicción: {str(e)}")
+
+@app.post("/predict/batch", response_model=PropertyBatchPredictionResponse)
+def predict_property_prices_batch(request: PropertyBatchPredictionRequest):
+    """
+    Predice el precio de muchas propiedades con una sola llamada al modelo.
+    Las predicciones inválidas se reportan por propiedad sin fallar el lote.
+    
+    Es síncrono: FastAPI lo ejecuta en el threadpool, fuera del event loop, incluida
+    la construcción de la matriz de features.
+    """
+    start_time = time.time()
+    model_data = load_properties_model()
+    values = properties_to_matrix(request.properties)
+    features = pd.DataFrame(build_feature_matrix(model_data, values), columns=model_data['expected_columns'])
+    try:
+        predictions = predict_prices(model_data, features)
+    except Exception as e:
+        logger.error(f"Error en predicción en lote de {len(features)} propiedades: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error en predicción: {str(e)}")
 
+    confidences = calculate_confidence_scores(values)
+    valid = ~np.isnan(predictions) & (predictions > 0)
+    results = [
+        PropertyBatchPrediction(index=i, prediction=prediction, confidence=confidence)
+        if is_valid else
+        PropertyBatchPrediction(index=i, error="Predicción inválida generada por el modelo")
+        for i, (prediction, confidence, is_valid) in enumerate(zip(predictions.tolist(), confidences.tolist(), valid.tolist()))
+    ]
+    failed = int((~valid).sum())
+    logger.info(f"Predicción en lote completada en {time.time() - start_time:.3f}s: "
+                f"{len(results)} propiedades, {failed} inválidas")
+
+    return PropertyBatchPredictionResponse(
+        predictions=results,
+        total=len(results),
+        failed=failed,
+        model_info=model_data['model_info']
+    )
+
 @app.get("/health")
 def health():
     try:
@@ -197,7 +347,9 @@ def health():
             "model_loaded": True,
             "model_type": model_data['model_info']['type'],
             "features_count": model_data['model_info']['features_count'],
-            "preprocessing": model_data['model_info']['preprocessing']
+            "preprocessing": model_data['model_info']['preprocessing'],
+            "compiled_engine": _compiled_model is not None,
+            "comparables": len(_comparables_index) if _comparables_index is not None else None
         }
     except Exception as e:
-        return {"status": "error", "error": str(e)}
\ No newline at end of file
+        return {"status": "error", "error": str(e)}
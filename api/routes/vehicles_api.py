@@ -1,9 +1,12 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
 from api.models.vehicles_api_models import (
     ImageAnalysisResponse,
     VideoAnalysisResponse
 )
 from vehicles.vehicles_service import get_vehicle_service
+from vehicles.video_pipeline import VIDEO_BATCH_SIZE
+from vehicles.video_reader import spool_upload_to_file
 from pathlib import Path
 import time
 
@@ -36,10 +39,11 @@ async def analyze_image(file: UploadFile = File(...)):
         image_data = await file.read()
         
         # Obtener servicio
-        service = get_vehicle_service()
+        service = await run_in_threadpool(get_vehicle_service)
         
-        # Detectar vehículos
-        result = service.detect_vehicles_in_image(image_data)
+        # Detectar vehículos fuera del event loop: así los requests concurrentes
+        # llegan juntos al micro-batching del servicio
+        result = await run_in_threadpool(service.detect_vehicles_in_image, image_data)
         
         # Guardar imagen anotada
         saved_path = None
@@ -111,14 +115,17 @@ async def analyze_video(
                 detail="max_frames debe estar entre 1 y 100"
             )
         
-        # Leer video
-        video_data = await file.read()
-        
-        # Obtener servicio
-        service = get_vehicle_service()
+        # Copiar la subida por bloques a un archivo temporal único (sin leerla completa en memoria)
+        video_path = await run_in_threadpool(spool_upload_to_file, file.file, Path(filename).suffix)
         
-        # Detectar vehículos
-        result = service.detect_vehicles_in_video(video_data, max_frames)
+        try:
+            # Obtener servicio
+            service = await run_in_threadpool(get_vehicle_service)
+            
+            # Detectar vehículos
+            result = await run_in_threadpool(service.detect_vehicles_in_video, video_path, max_frames)
+        finally:
+            Path(video_path).unlink(missing_ok=True)
         
         return VideoAnalysisResponse(
             total_frames=result["total_frames"],
@@ -156,7 +163,13 @@ async def health_check():
             "service": "Vehicle Detection",
             "model": "YOLOv8",
             "model_path": service.model_path,
-            "model_loaded": service.model is not None
+            "model_loaded": service.model is not None,
+            "batching": {
+                "max_batch_size": service.batcher.max_batch_size,
+                "max_wait_ms": service.batcher.max_wait * 1000,
+                "batches": service.batcher.batches,
+                "average_batch_size": service.batcher.average_batch_size
+            }
         }
     except Exception as e:
         return {
@@ -190,6 +203,7 @@ async def model_info():
         "parameters": {
             "confidence_threshold": 0.25,
             "iou_threshold": 0.45,
-            "max_frames_video": "1-100 (default: 30)"
+            "max_frames_video": "1-100 (default: 30)",
+            "video_batch_size": VIDEO_BATCH_SIZE
         }
     }
@@ -0,0 +1,181 @@
+"""
+Modelo CatBoost de aguacate en formato nativo (.cbm) y ruta de predicción rápida
+
+- ``convert_pickle_to_cbm``: convierte el pickle del notebook a .cbm y verifica que las
+  predicciones sean idénticas.
+- ``load_catboost_model``: carga el .cbm (o el pickle si no existe el .cbm).
+- ``CatBoostPredictor``: predice con ``Pool`` armados desde un bloque numérico float32
+  y uno categórico, sin pasar por la conversión de DataFrames de CatBoost, con un
+  ``thread_count`` de 1 para lotes pequeños y configurable para lotes grandes.
+
+Uso:
+    python avocado/catboost_model.py                      # ml_models/avocado_model.pkl -> .cbm
+    python avocado/catboost_model.py --pkl modelo.pkl --out modelo.cbm
+"""
+import os
+import pickle
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def load_catboost_model(cbm_path, pickle_path=None) -> Tuple[object, str]:
+    """
+    Carga el modelo: formato nativo .cbm si existe, si no el pickle.
+
+    Returns:
+        (modelo, formato: 'cbm' | 'pickle')
+    """
+    if os.path.exists(cbm_path):
+        from catboost import CatBoostRegressor
+        model = CatBoostRegressor()
+        model.load_model(str(cbm_path), format='cbm')
+        return model, 'cbm'
+    if pickle_path is None or not os.path.exists(pickle_path):
+        raise FileNotFoundError(f"No se encontró el modelo: {cbm_path}")
+    with open(pickle_path, 'rb') as f:
+        return pickle.load(f), 'pickle'
+
+
+def probe_frame(model, n_rows: int = 64, seed: int = 0) -> pd.DataFrame:
+    """Filas sintéticas con las columnas del modelo para verificar la conversión"""
+    rng = np.random.default_rng(seed)
+    cat_indices = set(model.get_cat_feature_indices())
+    columns = {}
+    for i, name in enumerate(model.feature_names_):
+        if i in cat_indices:
+            columns[name] = rng.choice(['California', 'organic', 'conventional', 'desconocido'], n_rows)
+        else:
+            columns[name] = rng.lognormal(0.0, 2.0, n_rows)
+    return pd.DataFrame(columns)
+
+
+def convert_pickle_to_cbm(pickle_path, cbm_path) -> dict:
+    """Convierte el pickle a .cbm (reemplazo atómico) y verifica las predicciones"""
+    with open(pickle_path, 'rb') as f:
+        model = pickle.load(f)
+    cbm_path = Path(cbm_path)
+    cbm_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cbm_path.with_name(cbm_path.stem + f".tmp{os.getpid()}.cbm")
+    model.save_model(str(tmp_path), format='cbm')
+
+    converted, _ = load_catboost_model(tmp_path)
+    frame = probe_frame(model)
+    if not np.array_equal(model.predict(frame), converted.predict(frame)):
+        os.remove(tmp_path)
+        raise ValueError("Las predicciones del modelo convertido no coinciden con el pickle")
+    os.replace(tmp_path, cbm_path)
+    return {
+        "path": str(cbm_path),
+        "size_bytes": os.path.getsize(cbm_path),
+        "trees": int(converted.tree_count_),
+        "features": len(converted.feature_names_)
+    }
+
+
+# Hasta cuántas filas ``predict`` arma los bloques convirtiendo el DataFrame completo a
+# object; con más filas la conversión de DataFrames de CatBoost es igual de rápida
+_ROW_CONVERSION_MAX_ROWS = 64
+
+
+class CatBoostPredictor:
+    """
+    Predicción con ``Pool`` armados desde arreglos ya separados: bloque numérico float32
+    (CatBoost compara en float32) y bloque categórico, sin la conversión de DataFrames.
+    """
+
+    def __init__(self, model, feature_cols: Sequence[str], thread_count: int = -1, parallel_min_rows: int = 256):
+        """
+        Args:
+            model: Modelo CatBoost
+            feature_cols: Columnas en el orden de entrenamiento
+            thread_count: Hilos para lotes de ``parallel_min_rows`` filas o más (-1: todos los núcleos)
+            parallel_min_rows: Desde cuántas filas se usa ``thread_count`` (antes, un solo hilo)
+        """
+        self.model = model
+        self.feature_cols = list(feature_cols)
+        names = getattr(model, 'feature_names_', None)
+        if names and list(names) != self.feature_cols:
+            raise ValueError("Las columnas del modelo no coinciden con feature_cols")
+        cat_indices = set(model.get_cat_feature_indices())
+        self.cat_cols = [name for i, name in enumerate(self.feature_cols) if i in cat_indices]
+        self.num_cols = [name for i, name in enumerate(self.feature_cols) if i not in cat_indices]
+        self.num_index: Dict[str, int] = {name: i for i, name in enumerate(self.num_cols)}
+        self._num_positions = [self.feature_cols.index(name) for name in self.num_cols]
+        self._cat_positions = [self.feature_cols.index(name) for name in self.cat_cols]
+        self.thread_count = thread_count
+        self.parallel_min_rows = parallel_min_rows
+        # Hasta verificar los Pool contra model.predict(DataFrame) se usa el DataFrame
+        self.use_pool = False
+
+    def to_arrays(self, frame: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """(bloque numérico float32, bloque categórico object) en el orden del modelo"""
+        if len(frame) <= _ROW_CONVERSION_MAX_ROWS:
+            # Pocas filas: una sola conversión a object es más barata que seleccionar columnas
+            # (FeaturesData deja los bloques de solo lectura; se crean nuevos en cada llamada)
+            if list(frame.columns) != self.feature_cols:
+                frame = frame[self.feature_cols]
+            X = frame.to_numpy(dtype=object)
+            return X[:, self._num_positions].astype(np.float32), X[:, self._cat_positions].astype(str).astype(object)
+
+        num = np.empty((len(frame), len(self.num_cols)), dtype=np.float32)
+        for i, column in enumerate(self.num_cols):
+            num[:, i] = frame[column].to_numpy()
+        cat = np.column_stack([frame[column].astype(str).to_numpy(dtype=object) for column in self.cat_cols])
+        return num, cat
+
+    def predict_arrays(self, num: np.ndarray, cat: np.ndarray) -> np.ndarray:
+        thread_count = 1 if len(num) < self.parallel_min_rows else self.thread_count
+        if self.use_pool:
+            from catboost import FeaturesData, Pool
+            data = Pool(FeaturesData(num_feature_data=num, cat_feature_data=cat,
+                                     num_feature_names=self.num_cols, cat_feature_names=self.cat_cols))
+        else:
+            data = pd.concat([pd.DataFrame(cat, columns=self.cat_cols),
+                              pd.DataFrame(num, columns=self.num_cols)], axis=1)[self.feature_cols]
+        return np.asarray(self.model.predict(data, thread_count=thread_count), dtype=np.float64)
+
+    def predict(self, frame: pd.DataFrame) -> np.ndarray:
+        if self.use_pool and len(frame) <= _ROW_CONVERSION_MAX_ROWS:
+            return self.predict_arrays(*self.to_arrays(frame))
+        # Lotes grandes: la conversión columnar de CatBoost ya es eficiente
+        thread_count = 1 if len(frame) < self.parallel_min_rows else self.thread_count
+        return np.asarray(self.model.predict(frame[self.feature_cols], thread_count=thread_count), dtype=np.float64)
+
+    def verify(self, frame: Optional[pd.DataFrame] = None) -> bool:
+        """
+        Activa los Pool si predicen bit a bit lo mismo que ``model.predict`` con el
+        DataFrame (columnas asociadas por nombre); si no, se mantiene el DataFrame.
+        """
+        frame = probe_frame(self.model) if frame is None else frame[self.feature_cols]
+        expected = np.asarray(self.model.predict(frame), dtype=np.float64)
+        self.use_pool = True
+        try:
+            self.use_pool = bool(np.array_equal(self.predict(frame), expected))
+        except Exception:
+            self.use_pool = False
+        return self.use_pool
+
+    def warm_up(self, frame: pd.DataFrame):
+        """Primeras predicciones (inicialización del evaluador) fuera de los requests"""
+        num, cat = self.to_arrays(frame.iloc[:1])
+        self.predict_arrays(num, cat)
+        self.predict_arrays(np.repeat(num, self.parallel_min_rows, axis=0), np.repeat(cat, self.parallel_min_rows, axis=0))
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from api import constants as const
+
+    parser = argparse.ArgumentParser(description="Convierte el modelo CatBoost de aguacate de pickle a .cbm")
+    parser.add_argument("--pkl", default=str(const.AVOCADO_MODEL_PKL_PATH), help="Modelo en pickle")
+    parser.add_argument("--out", default=str(const.AVOCADO_MODEL_CBM_PATH), help="Archivo .cbm de salida")
+    args = parser.parse_args()
+
+    info = convert_pickle_to_cbm(args.pkl, args.out)
+    print(f"✅ Modelo convertido en {info['path']}: {info['trees']} árboles, {info['size_bytes'] / 1e6:.1f} MB")
@@ -0,0 +1,94 @@
+"""
+Pronóstico recursivo de precios de aguacate a varias semanas
+
+El modelo usa lags y medias móviles del precio, así que para pronosticar k semanas
+hacia adelante cada predicción semanal se agrega al historial y alimenta los lags
+de la semana siguiente. Todas las series (región, tipo) avanzan juntas: en cada paso
+se actualizan en el lugar las columnas de los bloques de features preasignados, se hace
+una sola llamada a ``predict`` y se avanzan los buffers circulares de una copia del
+historial.
+"""
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from avocado.price_history import HISTORY_FEATURES, PriceHistoryStore
+
+def calendar_features(dates) -> Dict[str, np.ndarray]:
+    """
+    Columnas de calendario de muchas fechas (semana ISO incluida) calculadas con NumPy,
+    con las mismas aproximaciones que la API (inicio de mes: día <= 7, fin de mes: día >= 24).
+    """
+    days = np.asarray(dates, dtype='datetime64[D]')
+    years = days.astype('datetime64[Y]')
+    months = days.astype('datetime64[M]')
+    month = (months - years.astype('datetime64[M]')).astype(np.int64) + 1
+    day = (days - months.astype('datetime64[D]')).astype(np.int64) + 1
+
+    # Lunes = 0 (1970-01-01 fue jueves); la semana ISO es la de su jueves
+    dayofweek = (days.astype(np.int64) + 3) % 7
+    thursday = days - dayofweek + 3
+    iso_year_start = thursday.astype('datetime64[Y]').astype('datetime64[D]')
+    return {
+        'year': years.astype(np.int64) + 1970,
+        'month': month,
+        'weekofyear': (thursday - iso_year_start).astype(np.int64) // 7 + 1,
+        'quarter': (month - 1) // 3 + 1,
+        'dayofweek': dayofweek,
+        'is_month_start': (day <= 7).astype(np.int64),
+        'is_month_end': (day >= 24).astype(np.int64)
+    }
+
+
+class RecursiveForecaster:
+    """Pronóstico semana a semana de muchas series con una llamada al modelo por paso"""
+
+    def __init__(self, predictor):
+        """
+        Args:
+            predictor: ``CatBoostPredictor`` (``to_arrays``, ``predict_arrays`` y ``num_index``)
+        """
+        self.predictor = predictor
+
+    def forecast(self, history: PriceHistoryStore, indices: Sequence[int], base_rows: pd.DataFrame,
+                 horizon: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pronostica ``horizon`` semanas de cada serie a partir de su última observación.
+
+        Args:
+            history: Historial de precios (no se modifica: se trabaja sobre una copia)
+            indices: Series a pronosticar (filas de ``history``)
+            base_rows: Una fila de features por serie (mismo orden que ``indices``) con las
+                categóricas y los volúmenes; el volumen de cada semana pronosticada es
+                su 'Total Volume' y sus lags se usan donde la historia no alcanza
+            horizon: Semanas a pronosticar
+
+        Returns:
+            (fechas (n_series, horizon) datetime64[D], precios (n_series, horizon))
+        """
+        state = history.snapshot(indices)
+        n_series = len(state)
+        positions = np.arange(n_series)
+        volumes = base_rows['Total Volume'].to_numpy(dtype=np.float64)
+
+        # Matriz de features reutilizada en todos los pasos: solo cambian calendario y lags
+        num, cat = self.predictor.to_arrays(base_rows)
+        num_index = self.predictor.num_index
+        fallback = {column: base_rows[column].to_numpy(dtype=np.float64) for column in HISTORY_FEATURES}
+
+        dates = np.empty((n_series, horizon), dtype='datetime64[D]')
+        prices = np.empty((n_series, horizon))
+        for step in range(horizon):
+            week = state.last_date[:n_series] + np.timedelta64(7, 'D')
+            for column, values in calendar_features(week).items():
+                num[:, num_index[column]] = values
+            for column, values in state.features(positions).items():
+                num[:, num_index[column]] = np.where(np.isnan(values), fallback[column], values)
+
+            # FeaturesData deja de solo lectura los arreglos que recibe: se pasa una copia del bloque
+            predicted = self.predictor.predict_arrays(num.copy(), cat)
+            state.advance(positions, predicted, volumes)
+            dates[:, step] = week
+            prices[:, step] = predicted
+        return dates, prices
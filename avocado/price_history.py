@@ -0,0 +1,229 @@
+"""
+Historial semanal de precios y volúmenes de aguacate por (región, tipo)
+
+Cada serie guarda sus últimas ``HISTORY_WEEKS`` observaciones en buffers circulares
+NumPy (una fila por serie) junto con las sumas de las ventanas móviles de 4, 12 y 52
+semanas, que se actualizan de forma incremental al agregar observaciones. Así los
+lags y medias móviles que usa el modelo se arman en O(1) con historia real:
+
+- AveragePrice_lag_L: precio de hace L semanas (lag 1 = última observación)
+- AveragePrice_roll_mean_W: media de las últimas W semanas, o NaN si hay menos de
+  ``max(2, int(0.6 * W))`` (igual que ``shift(1).rolling(W, min_periods)`` del notebook)
+- TotalVolume_lag_L: volumen de hace L semanas
+
+Las features corresponden a la semana siguiente a la última observación de la serie.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+PRICE_LAGS = (1, 4, 12, 52)
+ROLLING_WINDOWS = (4, 12, 52)
+VOLUME_LAGS = (1, 4, 12)
+HISTORY_WEEKS = max(PRICE_LAGS + ROLLING_WINDOWS + VOLUME_LAGS)
+
+# Mínimo de observaciones para la media móvil (como en el entrenamiento)
+MIN_PERIODS = {window: max(2, int(window * 0.6)) for window in ROLLING_WINDOWS}
+
+HISTORY_FEATURES = (
+    [f"AveragePrice_lag_{lag}" for lag in PRICE_LAGS]
+    + [f"AveragePrice_roll_mean_{window}" for window in ROLLING_WINDOWS]
+    + [f"TotalVolume_lag_{lag}" for lag in VOLUME_LAGS]
+)
+
+
+class PriceHistoryStore:
+    """Buffers circulares de precio/volumen por serie con sumas móviles incrementales"""
+
+    def __init__(self, capacity: int = 64):
+        """
+        Args:
+            capacity: Series reservadas inicialmente (crece al agregar series nuevas)
+        """
+        self._series: Dict[Tuple[str, str], int] = {}
+        self.prices = np.full((capacity, HISTORY_WEEKS), np.nan)
+        self.volumes = np.full((capacity, HISTORY_WEEKS), np.nan)
+        # Posición donde se escribe la próxima observación de cada serie
+        self.position = np.zeros(capacity, dtype=np.int64)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.last_date = np.full(capacity, np.datetime64('NaT'), dtype='datetime64[D]')
+        self.window_sums = np.zeros((capacity, len(ROLLING_WINDOWS)))
+        self._windows = np.array(ROLLING_WINDOWS, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    @property
+    def observations(self) -> int:
+        return int(self.counts[:len(self._series)].sum())
+
+    def series_keys(self) -> List[Tuple[str, str]]:
+        return list(self._series)
+
+    def series_index(self, region: str, avocado_type: str) -> Optional[int]:
+        """Fila de la serie o None si no tiene historia"""
+        return self._series.get((region, avocado_type))
+
+    def _add_series(self, key: Tuple[str, str]) -> int:
+        index = len(self._series)
+        if index == len(self.position):
+            grow = len(self.position)
+            self.prices = np.vstack([self.prices, np.full((grow, HISTORY_WEEKS), np.nan)])
+            self.volumes = np.vstack([self.volumes, np.full((grow, HISTORY_WEEKS), np.nan)])
+            self.position = np.concatenate([self.position, np.zeros(grow, dtype=np.int64)])
+            self.counts = np.concatenate([self.counts, np.zeros(grow, dtype=np.int64)])
+            self.last_date = np.concatenate([self.last_date, np.full(grow, np.datetime64('NaT'), dtype='datetime64[D]')])
+            self.window_sums = np.vstack([self.window_sums, np.zeros((grow, len(ROLLING_WINDOWS)))])
+        self._series[key] = index
+        return index
+
+    def _lagged(self, index: int, lag) -> np.ndarray:
+        """Valores de hace ``lag`` semanas (posición relativa a la próxima escritura)"""
+        return (self.position[index] - np.asarray(lag)) % HISTORY_WEEKS
+
+    def append(self, region: str, avocado_type: str, date, price: float, volume: float) -> bool:
+        """
+        Agrega la observación semanal de una serie (crea la serie si no existe).
+
+        Returns:
+            False si la fecha no es posterior a la última observación (se descarta)
+        """
+        date = np.datetime64(pd.Timestamp(date).date(), 'D')
+        with self._lock:
+            key = (region, avocado_type)
+            index = self._series.get(key)
+            if index is None:
+                index = self._add_series(key)
+            elif date <= self.last_date[index]:
+                return False
+            self._append_rows(np.array([index]), np.array([price], dtype=np.float64),
+                              np.array([volume], dtype=np.float64), np.array([date]))
+            return True
+
+    def advance(self, indices: np.ndarray, prices: np.ndarray, volumes: np.ndarray):
+        """
+        Agrega la semana siguiente de varias series a la vez (una observación por serie,
+        p.ej. predicciones de un pronóstico recursivo).
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        with self._lock:
+            self._append_rows(indices, np.asarray(prices, dtype=np.float64), np.asarray(volumes, dtype=np.float64),
+                              self.last_date[indices] + np.timedelta64(7, 'D'))
+
+    def _append_rows(self, indices: np.ndarray, prices: np.ndarray, volumes: np.ndarray, dates: np.ndarray):
+        counts = self.counts[indices]
+        position = self.position[indices]
+        # Valores que salen de cada ventana (si ya estaba llena)
+        leaving = self.prices[indices[:, None], (position[:, None] - self._windows) % HISTORY_WEEKS]
+        self.window_sums[indices] += prices[:, None] - np.where(counts[:, None] >= self._windows, leaving, 0.0)
+
+        self.prices[indices, position] = prices
+        self.volumes[indices, position] = volumes
+        self.position[indices] = (position + 1) % HISTORY_WEEKS
+        self.counts[indices] = counts + 1
+        self.last_date[indices] = dates
+
+        # Una vez por vuelta del buffer se recalculan las sumas para no acumular error de redondeo
+        for index in indices[self.position[indices] == 0].tolist():
+            self.window_sums[index] = self._exact_sums(index)
+
+    def _exact_sums(self, index: int) -> np.ndarray:
+        count = self.counts[index]
+        sums = np.empty(len(ROLLING_WINDOWS))
+        for i, window in enumerate(ROLLING_WINDOWS):
+            sums[i] = self.prices[index, self._lagged(index, np.arange(1, min(count, window) + 1))].sum()
+        return sums
+
+    def features(self, indices: Iterable[int]) -> Dict[str, np.ndarray]:
+        """
+        Lags y medias móviles de varias series para la semana siguiente a su última
+        observación (NaN donde no hay historia suficiente).
+        """
+        indices = np.asarray(list(indices), dtype=np.int64)
+        with self._lock:
+            counts = self.counts[indices]
+            position = self.position[indices]
+            features = {}
+            for lag in PRICE_LAGS:
+                features[f"AveragePrice_lag_{lag}"] = np.where(
+                    counts >= lag, self.prices[indices, (position - lag) % HISTORY_WEEKS], np.nan)
+            for i, window in enumerate(ROLLING_WINDOWS):
+                observed = np.minimum(counts, window)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    features[f"AveragePrice_roll_mean_{window}"] = np.where(
+                        counts >= MIN_PERIODS[window], self.window_sums[indices, i] / observed, np.nan)
+            for lag in VOLUME_LAGS:
+                features[f"TotalVolume_lag_{lag}"] = np.where(
+                    counts >= lag, self.volumes[indices, (position - lag) % HISTORY_WEEKS], np.nan)
+        return features
+
+    def series_features(self, region: str, avocado_type: str) -> Optional[Dict[str, float]]:
+        """Features de una serie como diccionario (None si la serie no tiene historia)"""
+        index = self.series_index(region, avocado_type)
+        if index is None:
+            return None
+        return {name: float(values[0]) for name, values in self.features([index]).items()}
+
+    def series_info(self, region: str, avocado_type: str) -> Optional[dict]:
+        index = self.series_index(region, avocado_type)
+        if index is None:
+            return None
+        return {
+            "weeks": int(self.counts[index]),
+            "last_date": str(self.last_date[index])
+        }
+
+    def snapshot(self, indices: Iterable[int]) -> "PriceHistoryStore":
+        """Copia independiente de algunas series (en ese orden), p.ej. para pronosticar sin modificar el historial"""
+        indices = np.asarray(list(indices), dtype=np.int64)
+        keys = self.series_keys()
+        with self._lock:
+            copy = PriceHistoryStore(capacity=max(len(indices), 1))
+            for index in indices.tolist():
+                copy._add_series(keys[index])
+            n = len(indices)
+            copy.prices[:n] = self.prices[indices]
+            copy.volumes[:n] = self.volumes[indices]
+            copy.position[:n] = self.position[indices]
+            copy.counts[:n] = self.counts[indices]
+            copy.last_date[:n] = self.last_date[indices]
+            copy.window_sums[:n] = self.window_sums[indices]
+        return copy
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "PriceHistoryStore":
+        """
+        Carga el historial desde un DataFrame con el formato de avocado.csv
+        (Date, region, type, AveragePrice, Total Volume); de cada serie se guardan
+        solo las últimas ``HISTORY_WEEKS`` semanas.
+        """
+        df = df[['Date', 'region', 'type', 'AveragePrice', 'Total Volume']].copy()
+        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+        df = (df.dropna(subset=['Date', 'AveragePrice'])
+                .drop_duplicates(subset=['region', 'type', 'Date'], keep='last')
+                .sort_values(['region', 'type', 'Date']))
+
+        groups = df.groupby(['region', 'type'], sort=False)
+        store = cls(capacity=max(groups.ngroups, 1))
+        totals = groups.size()
+        recent = groups.tail(HISTORY_WEEKS)
+
+        for (region, avocado_type), series in recent.groupby(['region', 'type'], sort=False):
+            index = store._add_series((str(region), str(avocado_type)))
+            n = len(series)
+            # Las observaciones quedan en las posiciones 0..n-1; la próxima escritura va en n
+            store.prices[index, :n] = series['AveragePrice'].to_numpy(dtype=np.float64)
+            store.volumes[index, :n] = series['Total Volume'].to_numpy(dtype=np.float64)
+            store.position[index] = n % HISTORY_WEEKS
+            store.counts[index] = int(totals.loc[(region, avocado_type)])
+            store.last_date[index] = np.datetime64(series['Date'].iloc[-1].date(), 'D')
+            store.window_sums[index] = store._exact_sums(index)
+        return store
+
+
+def load_price_history(csv_path) -> PriceHistoryStore:
+    """Construye el historial a partir de avocado.csv"""
+    return PriceHistoryStore.from_frame(pd.read_csv(csv_path))
@@ -0,0 +1,112 @@
+"""
+Codificador de features precompilado para las predicciones de retrasos de vuelos
+
+Se construye una vez al cargar el modelo: orden de columnas, mapa columna -> índice
+y mapeos categóricos tomados de los metadatos del entrenamiento. Cada predicción
+escribe directamente en una fila float32 preasignada (una por hilo), sin pandas.
+"""
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+
+# Columnas categóricas codificadas con LabelEncoder en el entrenamiento
+CATEGORICAL_COLUMNS = ('UniqueCarrier', 'Origin', 'Dest')
+
+
+def _encoder_mapping(label_encoder) -> Dict[str, int]:
+    return {str(value): code for code, value in enumerate(label_encoder.classes_)}
+
+
+def mappings_from_model_data(model_data: dict, fallback_mappings: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+    """
+    Obtiene los mapeos categóricos de los metadatos del modelo.
+
+    Orden de búsqueda por columna:
+        1. ``model_data['category_mappings'][columna]`` ({valor: código})
+        2. ``model_data['label_encoders'][columna]`` (dict de LabelEncoder por columna)
+        3. ``model_data['label_encoders']`` como un único LabelEncoder: el notebook reutiliza
+           el mismo encoder para las tres columnas y el guardado es el último ajuste (Dest);
+           se usa para los aeropuertos (Origin y Dest comparten el conjunto de aeropuertos)
+        4. ``fallback_mappings[columna]``
+    """
+    explicit = model_data.get('category_mappings') or {}
+    encoders = model_data.get('label_encoders')
+
+    mappings = {}
+    for column in CATEGORICAL_COLUMNS:
+        if column in explicit:
+            mappings[column] = {str(k): int(v) for k, v in explicit[column].items()}
+        elif isinstance(encoders, dict) and column in encoders:
+            mappings[column] = _encoder_mapping(encoders[column])
+        elif hasattr(encoders, 'classes_') and column in ('Origin', 'Dest'):
+            mappings[column] = _encoder_mapping(encoders)
+        else:
+            mappings[column] = dict(fallback_mappings.get(column, {}))
+    return mappings
+
+
+class FlightFeatureEncoder:
+    """
+    Convierte el diccionario de features de un vuelo en la fila que espera el modelo.
+
+    ``encode`` escribe en una fila float32 preasignada por hilo y la retorna; la fila
+    se reutiliza en la siguiente llamada del mismo hilo.
+    """
+
+    def __init__(self, feature_columns, mappings: Dict[str, Dict[str, int]], default_values: Dict[str, str]):
+        """
+        Args:
+            feature_columns: Orden de columnas del modelo
+            mappings: {columna categórica: {valor: código}}
+            default_values: {columna categórica: valor usado si el valor no está en el mapeo}
+        """
+        self.feature_columns = list(feature_columns)
+        self.column_index = {column: i for i, column in enumerate(self.feature_columns)}
+        self.mappings = mappings
+        self.default_codes = {
+            column: mapping.get(default_values.get(column), 0) for column, mapping in mappings.items()
+        }
+        self._local = threading.local()
+
+    @classmethod
+    def from_model_data(cls, model_data: dict, fallback_mappings: Dict[str, Dict[str, int]],
+                        default_values: Dict[str, str]) -> "FlightFeatureEncoder":
+        """Construye el codificador a partir del diccionario guardado con el modelo"""
+        return cls(model_data['feature_columns'], mappings_from_model_data(model_data, fallback_mappings), default_values)
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_columns)
+
+    def code(self, column: str, value) -> int:
+        """Código de un valor categórico (el del valor por defecto si no se conoce)"""
+        return self.mappings[column].get(value, self.default_codes[column])
+
+    def _row(self) -> np.ndarray:
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = np.zeros((1, self.n_features), dtype=np.float32)
+            self._local.row = row
+        return row
+
+    def encode(self, model_input: dict, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Escribe las features de un vuelo en una fila (1, n_features) float32.
+
+        Las columnas del modelo ausentes en ``model_input`` quedan en 0 (igual que
+        ``reindex(fill_value=0)``); las claves que el modelo no usa se ignoran.
+        """
+        row = out if out is not None else self._row()
+        row.fill(0)
+        values = row[0]
+        column_index = self.column_index
+        mappings = self.mappings
+        for column, value in model_input.items():
+            index = column_index.get(column)
+            if index is None:
+                continue
+            if column in mappings:
+                value = mappings[column].get(value, self.default_codes[column])
+            values[index] = value
+        return row
@@ -0,0 +1,101 @@
+"""
+Caché LRU de predicciones de retrasos de vuelos
+
+La clave es la fila de features ya codificada (float32, orden del modelo): dos
+requests que terminan en la misma entrada del modelo comparten la predicción.
+Opcionalmente las horas HHMM se redondean a la hora (p.ej. 1345 -> 1300) antes
+de predecir, lo que reduce el espacio de claves a cambio de precisión.
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+import numpy as np
+
+# Columnas con horas en formato HHMM (la salida y las horas programadas derivadas de ella)
+TIME_OF_DAY_COLUMNS = ('DepTime', 'CRSDepTime', 'CRSArrTime')
+
+
+class PredictionCache:
+    """LRU acotado {fila codificada: predicción} con métricas de aciertos"""
+
+    def __init__(self, max_size: int = 50000, quantize_columns: Sequence[int] = ()):
+        """
+        Args:
+            max_size: Máximo de predicciones guardadas (0 desactiva la caché)
+            quantize_columns: Índices de columnas HHMM que se redondean a la hora
+        """
+        self.max_size = max_size
+        self.quantize_columns = np.asarray(quantize_columns, dtype=np.int64)
+        self._entries: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key(self, row: np.ndarray) -> bytes:
+        """
+        Clave de una fila (1, n_features). Si hay columnas a cuantizar, la fila se
+        modifica en el lugar para que la predicción corresponda a la clave.
+        """
+        if self.quantize_columns.size:
+            values = row[0]
+            values[self.quantize_columns] = values[self.quantize_columns] // 100 * 100
+        return row.tobytes()
+
+    def get(self, key: bytes) -> Optional[float]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    @property
+    def generation(self) -> int:
+        """Contador de invalidaciones: se lee antes de predecir y se pasa a ``put``"""
+        return self.invalidations
+
+    def put(self, key: bytes, value: float, generation: Optional[int] = None):
+        """
+        Guarda una predicción. Si se indica ``generation`` y hubo una invalidación desde
+        entonces (modelo recargado durante la predicción), la predicción se descarta.
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.invalidations:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, quantize_columns: Optional[Sequence[int]] = None):
+        """Descarta todas las predicciones (p.ej. al recargar el modelo)"""
+        with self._lock:
+            self._entries.clear()
+            if quantize_columns is not None:
+                self.quantize_columns = np.asarray(quantize_columns, dtype=np.int64)
+            self.invalidations += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hour_quantization": bool(self.quantize_columns.size)
+            }
@@ -0,0 +1,232 @@
+"""
+Índice de rutas (origen, destino) construido a partir de DelayedFlights.csv
+
+El CSV (~1.9M filas) se agrega por bloques en una tabla compacta por ruta:
+
+- distance: distancia en millas
+- crs_elapsed: mediana del tiempo de vuelo programado (CRSElapsedTime, minutos)
+- clock_offset: mediana de CRSArrTime - CRSDepTime - CRSElapsedTime (minutos), es decir
+  la diferencia de huso horario entre origen y destino
+- mean_delay: retraso medio histórico a la llegada (ArrDelay, minutos)
+- flights: vuelos observados
+
+La tabla se guarda como .npz y se carga al iniciar el servicio de vuelos; cada
+consulta es un acceso a diccionario.
+"""
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from api.data_sources import source_signature
+
+_USECOLS = ['Origin', 'Dest', 'Distance', 'CRSElapsedTime', 'CRSDepTime', 'CRSArrTime', 'ArrDelay']
+_DTYPES = {
+    'Origin': str, 'Dest': str, 'Distance': np.float32, 'CRSElapsedTime': np.float32,
+    'CRSDepTime': np.float32, 'CRSArrTime': np.float32, 'ArrDelay': np.float32
+}
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def hhmm_to_minutes(hhmm):
+    """Convierte horas en formato HHMM (p.ej. 1345) a minutos desde medianoche"""
+    hhmm = np.asarray(hhmm)
+    return (hhmm // 100) * 60 + hhmm % 100
+
+
+def minutes_to_hhmm(minutes):
+    """Convierte minutos (cualquier valor) a HHMM dentro del día"""
+    minutes = np.asarray(minutes) % MINUTES_PER_DAY
+    return (minutes // 60) * 100 + minutes % 60
+
+
+def _grouped_mean(groups: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    valid = ~np.isnan(values)
+    sums = np.bincount(groups[valid], weights=values[valid], minlength=n_groups)
+    counts = np.bincount(groups[valid], minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def _grouped_median(groups: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    valid = ~np.isnan(values)
+    groups, values = groups[valid], values[valid]
+    order = np.lexsort((values, groups))
+    values = values[order]
+
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    medians = np.full(n_groups, np.nan)
+    has = counts > 0
+    lower = starts[has] + (counts[has] - 1) // 2
+    upper = starts[has] + counts[has] // 2
+    medians[has] = (values[lower].astype(np.float64) + values[upper]) / 2
+    return medians
+
+
+class RouteIndex:
+    """Estadísticas por ruta con búsqueda O(1) por (origen, destino)"""
+
+    def __init__(self, airports, origins, dests, distance, crs_elapsed, clock_offset, mean_delay, flights,
+                 meta: Optional[dict] = None):
+        self.airports = np.asarray(airports)
+        self.origins = origins
+        self.dests = dests
+        self.distance = distance
+        self.crs_elapsed = crs_elapsed
+        self.clock_offset = clock_offset
+        self.mean_delay = mean_delay
+        self.flights = flights
+        self.meta = meta or {}
+        self._rows = {
+            (str(self.airports[o]), str(self.airports[d])): i
+            for i, (o, d) in enumerate(zip(origins.tolist(), dests.tolist()))
+        }
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def row(self, origin: str, dest: str) -> Optional[int]:
+        """Fila de la ruta o None si no se observó"""
+        return self._rows.get((origin, dest))
+
+    def rows(self, origins, dests) -> np.ndarray:
+        """Filas de muchas rutas (-1 si no se observaron)"""
+        get = self._rows.get
+        return np.fromiter((get((o, d), -1) for o, d in zip(origins, dests)), dtype=np.int64, count=len(origins))
+
+    def route_stats(self, origin: str, dest: str) -> Optional[dict]:
+        """Estadísticas de una ruta como diccionario"""
+        row = self.row(origin, dest)
+        if row is None:
+            return None
+        distance, crs_elapsed, mean_delay = (float(self.distance[row]), float(self.crs_elapsed[row]),
+                                             float(self.mean_delay[row]))
+        return {
+            'distance': None if np.isnan(distance) else distance,
+            'crs_elapsed': None if np.isnan(crs_elapsed) else crs_elapsed,
+            'clock_offset': int(self.clock_offset[row]),
+            'mean_delay': None if np.isnan(mean_delay) else mean_delay,
+            'flights': int(self.flights[row])
+        }
+
+    def scheduled_arrival(self, crs_dep_time, rows):
+        """
+        Hora de llegada programada (HHMM, hora local del destino) para salidas HHMM.
+
+        Args:
+            crs_dep_time: Hora(s) de salida HHMM
+            rows: Fila(s) de las rutas (deben existir)
+        """
+        minutes = hhmm_to_minutes(crs_dep_time) + np.rint(self.crs_elapsed[rows]).astype(np.int64) + self.clock_offset[rows]
+        return minutes_to_hhmm(minutes)
+
+    def save(self, path):
+        """Guarda el índice como .npz (reemplazo atómico)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.stem + f".tmp{os.getpid()}.npz")
+        np.savez(
+            tmp_path, airports=self.airports, origins=self.origins, dests=self.dests, distance=self.distance,
+            crs_elapsed=self.crs_elapsed, clock_offset=self.clock_offset, mean_delay=self.mean_delay,
+            flights=self.flights, meta=np.array(json.dumps(self.meta))
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path) -> "RouteIndex":
+        with np.load(path) as data:
+            return cls(
+                data['airports'], data['origins'], data['dests'], data['distance'], data['crs_elapsed'],
+                data['clock_offset'], data['mean_delay'], data['flights'], json.loads(str(data['meta']))
+            )
+
+
+def build_route_index(csv_path, chunksize: int = 250_000) -> RouteIndex:
+    """
+    Agrega DelayedFlights.csv por bloques en un RouteIndex.
+
+    Args:
+        csv_path: Ruta al CSV de vuelos
+        chunksize: Filas leídas por bloque
+    """
+    start_time = time.time()
+    airport_codes = {}
+    parts = {name: [] for name in ('pair', 'distance', 'elapsed', 'offset', 'delay')}
+    rows_read = 0
+
+    for chunk in pd.read_csv(csv_path, usecols=_USECOLS, dtype=_DTYPES, chunksize=chunksize):
+        chunk = chunk.dropna(subset=['Origin', 'Dest'])
+        rows_read += len(chunk)
+
+        for airport in pd.unique(pd.concat([chunk['Origin'], chunk['Dest']])):
+            airport_codes.setdefault(airport, len(airport_codes))
+        origin = chunk['Origin'].map(airport_codes).to_numpy(dtype=np.int64)
+        dest = chunk['Dest'].map(airport_codes).to_numpy(dtype=np.int64)
+
+        elapsed = chunk['CRSElapsedTime'].to_numpy(dtype=np.float64)
+        offset = (hhmm_to_minutes(chunk['CRSArrTime'].to_numpy(dtype=np.float64))
+                  - hhmm_to_minutes(chunk['CRSDepTime'].to_numpy(dtype=np.float64)) - elapsed)
+        # Llevar a (-12h, 12h]: el cruce de medianoche no es diferencia horaria
+        offset = (offset + MINUTES_PER_DAY // 2) % MINUTES_PER_DAY - MINUTES_PER_DAY // 2
+
+        parts['pair'].append(origin << 32 | dest)
+        parts['distance'].append(chunk['Distance'].to_numpy(dtype=np.float32))
+        parts['elapsed'].append(elapsed.astype(np.float32))
+        parts['offset'].append(offset.astype(np.float32))
+        parts['delay'].append(chunk['ArrDelay'].to_numpy(dtype=np.float32))
+
+    pair = np.concatenate(parts['pair']) if parts['pair'] else np.empty(0, dtype=np.int64)
+    pairs, groups = np.unique(pair, return_inverse=True)
+    n_routes = len(pairs)
+
+    def _values(name):
+        return np.concatenate(parts[name]).astype(np.float64) if parts[name] else np.empty(0)
+
+    airports = np.array(sorted(airport_codes, key=airport_codes.get))
+    meta = {
+        "source": source_signature(csv_path),
+        "rows": int(rows_read),
+        "routes": int(n_routes),
+        "build_seconds": round(time.time() - start_time, 2),
+    }
+    return RouteIndex(
+        airports,
+        (pairs >> 32).astype(np.int32),
+        (pairs & 0xFFFFFFFF).astype(np.int32),
+        _grouped_median(groups, _values('distance'), n_routes).astype(np.float32),
+        _grouped_median(groups, _values('elapsed'), n_routes).astype(np.float32),
+        np.nan_to_num(np.rint(_grouped_median(groups, _values('offset'), n_routes))).astype(np.int16),
+        _grouped_mean(groups, _values('delay'), n_routes).astype(np.float32),
+        np.bincount(groups, minlength=n_routes).astype(np.int32),
+        meta
+    )
+
+
+def load_route_index(path) -> Optional[RouteIndex]:
+    """Carga el índice de rutas si existe (None si no se ha construido)"""
+    if not os.path.exists(path):
+        return None
+    return RouteIndex.load(path)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from api import constants as const
+
+    parser = argparse.ArgumentParser(description="Construye el índice de rutas a partir de DelayedFlights.csv")
+    parser.add_argument("--csv", default=str(const.CSV_FLIGHTS_PATH), help="Ruta a DelayedFlights.csv")
+    parser.add_argument("--out", default=str(const.ROUTE_INDEX_PATH), help="Archivo .npz de salida")
+    args = parser.parse_args()
+
+    index = build_route_index(args.csv)
+    index.save(args.out)
+    print(f"✅ Índice de rutas generado en {args.out}: {len(index):,} rutas a partir de {index.meta['rows']:,} vuelos")
@@ -0,0 +1,295 @@
+"""
+Vecinos más cercanos item-item (filtrado colaborativo) para el sistema de películas
+
+A partir de la tabla de ratings se arma una matriz CSR usuario x película y se
+consulta un índice KNN coseno sobre el vector de ratings de cada película. Los
+vecinos de todo el catálogo se precalculan en dos arreglos (n_películas x k),
+por lo que responder a un movie_id es un solo slice.
+"""
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.base import clone
+from sklearn.neighbors import NearestNeighbors
+
+from .movielens_cache import run_exclusive_build
+
+# Vecinos guardados por película (el request pide como máximo este número)
+DEFAULT_NEIGHBORS = 50
+
+_BLOCK_SIZE = 2048
+_META_FILE = "meta.json"
+
+
+def build_user_item_matrix(table) -> csr_matrix:
+    """Matriz CSR usuario x película construida sobre los arreglos de la tabla (sin copiarlos)"""
+    return csr_matrix(
+        (table.ratings, table.movie_codes, table.user_indptr),
+        shape=(len(table.user_ids), len(table.movie_ids))
+    )
+
+
+class ItemNeighbors:
+    """
+    Vecinos precalculados por película.
+
+    ``neighbors[c]`` contiene los índices densos de las películas más similares a
+    la película ``c`` (ordenados por similitud, -1 como relleno) y
+    ``similarities[c]`` la similitud coseno correspondiente.
+
+    Las filas afectadas por ratings en línea se marcan como desactualizadas
+    (``mark_stale``) y se reemplazan al recalcularlas (``set_row``) sin tocar los
+    arreglos guardados.
+    """
+
+    def __init__(self, neighbors: np.ndarray, similarities: np.ndarray, meta: Optional[dict] = None):
+        self.neighbors = neighbors
+        self.similarities = similarities
+        self.meta = meta or {}
+        self._stale = set()
+        self._overrides = {}
+
+    @property
+    def k(self) -> int:
+        return self.neighbors.shape[1]
+
+    def neighbors_of(self, movie_code: int, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Retorna (índices densos, similitudes) de los vecinos de una película"""
+        if movie_code in self._overrides:
+            codes, similarities = self._overrides[movie_code]
+            return codes[:n], similarities[:n]
+        codes = self.neighbors[movie_code, :n]
+        valid = codes >= 0
+        return codes[valid], self.similarities[movie_code, :n][valid]
+
+    def mark_stale(self, movie_codes):
+        """Marca filas para recalcular cuando se consulten"""
+        self._stale.update(int(code) for code in movie_codes)
+
+    def is_stale(self, movie_code: int) -> bool:
+        return movie_code in self._stale
+
+    def is_modified(self, movie_code: int) -> bool:
+        """True si la fila ya no coincide con los arreglos guardados"""
+        return movie_code in self._stale or movie_code in self._overrides
+
+    def set_row(self, movie_code: int, codes: np.ndarray, similarities: np.ndarray):
+        """Reemplaza los vecinos de una película (fila recalculada)"""
+        self._overrides[int(movie_code)] = (codes, similarities)
+        self._stale.discard(int(movie_code))
+
+    def save(self, out_dir):
+        """Guarda los arreglos como .npy (reemplazo atómico del directorio)"""
+        out_dir = Path(out_dir)
+        tmp_dir = out_dir.with_name(out_dir.name + f".tmp{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        np.save(tmp_dir / "neighbors.npy", self.neighbors)
+        np.save(tmp_dir / "similarities.npy", self.similarities)
+        with open(tmp_dir / _META_FILE, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, indent=2)
+
+        if out_dir.exists():
+            old_dir = out_dir.with_name(out_dir.name + f".old{os.getpid()}")
+            os.replace(out_dir, old_dir)
+            os.replace(tmp_dir, out_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            os.replace(tmp_dir, out_dir)
+
+    @classmethod
+    def load(cls, out_dir) -> "ItemNeighbors":
+        """Abre los vecinos guardados con memory-map"""
+        out_dir = Path(out_dir)
+        with open(out_dir / _META_FILE, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return cls(
+            np.load(out_dir / "neighbors.npy", mmap_mode='r'),
+            np.load(out_dir / "similarities.npy", mmap_mode='r'),
+            meta
+        )
+
+
+def _cosine_knn(knn_model, n_neighbors: int) -> NearestNeighbors:
+    """Índice KNN coseno con la configuración del modelo cargado cuando es compatible"""
+    if isinstance(knn_model, NearestNeighbors) and knn_model.metric == 'cosine':
+        index = clone(knn_model)
+    else:
+        index = NearestNeighbors(metric='cosine', algorithm='brute')
+    return index.set_params(n_neighbors=n_neighbors, n_jobs=-1)
+
+
+def build_item_neighbors(table, knn_model=None, n_neighbors: int = DEFAULT_NEIGHBORS, block_size: int = _BLOCK_SIZE) -> ItemNeighbors:
+    """
+    Precalcula los vecinos coseno de todas las películas con ratings.
+
+    Args:
+        table: Tabla de ratings (ver movies.movielens_cache.RatingsTable)
+        knn_model: Modelo NearestNeighbors cargado; se reutiliza su configuración
+        n_neighbors: Vecinos a guardar por película
+        block_size: Películas consultadas por bloque (acota la memoria)
+    """
+    start_time = time.time()
+    item_matrix = build_user_item_matrix(table).T.tocsr()
+    n_movies = item_matrix.shape[0]
+    k = max(1, min(n_neighbors, n_movies - 1))
+
+    neighbors = np.full((n_movies, k), -1, dtype=np.int32)
+    similarities = np.zeros((n_movies, k), dtype=np.float32)
+
+    # Solo las películas con ratings tienen vector; el resto queda sin vecinos
+    rated = np.flatnonzero(np.diff(item_matrix.indptr) > 0)
+    if len(rated) >= 2:
+        rated_matrix = item_matrix[rated]
+        index = _cosine_knn(knn_model, min(k + 1, len(rated))).fit(rated_matrix)
+
+        for start in range(0, len(rated), block_size):
+            block = rated[start:start + block_size]
+            distances, positions = index.kneighbors(rated_matrix[start:start + block_size])
+            codes = rated[positions]
+            sims = 1.0 - distances
+
+            # Quitar la propia película y vecinos sin similitud, compactando a la izquierda
+            keep = (codes != block[:, None]) & (sims > 0)
+            order = np.argsort(~keep, axis=1, kind='stable')[:, :k]
+            codes = np.take_along_axis(codes, order, axis=1)
+            sims = np.take_along_axis(sims, order, axis=1)
+            keep = np.take_along_axis(keep, order, axis=1)
+
+            width = codes.shape[1]
+            neighbors[block, :width] = np.where(keep, codes, -1)
+            similarities[block, :width] = np.where(keep, sims, 0.0)
+
+    meta = {
+        "k": int(k),
+        "metric": "cosine",
+        "movies_count": int(n_movies),
+        "ratings_count": int(len(table)),
+        "build_seconds": round(time.time() - start_time, 2),
+    }
+    return ItemNeighbors(neighbors, similarities, meta)
+
+
+def recompute_item_neighbors_row(table, overlay, movie_code: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vecinos coseno exactos de una película sobre la tabla base más los ratings en línea.
+
+    Args:
+        table: Tabla base de ratings
+        overlay: Ratings en línea (ver movies.ratings_log.RatingsOverlay)
+        movie_code: Índice denso de la película
+        k: Vecinos a retornar
+
+    Returns:
+        (índices densos, similitudes) ordenados por similitud
+    """
+    # Vector de ratings de la película: {usuario: rating}
+    user_codes, ratings = table.movie_ratings(movie_code)
+    vector = dict(zip(user_codes.tolist(), ratings.tolist()))
+    vector.update(overlay.movie_entries(movie_code))
+    if not vector:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+    users = np.fromiter(vector.keys(), dtype=np.int64, count=len(vector))
+    values = np.fromiter(vector.values(), dtype=np.float64, count=len(vector))
+
+    # Productos punto con la matriz base y corrección por los ratings en línea de esos usuarios
+    base = users < overlay.n_base_users
+    dots = _weighted_user_rows(table, users[base], values[base])
+    for user_code, value in zip(users.tolist(), values.tolist()):
+        for other_code, rating in overlay.user_entries(user_code).items():
+            previous = overlay.base_rating(user_code, other_code) or 0.0
+            dots[other_code] += (rating - previous) * value
+
+    norms = np.sqrt(overlay.item_norms_sq()) * np.sqrt(np.dot(values, values))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        similarities = np.where(norms > 0, dots / norms, 0.0)
+    similarities[movie_code] = 0.0
+
+    candidates = np.flatnonzero(similarities > 0)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-similarities[candidates], k - 1)[:k]]
+    candidates = candidates[np.argsort(-similarities[candidates], kind='stable')]
+    return candidates.astype(np.int32), similarities[candidates].astype(np.float32)
+
+
+def _weighted_user_rows(table, users: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    ``weights @ X[users]`` sobre la matriz usuario x película de la tabla, sin armar la
+    matriz: los ratings de cada usuario son un rango contiguo de la tabla.
+    """
+    starts = table.user_indptr[users].astype(np.int64)
+    lengths = table.user_indptr[users + 1] - starts
+    first = np.cumsum(lengths) - lengths
+    positions = np.repeat(starts - first, lengths) + np.arange(lengths.sum())
+    values = table.ratings[positions].astype(np.float64) * np.repeat(weights, lengths)
+    return np.bincount(table.movie_codes[positions], weights=values, minlength=len(table.movie_ids))
+
+
+def load_or_build_item_neighbors(table, knn_model=None, out_dir=None, source: Optional[dict] = None,
+                                 n_neighbors: int = DEFAULT_NEIGHBORS) -> ItemNeighbors:
+    """
+    Carga los vecinos guardados si corresponden a los datos actuales; si no, los construye.
+
+    Args:
+        table: Tabla de ratings
+        knn_model: Modelo NearestNeighbors cargado
+        out_dir: Directorio donde persistir los vecinos (None = solo en memoria)
+        source: Identificador de los datos de origen (p.ej. metadatos de la caché de MovieLens)
+        n_neighbors: Vecinos a guardar por película
+    """
+    if out_dir is None:
+        return build_item_neighbors(table, knn_model, n_neighbors)
+
+    out_dir = Path(out_dir)
+
+    def _is_ready():
+        meta_path = out_dir / _META_FILE
+        if not meta_path.exists():
+            return False
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return meta.get("source") == source and meta.get("k", 0) >= min(n_neighbors, len(table.movie_ids) - 1)
+
+    if not _is_ready():
+        def _build():
+            result = build_item_neighbors(table, knn_model, n_neighbors)
+            result.meta["source"] = source
+            result.save(out_dir)
+
+        run_exclusive_build(out_dir.parent / f"{out_dir.name}.build.lock", _build, _is_ready)
+    return ItemNeighbors.load(out_dir)
+
+
+if __name__ == "__main__":
+    import argparse
+    import pickle
+    import sys
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from api import constants as const
+    from movies.movielens_cache import load_movielens, read_cache_meta
+
+    parser = argparse.ArgumentParser(description="Precalcula los vecinos item-item de MovieLens")
+    parser.add_argument("--k", type=int, default=DEFAULT_NEIGHBORS, help="Vecinos por película")
+    args = parser.parse_args()
+
+    _, ratings_table = load_movielens(const.CSV_MOVIES_PATH, const.CSV_RATINGS_PATH, const.MOVIELENS_CACHE_DIR)
+    model_path = const.ML_MODELS_PATH / "knn_movie_recommendation_model.pkl"
+    knn = None
+    if model_path.exists():
+        with open(model_path, 'rb') as f:
+            knn = pickle.load(f)
+
+    result = load_or_build_item_neighbors(
+        ratings_table, knn, const.MOVIELENS_CACHE_DIR / "neighbors",
+        read_cache_meta(const.MOVIELENS_CACHE_DIR), args.k
+    )
+    print(f"✅ Vecinos item-item listos: {result.neighbors.shape[0]:,} películas x {result.k} vecinos")
@@ -0,0 +1,335 @@
+"""
+Carga de MovieLens (movies.csv / ratings.csv) con caché columnar en disco
+
+Los CSV se convierten una sola vez a archivos .npy con tipos compactos
+(int32 / float32) e ids codificados como índices densos. Los procesos
+siguientes abren la caché con memory-map, por lo que el arranque toma
+segundos y las páginas se comparten entre los workers de uvicorn.
+"""
+import fcntl
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from api.data_sources import source_signature
+
+from .ratings_index import encode_ids
+
+# Incrementar si cambia el formato de la caché para forzar su reconstrucción
+CACHE_FORMAT_VERSION = 1
+
+_META_FILE = "meta.json"
+_LOCK_FILE = ".build.lock"
+_RATINGS_CHUNKSIZE = 2_000_000
+
+
+class RatingsTable:
+    """
+    Ratings en formato columnar ordenados por (usuario, película).
+
+    Los ratings de cada usuario ocupan un rango contiguo
+    ``user_indptr[u]:user_indptr[u + 1]``, es decir, la tabla es directamente
+    una matriz CSR usuario x película.
+    """
+
+    def __init__(self, movie_ids, user_ids, user_codes, movie_codes, ratings, user_indptr):
+        self.movie_ids = movie_ids
+        self.user_ids = user_ids
+        self.user_codes = user_codes
+        self.movie_codes = movie_codes
+        self.ratings = ratings
+        self.user_indptr = user_indptr
+        self._movie_index = None
+
+    @classmethod
+    def from_dataframes(cls, movies_df: pd.DataFrame, ratings_df: pd.DataFrame) -> "RatingsTable":
+        """Construye la tabla en memoria a partir de DataFrames (catálogo ordenado por movieId)"""
+        movie_ids = movies_df['movieId'].to_numpy(dtype=np.int32)
+        movie_codes = encode_ids(movie_ids, ratings_df['movieId'].to_numpy())
+        keep = movie_codes >= 0
+        user_raw = ratings_df['userId'].to_numpy(dtype=np.int32)[keep]
+        return cls._from_codes(movie_ids, user_raw, movie_codes[keep], ratings_df['rating'].to_numpy(dtype=np.float32)[keep])
+
+    @classmethod
+    def _from_codes(cls, movie_ids, user_raw, movie_codes, ratings) -> "RatingsTable":
+        """Codifica usuarios, ordena por (usuario, película) y calcula los punteros por usuario"""
+        user_ids = np.unique(user_raw).astype(np.int32)
+        user_codes = np.searchsorted(user_ids, user_raw).astype(np.int32)
+        movie_codes = movie_codes.astype(np.int32)
+
+        key = user_codes.astype(np.int64) * max(len(movie_ids), 1) + movie_codes
+        if len(key) > 1 and np.any(key[1:] < key[:-1]):
+            order = np.argsort(key, kind='stable')
+            user_codes, movie_codes, ratings = user_codes[order], movie_codes[order], ratings[order]
+
+        index_dtype = np.int32 if len(ratings) < np.iinfo(np.int32).max else np.int64
+        user_indptr = np.zeros(len(user_ids) + 1, dtype=index_dtype)
+        np.cumsum(np.bincount(user_codes, minlength=len(user_ids)), out=user_indptr[1:])
+        return cls(movie_ids, user_ids, user_codes, movie_codes, np.asarray(ratings, dtype=np.float32), user_indptr)
+
+    def __len__(self) -> int:
+        return len(self.ratings)
+
+    def user_ratings(self, user_code: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Retorna (índices densos de película, ratings) de un usuario"""
+        start, end = self.user_indptr[user_code], self.user_indptr[user_code + 1]
+        return self.movie_codes[start:end], self.ratings[start:end]
+
+    def movie_ratings(self, movie_code: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Retorna (índices densos de usuario, ratings) de una película"""
+        order, movie_indptr = self.movie_index()
+        positions = order[movie_indptr[movie_code]:movie_indptr[movie_code + 1]]
+        return self.user_codes[positions], self.ratings[positions]
+
+    def movie_index(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Posiciones de los ratings agrupadas por película (vista CSC de la tabla): los de
+        la película m son ``order[movie_indptr[m]:movie_indptr[m + 1]]``, por usuario.
+        Se calcula una vez en la primera consulta.
+        """
+        if self._movie_index is None:
+            order = np.argsort(self.movie_codes, kind='stable').astype(self.user_indptr.dtype)
+            movie_indptr = np.zeros(len(self.movie_ids) + 1, dtype=self.user_indptr.dtype)
+            np.cumsum(np.bincount(self.movie_codes, minlength=len(self.movie_ids)), out=movie_indptr[1:])
+            self._movie_index = (order, movie_indptr)
+        return self._movie_index
+
+
+def _pack_strings(values) -> Tuple[np.ndarray, np.ndarray]:
+    """Empaqueta strings como bytes UTF-8 concatenados + offsets"""
+    encoded = [str(v).encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(data: np.ndarray, offsets: np.ndarray) -> list:
+    raw = data.tobytes()
+    return [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+
+def _source_signature(*paths) -> list:
+    """Firma de los CSV de origen (para detectar cambios)"""
+    return [source_signature(path) for path in paths]
+
+
+def read_cache_meta(cache_dir) -> Optional[dict]:
+    """Lee los metadatos de la caché o None si no existe"""
+    meta_path = Path(cache_dir) / _META_FILE
+    if not meta_path.exists():
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def is_cache_fresh(cache_dir, movies_csv, ratings_csv) -> bool:
+    """Indica si la caché existe, tiene el formato actual y corresponde a los CSV"""
+    meta = read_cache_meta(cache_dir)
+    if meta is None or meta.get("format_version") != CACHE_FORMAT_VERSION:
+        return False
+    if not (os.path.exists(movies_csv) and os.path.exists(ratings_csv)):
+        # Sin CSV disponibles la caché existente es la única fuente
+        return True
+    return meta.get("sources") == _source_signature(movies_csv, ratings_csv)
+
+
+def build_movielens_cache(movies_csv, ratings_csv, cache_dir, chunksize: int = _RATINGS_CHUNKSIZE) -> dict:
+    """
+    Convierte movies.csv / ratings.csv a la caché columnar.
+
+    ratings.csv se lee por bloques con tipos compactos; la caché se escribe en
+    un directorio temporal y se reemplaza de forma atómica al final.
+
+    Returns:
+        Metadatos de la caché generada
+    """
+    start_time = time.time()
+    cache_dir = Path(cache_dir)
+
+    movies = pd.read_csv(movies_csv, usecols=['movieId', 'title', 'genres'], dtype={'movieId': np.int32}, encoding='utf-8')
+    movies = movies.sort_values('movieId').reset_index(drop=True)
+    movies['genres'] = movies['genres'].fillna('(no genres listed)')
+    movie_ids = movies['movieId'].to_numpy(dtype=np.int32)
+
+    user_parts, movie_parts, rating_parts = [], [], []
+    dropped = 0
+    reader = pd.read_csv(
+        ratings_csv,
+        usecols=['userId', 'movieId', 'rating'],
+        dtype={'userId': np.int32, 'movieId': np.int32, 'rating': np.float32},
+        chunksize=chunksize
+    )
+    for chunk in reader:
+        codes = encode_ids(movie_ids, chunk['movieId'].to_numpy())
+        keep = codes >= 0
+        dropped += int((~keep).sum())
+        user_parts.append(chunk['userId'].to_numpy()[keep])
+        movie_parts.append(codes[keep].astype(np.int32))
+        rating_parts.append(chunk['rating'].to_numpy()[keep])
+
+    table = RatingsTable._from_codes(
+        movie_ids,
+        np.concatenate(user_parts) if user_parts else np.zeros(0, dtype=np.int32),
+        np.concatenate(movie_parts) if movie_parts else np.zeros(0, dtype=np.int32),
+        np.concatenate(rating_parts) if rating_parts else np.zeros(0, dtype=np.float32)
+    )
+    del user_parts, movie_parts, rating_parts
+
+    tmp_dir = cache_dir.with_name(cache_dir.name + f".tmp{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    titles_data, titles_offsets = _pack_strings(movies['title'])
+    genres_data, genres_offsets = _pack_strings(movies['genres'])
+    arrays = {
+        "movie_ids": table.movie_ids,
+        "titles_data": titles_data,
+        "titles_offsets": titles_offsets,
+        "genres_data": genres_data,
+        "genres_offsets": genres_offsets,
+        "user_ids": table.user_ids,
+        "user_codes": table.user_codes,
+        "movie_codes": table.movie_codes,
+        "ratings": table.ratings,
+        "user_indptr": table.user_indptr,
+    }
+    for name, array in arrays.items():
+        np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(array))
+
+    meta = {
+        "format_version": CACHE_FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "sources": _source_signature(movies_csv, ratings_csv),
+        "movies_count": int(len(table.movie_ids)),
+        "users_count": int(len(table.user_ids)),
+        "ratings_count": int(len(table)),
+        "dropped_ratings": dropped,
+        "build_seconds": round(time.time() - start_time, 2),
+    }
+    with open(tmp_dir / _META_FILE, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    if cache_dir.exists():
+        old_dir = cache_dir.with_name(cache_dir.name + f".old{os.getpid()}")
+        os.replace(cache_dir, old_dir)
+        os.replace(tmp_dir, cache_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, cache_dir)
+
+    return meta
+
+
+def load_movielens_cache(cache_dir) -> Tuple[pd.DataFrame, RatingsTable]:
+    """
+    Abre la caché columnar con memory-map.
+
+    Returns:
+        (catálogo de películas ordenado por movieId, tabla de ratings)
+    """
+    cache_dir = Path(cache_dir)
+
+    def _load(name):
+        return np.load(cache_dir / f"{name}.npy", mmap_mode='r')
+
+    movie_ids = _load("movie_ids")
+    movies_df = pd.DataFrame({
+        'movieId': np.asarray(movie_ids),
+        'title': _unpack_strings(_load("titles_data"), _load("titles_offsets")),
+        'genres': _unpack_strings(_load("genres_data"), _load("genres_offsets")),
+    })
+    table = RatingsTable(
+        movie_ids,
+        _load("user_ids"),
+        _load("user_codes"),
+        _load("movie_codes"),
+        _load("ratings"),
+        _load("user_indptr"),
+    )
+    return movies_df, table
+
+
+def load_movielens(movies_csv, ratings_csv, cache_dir, wait_timeout: float = 900.0) -> Tuple[pd.DataFrame, RatingsTable]:
+    """
+    Carga MovieLens desde la caché, construyéndola primero si falta o está desactualizada.
+
+    Cuando varios workers arrancan a la vez, solo uno construye la caché
+    (mediante un archivo de bloqueo) y el resto espera a que esté lista.
+
+    Raises:
+        FileNotFoundError: Si no hay caché ni CSV de origen
+    """
+    cache_dir = Path(cache_dir)
+    if is_cache_fresh(cache_dir, movies_csv, ratings_csv):
+        return load_movielens_cache(cache_dir)
+
+    if not (os.path.exists(movies_csv) and os.path.exists(ratings_csv)):
+        raise FileNotFoundError(f"No se encontraron {movies_csv} / {ratings_csv} ni una caché en {cache_dir}")
+
+    run_exclusive_build(
+        cache_dir.parent / f"{cache_dir.name}{_LOCK_FILE}",
+        build=lambda: build_movielens_cache(movies_csv, ratings_csv, cache_dir),
+        is_ready=lambda: is_cache_fresh(cache_dir, movies_csv, ratings_csv),
+        wait_timeout=wait_timeout
+    )
+    return load_movielens_cache(cache_dir)
+
+
+def run_exclusive_build(lock_path, build, is_ready, wait_timeout: float = 900.0):
+    """
+    Ejecuta ``build`` en un solo proceso usando un bloqueo ``flock`` sobre un archivo.
+
+    Si otro proceso ya tiene el bloqueo, espera a que lo libere y verifica con
+    ``is_ready`` que el artefacto quedó disponible; si no lo está (el proceso que
+    construía murió a mitad de camino) lo construye él mismo. El kernel libera el
+    bloqueo cuando muere el proceso que lo tiene, así que no quedan bloqueos huérfanos.
+    """
+    lock_path = Path(lock_path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    # El archivo no se borra al terminar: otro proceso podría estar esperando sobre él
+    lock_fd = os.open(lock_path, os.O_CREAT | os.O_RDWR)
+    try:
+        waited = False
+        deadline = time.time() + wait_timeout
+        while True:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.time() >= deadline:
+                    raise TimeoutError(f"El artefacto protegido por {lock_path} no estuvo listo a tiempo")
+                waited = True
+                time.sleep(1.0)
+
+        try:
+            if waited and is_ready():
+                return
+            build()
+        finally:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+    finally:
+        os.close(lock_fd)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from api import constants as const
+
+    parser = argparse.ArgumentParser(description="Construye la caché columnar de MovieLens")
+    parser.add_argument("--movies", default=str(const.CSV_MOVIES_PATH), help="Ruta a movies.csv")
+    parser.add_argument("--ratings", default=str(const.CSV_RATINGS_PATH), help="Ruta a ratings.csv")
+    parser.add_argument("--out", default=str(const.MOVIELENS_CACHE_DIR), help="Directorio de la caché")
+    args = parser.parse_args()
+
+    meta = build_movielens_cache(args.movies, args.ratings, args.out)
+    print(f"✅ Caché de MovieLens generada en {args.out}: {meta['ratings_count']:,} ratings, "
+          f"{meta['movies_count']:,} películas, {meta['users_count']:,} usuarios ({meta['build_seconds']}s)")
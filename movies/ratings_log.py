@@ -0,0 +1,163 @@
+"""
+Ingesta de ratings en línea para el sistema de películas
+
+- RatingsLog: log append-only (JSON por línea) con los ratings recibidos por la API;
+  se reaplica al iniciar el servicio.
+- RatingsOverlay: ratings nuevos o modificados sobre la tabla base de MovieLens
+  (memory-map, inmutable), sin reconstruirla.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+
+class RatingsLog:
+    """Log append-only de ratings: una línea JSON por rating"""
+
+    def __init__(self, path, fsync: bool = False):
+        """
+        Args:
+            path: Ruta del archivo .jsonl
+            fsync: Forzar escritura a disco en cada rating (más lento, más durable)
+        """
+        self.path = Path(path)
+        self.fsync = fsync
+        self._lock = threading.Lock()
+
+    def append(self, user_id: int, movie_id: int, rating: float, timestamp: Optional[int] = None) -> dict:
+        """Agrega un rating al final del log y retorna el registro escrito"""
+        record = {
+            "userId": int(user_id),
+            "movieId": int(movie_id),
+            "rating": float(rating),
+            "timestamp": int(timestamp if timestamp is not None else time.time())
+        }
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+        return record
+
+    def replay(self) -> Iterator[dict]:
+        """Recorre los ratings registrados en orden (ignora una última línea incompleta)"""
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                yield json.loads(line)
+
+
+class RatingsOverlay:
+    """
+    Ratings recibidos en línea sobre la tabla base.
+
+    Guarda el último rating por (usuario, película) en diccionarios indexados por
+    índice denso; los usuarios nuevos reciben índices a partir del total de la tabla.
+    También mantiene la norma al cuadrado de cada película (vector de ratings por
+    usuario), usada para recalcular vecinos coseno con los ratings nuevos.
+    """
+
+    def __init__(self, table):
+        """
+        Args:
+            table: Tabla base de ratings (ver movies.movielens_cache.RatingsTable)
+        """
+        self.table = table
+        self.n_base_users = len(table.user_ids)
+        self._by_user: Dict[int, Dict[int, float]] = {}
+        self._by_movie: Dict[int, Dict[int, float]] = {}
+        self._added = 0
+        self._item_norms_sq = None
+
+    def __len__(self) -> int:
+        """Total de ratings (base + nuevos)"""
+        return len(self.table) + self._added
+
+    @property
+    def users(self):
+        """Índices densos de los usuarios con ratings en línea"""
+        return self._by_user.keys()
+
+    def entries(self) -> Iterator[Tuple[int, int, float]]:
+        """(usuario, película, rating) de cada rating en línea"""
+        for user_code, movies in self._by_user.items():
+            for movie_code, rating in movies.items():
+                yield user_code, movie_code, rating
+
+    def user_entries(self, user_code: int) -> Dict[int, float]:
+        """Ratings en línea de un usuario: {película: rating}"""
+        return self._by_user.get(user_code, {})
+
+    def movie_entries(self, movie_code: int) -> Dict[int, float]:
+        """Ratings en línea de una película: {usuario: rating}"""
+        return self._by_movie.get(movie_code, {})
+
+    def base_rating(self, user_code: int, movie_code: int) -> Optional[float]:
+        """Rating de la tabla base o None"""
+        if user_code >= self.n_base_users:
+            return None
+        codes, ratings = self.table.user_ratings(user_code)
+        pos = np.searchsorted(codes, movie_code)
+        if pos < len(codes) and codes[pos] == movie_code:
+            return float(ratings[pos])
+        return None
+
+    def current_rating(self, user_code: int, movie_code: int) -> Optional[float]:
+        """Rating vigente (en línea o base) o None"""
+        online = self._by_user.get(user_code, {}).get(movie_code)
+        return online if online is not None else self.base_rating(user_code, movie_code)
+
+    def item_norms_sq(self) -> np.ndarray:
+        """Norma al cuadrado del vector de ratings de cada película (base + en línea)"""
+        if self._item_norms_sq is None:
+            base = self.table.ratings.astype(np.float64)
+            norms = np.bincount(self.table.movie_codes, weights=base * base, minlength=len(self.table.movie_ids))
+            for user_code, movie_code, rating in self.entries():
+                previous = self.base_rating(user_code, movie_code) or 0.0
+                norms[movie_code] += rating * rating - previous * previous
+            self._item_norms_sq = norms
+        return self._item_norms_sq
+
+    def set(self, user_code: int, movie_code: int, rating: float) -> Optional[float]:
+        """
+        Registra un rating y retorna el rating anterior del usuario para la película (o None)
+        """
+        previous = self.current_rating(user_code, movie_code)
+        self._by_user.setdefault(user_code, {})[movie_code] = float(rating)
+        self._by_movie.setdefault(movie_code, {})[user_code] = float(rating)
+        if previous is None:
+            self._added += 1
+        if self._item_norms_sq is not None:
+            old = previous or 0.0
+            self._item_norms_sq[movie_code] += rating * rating - old * old
+        return previous
+
+    def user_ratings(self, user_code: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(índices densos de películas, ratings) del usuario, ordenados por película"""
+        if user_code < self.n_base_users:
+            codes, ratings = self.table.user_ratings(user_code)
+        else:
+            codes, ratings = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        online = self._by_user.get(user_code)
+        if not online:
+            return codes, ratings
+
+        new_codes = np.fromiter(online.keys(), dtype=np.int64, count=len(online))
+        new_ratings = np.fromiter(online.values(), dtype=np.float64, count=len(online))
+        keep = ~np.isin(codes, new_codes)
+        codes = np.concatenate([codes[keep], new_codes])
+        ratings = np.concatenate([ratings[keep], new_ratings])
+        order = np.argsort(codes, kind='stable')
+        return codes[order], ratings[order]
@@ -0,0 +1,109 @@
+"""
+Puntuación vectorizada de recomendaciones de películas
+
+Funciones sobre índices densos y arreglos de NumPy, compartidas por la API
+(cálculo en línea) y por la tabla precalculada de top-N (movies.topn_cache).
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Rating a partir del cual una película cuenta como "le gustó" al usuario
+LIKED_RATING = 4.0
+
+# Géneros preferidos considerados por usuario
+TOP_GENRES = 3
+
+
+def user_top_genres(genre_index, movie_codes: np.ndarray, ratings: np.ndarray, n: int = TOP_GENRES) -> np.ndarray:
+    """
+    Columnas de los géneros más frecuentes entre las películas que le gustaron al usuario.
+
+    Los empates se resuelven por orden de primera aparición (igual que
+    ``Counter.most_common``), recorriendo las películas en el orden recibido.
+    """
+    liked = movie_codes[ratings >= LIKED_RATING]
+    if len(liked) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    member = genre_index.matrix[liked]
+    counts = member.sum(axis=0)
+    # Clave de primera aparición: (posición de la película, posición del género en su texto)
+    keys = np.arange(len(liked))[:, None] * genre_index.positions.shape[1] + genre_index.positions[liked]
+    first_seen = np.where(member, keys, np.iinfo(np.int64).max).min(axis=0)
+
+    order = np.lexsort((first_seen, -counts))
+    order = order[counts[order] > 0]
+    return order[:n]
+
+
+def rank_by_genres(genre_index, movie_mean: np.ndarray, top_genres: np.ndarray,
+                   genre_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Películas que comparten algún género preferido, ordenadas por rating predicho.
+
+    predicted_rating = rating promedio + 0.5 * (géneros en común / géneros preferidos)
+
+    Returns:
+        (índices densos, ratings predichos) en orden descendente; los empates
+        conservan el orden del catálogo
+    """
+    if len(top_genres) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    matches = genre_index.matrix[:, top_genres].sum(axis=1)
+    eligible = matches > 0
+    if genre_mask is not None:
+        eligible &= genre_mask
+    codes = np.flatnonzero(eligible)
+
+    genre_similarity = matches[codes] / len(top_genres)
+    scores = movie_mean[codes] + (genre_similarity * 0.5)
+    order = np.argsort(-scores, kind='stable')
+    return codes[order], scores[order]
+
+
+def recommend_for_user(genre_index, movie_mean: np.ndarray, rated_codes: np.ndarray, rated_scores: np.ndarray,
+                       n: int, genre_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Recomendaciones personalizadas: películas no vistas de los géneros preferidos del usuario.
+
+    Returns:
+        (índices densos, ratings predichos, columnas de géneros preferidos)
+    """
+    top_genres = user_top_genres(genre_index, rated_codes, rated_scores)
+    codes, scores = rank_by_genres(genre_index, movie_mean, top_genres, genre_mask)
+    codes, scores = drop_rated(codes, scores, rated_codes, n)
+    return codes, scores, top_genres
+
+
+def drop_rated(codes: np.ndarray, scores: np.ndarray, rated_codes: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Quita de un ranking las películas ya calificadas y lo recorta a n elementos"""
+    # Basta con revisar los primeros n + (películas calificadas) elementos
+    head = min(len(codes), n + len(rated_codes))
+    unseen = ~np.isin(codes[:head], rated_codes)
+    return codes[:head][unseen][:n], scores[:head][unseen][:n]
+
+
+def genre_similar_movies(genre_index, movie_mean: np.ndarray, movie_code: int, n: int,
+                         genre_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Películas más parecidas por géneros (similitud de Jaccard), respaldo sin ratings.
+
+    Returns:
+        (índices densos, similitudes) ordenados por similitud y luego rating promedio
+    """
+    member = genre_index.matrix
+    target = member[movie_code]
+    common = member[:, target].sum(axis=1)
+    union = target.sum() + member.sum(axis=1) - common
+    similarity = common / union
+
+    eligible = similarity > 0
+    eligible[movie_code] = False
+    if genre_mask is not None:
+        eligible &= genre_mask
+    codes = np.flatnonzero(eligible)
+
+    order = np.lexsort((-movie_mean[codes], -similarity[codes]))[:n]
+    return codes[order], similarity[codes[order]]
@@ -0,0 +1,252 @@
+"""
+Índices de búsqueda por título y por género para el catálogo de películas
+
+- TitleIndex: índice invertido de tokens normalizados + similitud por trigramas,
+  para resolver títulos aproximados ("toy story", "Matrix") a un movieId.
+- GenreIndex: índice invertido de géneros (acepta nombres en español) para
+  filtrar candidatos antes de calcular scores.
+"""
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Palabras que no aportan al buscar títulos (inglés y español)
+_STOPWORDS = {"the", "a", "an", "of", "and", "el", "la", "los", "las", "un", "una", "de", "del", "y"}
+
+# MovieLens mueve el artículo al final: "Matrix, The (1999)"
+_TRAILING_ARTICLE = re.compile(r",\s*(the|a|an|les|la|le|el|il|los|las|die|der|das)$")
+_YEAR = re.compile(r"\(\s*\d{4}\s*\)")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+# Con menos candidatos por tokens que esto, la similitud se calcula solo sobre ellos
+_DIRECT_SCORING_LIMIT = 256
+
+# Nombres de géneros en español (sin acentos) -> género de MovieLens
+GENRE_ALIASES = {
+    "accion": "Action",
+    "aventura": "Adventure",
+    "aventuras": "Adventure",
+    "animacion": "Animation",
+    "animada": "Animation",
+    "infantil": "Children",
+    "ninos": "Children",
+    "comedia": "Comedy",
+    "crimen": "Crime",
+    "policial": "Crime",
+    "documental": "Documentary",
+    "fantasia": "Fantasy",
+    "cine negro": "Film-Noir",
+    "terror": "Horror",
+    "miedo": "Horror",
+    "misterio": "Mystery",
+    "romantica": "Romance",
+    "romanticas": "Romance",
+    "ciencia ficcion": "Sci-Fi",
+    "scifi": "Sci-Fi",
+    "suspenso": "Thriller",
+    "suspense": "Thriller",
+    "guerra": "War",
+    "belica": "War",
+    "vaqueros": "Western",
+    "oeste": "Western",
+}
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def normalize_title(title: str) -> str:
+    """Normaliza un título: minúsculas, sin acentos, sin año y con el artículo al inicio"""
+    text = _strip_accents(str(title)).lower().strip()
+    text = _YEAR.sub(" ", text).strip()
+    match = _TRAILING_ARTICLE.search(text)
+    if match:
+        text = f"{match.group(1)} {text[:match.start()]}"
+    return " ".join(_NON_ALNUM.sub(" ", text).split())
+
+
+def _tokens(normalized: str) -> List[str]:
+    return [t for t in normalized.split() if t not in _STOPWORDS]
+
+
+def _trigrams(normalized: str) -> set:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _postings(buckets: Dict[str, list]) -> Dict[str, np.ndarray]:
+    return {key: np.asarray(codes, dtype=np.int32) for key, codes in buckets.items()}
+
+
+class TitleIndex:
+    """
+    Búsqueda aproximada de títulos.
+
+    Los títulos se indexan por token normalizado y por trigrama; una consulta
+    suma las listas de trigramas con ``np.bincount`` (similitud de Jaccard) y
+    restringe a los títulos que contienen los tokens buscados cuando existen.
+    """
+
+    def __init__(self, titles, popularity: Optional[np.ndarray] = None):
+        """
+        Args:
+            titles: Títulos en el orden del índice denso de películas
+            popularity: Número de ratings por película (desempate entre títulos iguales)
+        """
+        self.size = len(titles)
+        self.popularity = popularity
+        self._normalized: List[str] = []
+        self._exact: Dict[str, list] = {}
+        token_buckets: Dict[str, list] = {}
+        trigram_buckets: Dict[str, list] = {}
+        trigram_counts = np.zeros(self.size, dtype=np.int32)
+
+        for code, title in enumerate(titles):
+            normalized = normalize_title(title)
+            self._normalized.append(normalized)
+            self._exact.setdefault(normalized, []).append(code)
+            for token in set(_tokens(normalized)):
+                token_buckets.setdefault(token, []).append(code)
+            grams = _trigrams(normalized)
+            trigram_counts[code] = len(grams)
+            for gram in grams:
+                trigram_buckets.setdefault(gram, []).append(code)
+
+        self._token_postings = _postings(token_buckets)
+        self._trigram_postings = _postings(trigram_buckets)
+        self._trigram_counts = trigram_counts
+
+    def _best_of(self, codes: np.ndarray) -> int:
+        if self.popularity is None or len(codes) == 1:
+            return int(codes[0])
+        return int(codes[np.argmax(self.popularity[codes])])
+
+    def search(self, query: str, limit: int = 5, min_score: float = 0.3) -> List[Tuple[int, float]]:
+        """
+        Busca títulos similares a la consulta.
+
+        Returns:
+            Lista de (índice denso, score 0-1) ordenada por score
+        """
+        normalized = normalize_title(query)
+        if not normalized:
+            return []
+
+        exact = self._exact.get(normalized)
+        if exact:
+            return [(self._best_of(np.asarray(exact)), 1.0)]
+
+        grams = _trigrams(normalized)
+
+        # Títulos que contienen todos los tokens de la consulta
+        candidates = None
+        token_lists = [self._token_postings.get(t) for t in _tokens(normalized)]
+        if token_lists and all(p is not None for p in token_lists):
+            candidates = token_lists[0]
+            for postings in token_lists[1:]:
+                candidates = np.intersect1d(candidates, postings, assume_unique=True)
+            if len(candidates) == 0:
+                candidates = None
+        token_match = candidates is not None
+
+        if candidates is not None and len(candidates) <= _DIRECT_SCORING_LIMIT:
+            shared = np.array([len(grams & _trigrams(self._normalized[c])) for c in candidates])
+            scores = shared / (len(grams) + self._trigram_counts[candidates] - shared)
+        else:
+            lists = [self._trigram_postings[g] for g in grams if g in self._trigram_postings]
+            if not lists:
+                return []
+            shared = np.bincount(np.concatenate(lists), minlength=self.size)
+            if candidates is None:
+                candidates = np.flatnonzero(shared)
+            shared = shared[candidates]
+            scores = shared / (len(grams) + self._trigram_counts[candidates] - shared)
+
+        if token_match:
+            # Un título que contiene la consulta completa no debe quedar bajo el umbral
+            scores = scores + 0.5 * (1.0 - scores)
+
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) == 0:
+            return []
+
+        if self.popularity is not None:
+            order = np.lexsort((-self.popularity[candidates], -scores))[:limit]
+        else:
+            order = np.argsort(-scores, kind='stable')[:limit]
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+    def resolve(self, query: str, min_score: float = 0.3) -> Optional[int]:
+        """Índice denso del título más parecido o None"""
+        matches = self.search(query, limit=1, min_score=min_score)
+        return matches[0][0] if matches else None
+
+
+class GenreIndex:
+    """
+    Índice invertido género -> índices densos de películas (y máscara booleana).
+
+    También expone la matriz película x género (``matrix``) y la posición de cada
+    género dentro del texto de la película (``positions``, -1 si no lo tiene),
+    usadas para puntuar géneros de forma vectorizada.
+    """
+
+    def __init__(self, genres):
+        """
+        Args:
+            genres: Géneros de cada película separados por "|" (orden del índice denso)
+        """
+        self.size = len(genres)
+        buckets: Dict[str, list] = {}
+        entries = []
+        for code, value in enumerate(genres):
+            for position, genre in enumerate(str(value).split('|')):
+                buckets.setdefault(genre, []).append(code)
+                entries.append((code, genre, position))
+        self._postings = _postings(buckets)
+
+        # Columnas en orden de primera aparición en el catálogo
+        self.names: List[str] = list(buckets)
+        self.columns = {name: col for col, name in enumerate(self.names)}
+        self.positions = np.full((self.size, len(self.names)), -1, dtype=np.int16)
+        for code, genre, position in entries:
+            if self.positions[code, self.columns[genre]] < 0:
+                self.positions[code, self.columns[genre]] = position
+        self.matrix = self.positions >= 0
+        self._by_key = {_strip_accents(g).lower(): g for g in self._postings}
+
+    @property
+    def genres(self) -> List[str]:
+        return sorted(self._postings)
+
+    def resolve(self, genre: str) -> Optional[str]:
+        """Traduce un género (en inglés o español) al nombre usado en el catálogo"""
+        key = " ".join(_NON_ALNUM.sub(" ", _strip_accents(str(genre)).lower()).split())
+        if key in self._by_key:
+            return self._by_key[key]
+        alias = GENRE_ALIASES.get(key) or GENRE_ALIASES.get(key.rstrip('s'))
+        if alias in self._postings:
+            return alias
+        compact = key.replace(" ", "")
+        for candidate_key, name in self._by_key.items():
+            if candidate_key.replace("-", "") == compact:
+                return name
+        return None
+
+    def codes(self, genre: str) -> Optional[np.ndarray]:
+        """Índices densos (ordenados) de las películas del género, o None si no se reconoce"""
+        name = self.resolve(genre)
+        return None if name is None else self._postings[name]
+
+    def mask(self, genre: str) -> Optional[np.ndarray]:
+        """Máscara booleana por índice denso para el género, o None si no se reconoce"""
+        codes = self.codes(genre)
+        if codes is None:
+            return None
+        mask = np.zeros(self.size, dtype=bool)
+        mask[codes] = True
+        return mask
@@ -0,0 +1,302 @@
+"""
+Tabla precalculada de recomendaciones top-N por película y por usuario activo
+
+La tabla se construye fuera de línea (CLI o tarea en segundo plano de la API) y
+se guarda en versiones inmutables dentro de un directorio raíz:
+
+    topn/
+        CURRENT             -> nombre de la versión vigente
+        v20250101T120000/   -> arreglos .npy + meta.json
+
+Los workers abren la versión vigente con memory-map y revisan periódicamente
+``CURRENT`` para tomar versiones nuevas sin reiniciar.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .movielens_cache import run_exclusive_build
+from .recommenders import LIKED_RATING, TOP_GENRES, drop_rated, genre_similar_movies, rank_by_genres, user_top_genres
+
+# Elementos guardados por lista (los requests con más recomendaciones se calculan en línea)
+DEFAULT_TOP_N = 20
+
+# Versiones que se conservan en disco (la vigente y la anterior, para workers que aún la usan)
+KEEP_VERSIONS = 2
+
+_CURRENT_FILE = "CURRENT"
+_META_FILE = "meta.json"
+_ARRAYS = ("movie_items", "movie_scores", "user_rows", "user_items", "user_scores", "user_genres")
+
+
+class TopNTable:
+    """
+    Listas top-N precalculadas.
+
+    - ``movie_items[c]`` / ``movie_scores[c]``: películas similares a la película ``c``
+      (vecinos item-item o, si no tiene ratings, similitud por géneros).
+    - ``user_rows[u]``: fila del usuario ``u`` en ``user_items`` / ``user_scores`` /
+      ``user_genres`` (-1 si no es un usuario activo).
+
+    Las listas se rellenan con -1 a la derecha.
+    """
+
+    def __init__(self, movie_items, movie_scores, user_rows, user_items, user_scores, user_genres, meta: Optional[dict] = None):
+        self.movie_items = movie_items
+        self.movie_scores = movie_scores
+        self.user_rows = user_rows
+        self.user_items = user_items
+        self.user_scores = user_scores
+        self.user_genres = user_genres
+        self.meta = meta or {}
+
+    @property
+    def top_n(self) -> int:
+        return self.movie_items.shape[1]
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.meta.get("version")
+
+    def movie_list(self, movie_code: int, n: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(índices densos, similitudes) de una película, o None si n supera la tabla"""
+        if n > self.top_n:
+            return None
+        codes = self.movie_items[movie_code, :n]
+        valid = codes >= 0
+        return codes[valid], self.movie_scores[movie_code, :n][valid]
+
+    def user_list(self, user_code: int, n: int) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """(índices densos, ratings predichos, géneros preferidos) de un usuario, o None si no está precalculado"""
+        if n > self.top_n or user_code >= len(self.user_rows):
+            return None
+        row = self.user_rows[user_code]
+        if row < 0:
+            return None
+        codes = self.user_items[row, :n]
+        valid = codes >= 0
+        genres = self.user_genres[row]
+        return codes[valid], self.user_scores[row, :n][valid], genres[genres >= 0]
+
+    def save(self, out_dir):
+        """Guarda los arreglos como .npy en un directorio nuevo (escritura atómica)"""
+        out_dir = Path(out_dir)
+        tmp_dir = out_dir.with_name(out_dir.name + f".tmp{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        for name in _ARRAYS:
+            np.save(tmp_dir / f"{name}.npy", getattr(self, name))
+        with open(tmp_dir / _META_FILE, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp_dir, out_dir)
+
+    @classmethod
+    def load(cls, out_dir) -> "TopNTable":
+        """Abre una versión guardada con memory-map"""
+        out_dir = Path(out_dir)
+        with open(out_dir / _META_FILE, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = [np.load(out_dir / f"{name}.npy", mmap_mode='r') for name in _ARRAYS]
+        return cls(*arrays, meta=meta)
+
+
+def build_topn_table(table, ratings_index, genre_index, item_neighbors, top_n: int = DEFAULT_TOP_N,
+                     min_liked: int = 1) -> TopNTable:
+    """
+    Calcula las listas top-N de todas las películas y de los usuarios activos.
+
+    Args:
+        table: Tabla de ratings (ver movies.movielens_cache.RatingsTable)
+        ratings_index: Índice de estadísticas (movies.ratings_index.RatingsIndex)
+        genre_index: Índice de géneros (movies.search_index.GenreIndex)
+        item_neighbors: Vecinos item-item precalculados
+        top_n: Elementos por lista
+        min_liked: Películas con rating >= 4 que necesita un usuario para considerarse activo
+    """
+    start_time = time.time()
+    n_movies = ratings_index.n_movies
+    movie_mean = ratings_index.movie_mean
+
+    # Películas: vecinos colaborativos; las que no tienen vecinos usan similitud por géneros
+    width = min(top_n, item_neighbors.k)
+    movie_items = np.full((n_movies, top_n), -1, dtype=np.int32)
+    movie_scores = np.zeros((n_movies, top_n), dtype=np.float32)
+    movie_items[:, :width] = item_neighbors.neighbors[:, :width]
+    movie_scores[:, :width] = item_neighbors.similarities[:, :width]
+    for code in np.flatnonzero(item_neighbors.neighbors[:, 0] < 0):
+        codes, sims = genre_similar_movies(genre_index, movie_mean, code, top_n)
+        movie_items[code, :len(codes)] = codes
+        movie_scores[code, :len(codes)] = sims
+
+    # Usuarios activos: al menos min_liked películas que les gustaron
+    liked = table.ratings >= LIKED_RATING
+    liked_counts = np.bincount(table.user_codes[liked], minlength=ratings_index.n_users)
+    active = np.flatnonzero(liked_counts >= min_liked)
+
+    user_rows = np.full(ratings_index.n_users, -1, dtype=np.int32)
+    user_rows[active] = np.arange(len(active), dtype=np.int32)
+    user_items = np.full((len(active), top_n), -1, dtype=np.int32)
+    user_scores = np.zeros((len(active), top_n), dtype=np.float64)
+    user_genres = np.full((len(active), TOP_GENRES), -1, dtype=np.int16)
+
+    # El ranking depende solo del conjunto de géneros preferidos: se calcula una vez por conjunto
+    rankings = {}
+    for row, user_code in enumerate(active):
+        rated_codes, rated_scores = table.user_ratings(user_code)
+        genres = user_top_genres(genre_index, rated_codes, rated_scores)
+        key = tuple(sorted(genres.tolist()))
+        if key not in rankings:
+            rankings[key] = rank_by_genres(genre_index, movie_mean, genres)
+        codes, scores = drop_rated(*rankings[key], rated_codes, top_n)
+        user_items[row, :len(codes)] = codes
+        user_scores[row, :len(codes)] = scores
+        user_genres[row, :len(genres)] = genres
+
+    meta = {
+        "top_n": int(top_n),
+        "movies_count": int(n_movies),
+        "active_users": int(len(active)),
+        "build_seconds": round(time.time() - start_time, 2),
+    }
+    return TopNTable(movie_items, movie_scores, user_rows, user_items, user_scores, user_genres, meta)
+
+
+def read_current_version(root) -> Optional[str]:
+    """Nombre de la versión vigente (contenido de CURRENT) o None"""
+    try:
+        with open(Path(root) / _CURRENT_FILE, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish_version(root, version: str):
+    """Apunta CURRENT a una versión (reemplazo atómico) y borra versiones antiguas"""
+    root = Path(root)
+    tmp_path = root / f"{_CURRENT_FILE}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(tmp_path, root / _CURRENT_FILE)
+
+    versions = sorted(p for p in root.iterdir() if p.is_dir() and p.name.startswith("v") and ".tmp" not in p.name)
+    for old in versions[:-KEEP_VERSIONS]:
+        if old.name != version:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def rebuild_topn_cache(root, table, ratings_index, genre_index, item_neighbors, source: Optional[dict] = None,
+                       top_n: int = DEFAULT_TOP_N, force: bool = False) -> str:
+    """
+    Construye y publica una nueva versión si las entradas cambiaron (o si force=True).
+
+    Args:
+        root: Directorio raíz de las versiones
+        source: Identificador de los datos de entrada; si coincide con el de la versión
+            vigente no se recalcula nada
+    Returns:
+        Nombre de la versión vigente al terminar
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+
+    def _is_ready():
+        if force:
+            return False
+        version = read_current_version(root)
+        if version is None or not (root / version / _META_FILE).exists():
+            return False
+        with open(root / version / _META_FILE, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return meta.get("source") == source and meta.get("top_n") == top_n
+
+    def _build():
+        result = build_topn_table(table, ratings_index, genre_index, item_neighbors, top_n)
+        version = time.strftime("v%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+        result.meta.update({"version": version, "source": source, "built_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+        result.save(root / version)
+        publish_version(root, version)
+
+    if not _is_ready():
+        # Si otro proceso está construyendo, basta con que publique una versión
+        run_exclusive_build(root / "build.lock", _build, lambda: read_current_version(root) is not None)
+    return read_current_version(root)
+
+
+class TopNStore:
+    """
+    Acceso a la versión vigente de la tabla top-N.
+
+    ``current()`` revisa ``CURRENT`` como máximo cada ``check_interval`` segundos y
+    abre la nueva versión cuando cambia, sin reiniciar el proceso.
+    """
+
+    def __init__(self, root, check_interval: float = 5.0):
+        self.root = Path(root)
+        self.check_interval = check_interval
+        self._table: Optional[TopNTable] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[TopNTable]:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._table
+        with self._lock:
+            if now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                version = read_current_version(self.root)
+                if version is None:
+                    self._table = None
+                elif self._table is None or self._table.version != version:
+                    try:
+                        self._table = TopNTable.load(self.root / version)
+                    except (FileNotFoundError, ValueError, json.JSONDecodeError):
+                        # Versión borrada o incompleta: se reintenta en la próxima revisión
+                        pass
+        return self._table
+
+    def reload(self) -> Optional[TopNTable]:
+        """Fuerza la revisión de CURRENT en la próxima consulta"""
+        self._checked_at = 0.0
+        return self.current()
+
+
+if __name__ == "__main__":
+    import argparse
+    import pickle
+    import sys
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from api import constants as const
+    from movies.item_neighbors import load_or_build_item_neighbors
+    from movies.movielens_cache import load_movielens, read_cache_meta
+    from movies.ratings_index import RatingsIndex
+    from movies.search_index import GenreIndex
+
+    parser = argparse.ArgumentParser(description="Precalcula las listas top-N de películas y usuarios")
+    parser.add_argument("--top-n", type=int, default=DEFAULT_TOP_N, help="Elementos por lista")
+    parser.add_argument("--force", action="store_true", help="Reconstruir aunque las entradas no hayan cambiado")
+    args = parser.parse_args()
+
+    movies_df, ratings_table = load_movielens(const.CSV_MOVIES_PATH, const.CSV_RATINGS_PATH, const.MOVIELENS_CACHE_DIR)
+    model_path = const.ML_MODELS_PATH / "knn_movie_recommendation_model.pkl"
+    knn = None
+    if model_path.exists():
+        with open(model_path, 'rb') as f:
+            knn = pickle.load(f)
+
+    cache_meta = read_cache_meta(const.MOVIELENS_CACHE_DIR)
+    neighbors = load_or_build_item_neighbors(ratings_table, knn, const.MOVIELENS_CACHE_DIR / "neighbors", cache_meta)
+    version = rebuild_topn_cache(
+        const.MOVIELENS_CACHE_DIR / "topn", ratings_table, RatingsIndex.from_table(ratings_table),
+        GenreIndex(movies_df['genres'].tolist()), neighbors,
+        source={"movielens": cache_meta, "neighbors_k": neighbors.k}, top_n=args.top_n, force=args.force
+    )
+    print(f"✅ Tabla top-N vigente: {version}")
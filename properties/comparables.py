@@ -0,0 +1,215 @@
+"""
+Índice espacial de propiedades comparables construido a partir de properties_2016.csv (Zillow)
+
+La tabla de propiedades (~3M filas, 58 columnas) se reduce por bloques a las columnas
+necesarias para mostrar comparables, en arreglos compactos:
+
+- parcel_id (int64), latitude / longitude (float32, grados)
+- price: valor tasado total (taxvaluedollarcnt)
+- sqft, bedrooms, bathrooms, year_built (float32, NaN si no se conocen)
+
+La tabla se guarda como .npz; al iniciar el servicio se construye sobre ella un
+KD-tree (``scipy.spatial.cKDTree``) con las coordenadas proyectadas a kilómetros y,
+opcionalmente, el tamaño como tercera dimensión. Cada consulta de k vecinos es
+O(log n) y toma fracciones de milisegundo.
+"""
+import json
+import os
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from api.data_sources import source_signature
+
+_USECOLS = ['parcelid', 'latitude', 'longitude', 'taxvaluedollarcnt', 'calculatedfinishedsquarefeet',
+            'bedroomcnt', 'bathroomcnt', 'yearbuilt']
+
+# Kilómetros por grado de latitud; los de longitud se escalan por cos(latitud de referencia)
+KM_PER_DEGREE = 111.195
+
+# Kilómetros equivalentes a una unidad de log(pies cuadrados) cuando el tamaño se usa
+# como dimensión del árbol: duplicar el tamaño "aleja" lo mismo que ~0.7 km
+SIZE_WEIGHT_KM = 1.0
+
+
+class ComparablesIndex:
+    """Propiedades con precio conocido y KD-tree para buscar las k más cercanas"""
+
+    def __init__(self, parcel_id, latitude, longitude, price, sqft, bedrooms, bathrooms, year_built,
+                 meta: Optional[dict] = None, size_weight_km: Optional[float] = SIZE_WEIGHT_KM):
+        """
+        Args:
+            parcel_id, latitude, longitude, price, sqft, bedrooms, bathrooms, year_built: Columnas
+            meta: Metadatos del origen del índice
+            size_weight_km: Peso del log del tamaño en el árbol (None: solo coordenadas)
+        """
+        self.parcel_id = parcel_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.price = price
+        self.sqft = sqft
+        self.bedrooms = bedrooms
+        self.bathrooms = bathrooms
+        self.year_built = year_built
+        self.meta = meta or {}
+        self.size_weight_km = size_weight_km
+        self.reference_latitude = float(np.mean(latitude)) if len(latitude) else 0.0
+        known = sqft[~np.isnan(sqft)]
+        self.median_sqft = float(np.median(known)) if len(known) else 1500.0
+        self._tree = None
+
+    def __len__(self) -> int:
+        return len(self.parcel_id)
+
+    def _points(self, latitude, longitude, sqft=None) -> np.ndarray:
+        """Coordenadas del árbol: (x, y) en km y, opcionalmente, el log del tamaño escalado"""
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        columns = [longitude * KM_PER_DEGREE * np.cos(np.radians(self.reference_latitude)),
+                   latitude * KM_PER_DEGREE]
+        if self.size_weight_km is not None:
+            # Sin tamaño conocido se usa la mediana del índice
+            sqft = np.full(latitude.shape, self.median_sqft) if sqft is None else np.asarray(sqft, dtype=np.float64)
+            sqft = np.where(np.isnan(sqft) | (sqft <= 0), self.median_sqft, sqft)
+            columns.append(np.log(sqft) * self.size_weight_km)
+        return np.column_stack(columns)
+
+    def build_tree(self):
+        """Construye el KD-tree (una vez, al cargar el índice)"""
+        from scipy.spatial import cKDTree
+        self._tree = cKDTree(self._points(self.latitude, self.longitude, self.sqft),
+                             leafsize=32, balanced_tree=False, compact_nodes=True)
+        return self
+
+    def query(self, latitude: float, longitude: float, k: int = 5, sqft: Optional[float] = None) -> List[dict]:
+        """
+        Las ``k`` propiedades comparables más cercanas a un punto (y tamaño, si el
+        índice lo usa), de la más cercana a la más lejana.
+        """
+        if self._tree is None:
+            self.build_tree()
+        k = min(k, len(self))
+        if k <= 0:
+            return []
+        _, rows = self._tree.query(self._points([latitude], [longitude], None if sqft is None else [sqft])[0], k=k)
+        rows = np.atleast_1d(rows)
+
+        # Distancia geográfica (sin la dimensión de tamaño) desde el punto consultado
+        dx = (self.longitude[rows] - longitude) * KM_PER_DEGREE * np.cos(np.radians(self.reference_latitude))
+        dy = (self.latitude[rows] - latitude) * KM_PER_DEGREE
+        distance_km = np.hypot(dx, dy)
+
+        def _optional(values):
+            return [None if np.isnan(value) else value for value in values.astype(np.float64).tolist()]
+
+        return [
+            {
+                'parcel_id': parcel_id,
+                'latitude': round(lat, 6),
+                'longitude': round(lon, 6),
+                'distance_km': round(distance, 3),
+                'price': round(price, 2),
+                'sqft': None if sqft_value is None else round(sqft_value, 1),
+                'bedrooms': bedrooms,
+                'bathrooms': bathrooms,
+                'year_built': None if year_built is None else int(year_built)
+            }
+            for parcel_id, lat, lon, distance, price, sqft_value, bedrooms, bathrooms, year_built in zip(
+                self.parcel_id[rows].tolist(), self.latitude[rows].astype(np.float64).tolist(),
+                self.longitude[rows].astype(np.float64).tolist(), distance_km.tolist(),
+                self.price[rows].astype(np.float64).tolist(), _optional(self.sqft[rows]),
+                _optional(self.bedrooms[rows]), _optional(self.bathrooms[rows]), _optional(self.year_built[rows])
+            )
+        ]
+
+    def save(self, path):
+        """Guarda la tabla como .npz (reemplazo atómico); el árbol se reconstruye al cargar"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.stem + f".tmp{os.getpid()}.npz")
+        np.savez(
+            tmp_path, parcel_id=self.parcel_id, latitude=self.latitude, longitude=self.longitude,
+            price=self.price, sqft=self.sqft, bedrooms=self.bedrooms, bathrooms=self.bathrooms,
+            year_built=self.year_built, meta=np.array(json.dumps(self.meta))
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, size_weight_km: Optional[float] = SIZE_WEIGHT_KM) -> "ComparablesIndex":
+        with np.load(path) as data:
+            return cls(
+                data['parcel_id'], data['latitude'], data['longitude'], data['price'], data['sqft'],
+                data['bedrooms'], data['bathrooms'], data['year_built'], json.loads(str(data['meta'])),
+                size_weight_km
+            )
+
+
+def build_comparables_index(csv_path, chunksize: int = 500_000) -> ComparablesIndex:
+    """
+    Reduce properties_2016.csv por bloques a las propiedades con coordenadas y precio.
+
+    Args:
+        csv_path: Ruta al CSV de propiedades
+        chunksize: Filas leídas por bloque
+    """
+    start_time = time.time()
+    parts = {name: [] for name in _USECOLS}
+    rows_read = 0
+
+    for chunk in pd.read_csv(csv_path, usecols=_USECOLS, dtype=np.float64, chunksize=chunksize):
+        rows_read += len(chunk)
+        chunk = chunk.dropna(subset=['latitude', 'longitude', 'taxvaluedollarcnt'])
+        chunk = chunk[chunk['taxvaluedollarcnt'] > 0]
+        for name in _USECOLS:
+            parts[name].append(chunk[name].to_numpy(dtype=np.float64))
+
+    columns = {name: np.concatenate(values) if values else np.empty(0) for name, values in parts.items()}
+    latitude, longitude = columns['latitude'], columns['longitude']
+    # El dataset de Zillow guarda las coordenadas en millonésimas de grado
+    if len(latitude) and np.nanmax(np.abs(latitude)) > 90:
+        latitude, longitude = latitude / 1e6, longitude / 1e6
+
+    meta = {
+        "source": source_signature(csv_path),
+        "rows": int(rows_read),
+        "properties": int(len(latitude)),
+        "build_seconds": round(time.time() - start_time, 2),
+    }
+    return ComparablesIndex(
+        columns['parcelid'].astype(np.int64),
+        latitude.astype(np.float32),
+        longitude.astype(np.float32),
+        columns['taxvaluedollarcnt'].astype(np.float32),
+        columns['calculatedfinishedsquarefeet'].astype(np.float32),
+        columns['bedroomcnt'].astype(np.float32),
+        columns['bathroomcnt'].astype(np.float32),
+        columns['yearbuilt'].astype(np.float32),
+        meta
+    )
+
+
+def load_comparables_index(path, size_weight_km: Optional[float] = SIZE_WEIGHT_KM) -> Optional[ComparablesIndex]:
+    """Carga el índice de comparables si existe (None si no se ha construido)"""
+    if not os.path.exists(path):
+        return None
+    return ComparablesIndex.load(path, size_weight_km)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from api import constants as const
+
+    parser = argparse.ArgumentParser(description="Construye el índice de comparables a partir de properties_2016.csv")
+    parser.add_argument("--csv", default=str(const.CSV_PROPERTIES_PATH), help="Ruta a properties_2016.csv")
+    parser.add_argument("--out", default=str(const.COMPARABLES_INDEX_PATH), help="Archivo .npz de salida")
+    args = parser.parse_args()
+
+    index = build_comparables_index(args.csv)
+    index.save(args.out)
+    print(f"✅ Índice de comparables generado en {args.out}: {len(index):,} propiedades a partir de {index.meta['rows']:,} filas")
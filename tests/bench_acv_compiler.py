@@ -0,0 +1,77 @@
+# tests/bench_acv_compiler.py
+"""
+Benchmark y verificación del pipeline de ACV compilado (acv/tree_compiler.py).
+
+Verifica clase y probabilidades contra predict/predict_proba del pipeline en un
+conjunto de pacientes sintéticos (umbrales del árbol, categorías desconocidas y
+faltantes) y compara la latencia por paciente y el throughput en lote.
+
+Uso:
+    python tests/bench_acv_compiler.py
+    python tests/bench_acv_compiler.py --fixtures 20000 --show-source
+"""
+from pathlib import Path
+import argparse
+import pickle
+import sys
+import time
+import warnings
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from api import constants as const
+from acv.tree_compiler import CompiledTreePipeline
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de ACV compilado")
+    parser.add_argument("--fixtures", type=int, default=5000, help="Pacientes sintéticos para verificar")
+    parser.add_argument("--batch", type=int, default=10000, help="Pacientes del benchmark en lote")
+    parser.add_argument("--show-source", action="store_true", help="Mostrar el código generado")
+    args = parser.parse_args()
+
+    with open(const.ML_MODELS_PATH / "ACV_decision_tree_model.pkl", 'rb') as f:
+        pipeline = pickle.load(f)
+    compiled = CompiledTreePipeline(pipeline)
+    if args.show_source:
+        print(compiled.source)
+
+    fixtures = compiled.fixture_frame(args.fixtures, seed=1)
+    print(f"🧪 Verificación en {len(fixtures):,} pacientes: {'✅ idéntico' if compiled.verify(pipeline, fixtures) else '❌ difiere'}")
+
+    patient = {
+        'gender': 'Male', 'age': 67.0, 'hypertension': 1, 'heart_disease': 0, 'ever_married': 'Yes',
+        'work_type': 'Private', 'Residence_type': 'Urban', 'avg_glucose_level': 180.0, 'bmi': 31.0,
+        'smoking_status': 'smokes'
+    }
+    input_df = pd.DataFrame([{**patient, 'stroke': 0}])
+
+    def _sklearn_one():
+        pipeline.predict(input_df)
+        pipeline.predict_proba(input_df)
+
+    sklearn_us = timed(_sklearn_one, 200) * 1e6
+    compiled_us = timed(lambda: compiled.predict_one(patient), 20000) * 1e6
+    print(f"🩺 Un paciente: sklearn {sklearn_us:,.1f} µs | compilado {compiled_us:,.2f} µs ({sklearn_us / compiled_us:,.0f}x)")
+
+    batch = compiled.fixture_frame(args.batch, seed=2)
+    sklearn_s = timed(lambda: (pipeline.predict(batch), pipeline.predict_proba(batch)), 3)
+    compiled_s = timed(lambda: compiled.predict_batch(batch), 3)
+    print(f"📦 Lote de {len(batch):,}: sklearn {sklearn_s * 1e3:,.1f} ms ({len(batch) / sklearn_s:,.0f}/s) | "
+          f"compilado {compiled_s * 1e3:,.1f} ms ({len(batch) / compiled_s:,.0f}/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# tests/bench_avocado_predict.py
+"""
+Benchmark de la predicción de precios de aguacate: antes (pickle + DataFrame en
+model.predict) y después (.cbm + CatBoostPredictor con matrices preparadas).
+
+Mide la carga del modelo, la primera predicción (sin y con calentamiento), la latencia
+por request de /predict (armado de features + predicción) y lotes de varias filas, y
+verifica que ambas rutas predigan exactamente lo mismo.
+El modelo se carga con un solo hilo por request; ``--sizes`` grandes usan CATBOOST_THREAD_COUNT.
+
+Uso:
+    python tests/bench_avocado_predict.py
+    python tests/bench_avocado_predict.py --sizes 1 48 1000 --seconds 2
+"""
+from pathlib import Path
+import argparse
+import pickle
+import sys
+import time
+import warnings
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from api import constants as const
+from avocado.catboost_model import CatBoostPredictor, load_catboost_model
+
+warnings.filterwarnings("ignore")
+
+
+def timed(fn, min_seconds):
+    """Mediana de la latencia por llamada (segundos)"""
+    samples = []
+    deadline = time.perf_counter() + min_seconds
+    while len(samples) < 5 or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de predicción de aguacate (pickle vs .cbm)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 48, 1000], help="Filas por lote")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Tiempo mínimo por medición")
+    args = parser.parse_args()
+
+    if not const.AVOCADO_MODEL_CBM_PATH.exists():
+        print("❌ Falta ml_models/avocado_model.cbm: ejecutar python avocado/catboost_model.py")
+        return
+
+    start = time.perf_counter()
+    with open(const.AVOCADO_MODEL_PKL_PATH, 'rb') as f:
+        pickled = pickle.load(f)
+    pickle_load = time.perf_counter() - start
+    start = time.perf_counter()
+    native, _ = load_catboost_model(const.AVOCADO_MODEL_CBM_PATH)
+    cbm_load = time.perf_counter() - start
+    print(f"📦 Carga: pickle {pickle_load * 1e3:.1f} ms | .cbm {cbm_load * 1e3:.1f} ms")
+
+    from api.routes.avocado_api import (CATBOOST_PARALLEL_MIN_ROWS, CATBOOST_THREAD_COUNT,
+                                        AvocadoPredictionRequest, create_features_from_avocado_data)
+    request = AvocadoPredictionRequest(date="2018-06-03", region="California", type="organic")
+    features = create_features_from_avocado_data(request)
+    feature_cols = list(native.feature_names_)
+
+    # Primera predicción de un modelo recién cargado, sin y con calentamiento
+    cold_model, _ = load_catboost_model(const.AVOCADO_MODEL_CBM_PATH)
+    predictor = CatBoostPredictor(cold_model, feature_cols, CATBOOST_THREAD_COUNT, CATBOOST_PARALLEL_MIN_ROWS)
+    predictor.use_pool = True
+    start = time.perf_counter()
+    predictor.predict(features)
+    cold = time.perf_counter() - start
+    warm_model, _ = load_catboost_model(const.AVOCADO_MODEL_CBM_PATH)
+    predictor = CatBoostPredictor(warm_model, feature_cols, CATBOOST_THREAD_COUNT, CATBOOST_PARALLEL_MIN_ROWS)
+    if not predictor.verify():
+        print("⚠️ Los Pool preparados no coinciden con model.predict: se mide la ruta DataFrame")
+    predictor.warm_up(features)
+    start = time.perf_counter()
+    predictor.predict(features)
+    warm = time.perf_counter() - start
+    print(f"🔥 Primera predicción: sin calentar {cold * 1e3:.2f} ms | calentado {warm * 1e3:.2f} ms")
+
+    before = timed(lambda: pickled.predict(create_features_from_avocado_data(request)), args.seconds)
+    after = timed(lambda: predictor.predict(create_features_from_avocado_data(request)), args.seconds)
+    print(f"🥑 Request /predict: antes {before * 1e3:.3f} ms | después {after * 1e3:.3f} ms | {before / after:.1f}x")
+
+    for n_rows in args.sizes:
+        frame = features.iloc[np.zeros(n_rows, dtype=np.int64)].reset_index(drop=True)
+        frame['AveragePrice_lag_1'] = np.linspace(0.5, 3.0, n_rows)
+        identical = np.array_equal(pickled.predict(frame), predictor.predict(frame))
+        before = timed(lambda: pickled.predict(frame), args.seconds)
+        after = timed(lambda: predictor.predict(frame), args.seconds)
+        print(f"📊 {n_rows:>6} filas | antes {before * 1e3:9.3f} ms | después {after * 1e3:9.3f} ms | "
+              f"{before / after:5.1f}x | idéntico: {'✅' if identical else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
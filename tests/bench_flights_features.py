@@ -0,0 +1,108 @@
+# tests/bench_flights_features.py
+"""
+Microbenchmark del armado de features para predicciones de vuelos.
+
+Compara la latencia por request del camino anterior (dict -> DataFrame ->
+reindex -> iloc[0].to_dict()) contra FlightFeatureEncoder (fila float32
+preasignada), solo el armado y armado + predict.
+
+Uso:
+    python tests/bench_flights_features.py              # modelo de ml_models/
+    python tests/bench_flights_features.py --synthetic  # Random Forest sintético
+"""
+from pathlib import Path
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from api import constants as const
+from api.routes.flights_api import (AIRLINE_MAPPING, AIRPORT_MAPPING, CATEGORY_DEFAULTS, FALLBACK_MAPPINGS,
+                                    transform_user_data_to_model_format)
+from flights.feature_encoder import FlightFeatureEncoder
+
+FEATURES = ['Month', 'DayofMonth', 'DayOfWeek', 'DepTime', 'CRSDepTime', 'CRSArrTime',
+            'UniqueCarrier', 'Origin', 'Dest', 'Distance', 'DepDelay']
+
+
+def synthetic_model_data(n_estimators):
+    from sklearn.ensemble import RandomForestRegressor
+
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({column: rng.integers(0, 2400, 5000) for column in FEATURES})
+    y = rng.normal(10, 30, 5000)
+    model = RandomForestRegressor(n_estimators=n_estimators, max_depth=20, random_state=0).fit(X, y)
+    return {'model': model, 'feature_columns': FEATURES, 'training_info': {'r2_score': 0.9}}
+
+
+def legacy_features(model_input, feature_columns):
+    """Camino anterior: mapeos por request + DataFrame + reindex"""
+    model_input = dict(model_input)
+    airline_mapping = dict(AIRLINE_MAPPING)
+    airport_mapping = dict(AIRPORT_MAPPING)
+    model_input['UniqueCarrier'] = airline_mapping.get(model_input['UniqueCarrier'], 1)
+    model_input['Origin'] = airport_mapping.get(model_input['Origin'], 14)
+    model_input['Dest'] = airport_mapping.get(model_input['Dest'], 24)
+    input_df = pd.DataFrame([model_input]).reindex(columns=feature_columns, fill_value=0)
+    input_df.iloc[0].to_dict()
+    return input_df
+
+
+def timed(fn, inputs):
+    start = time.perf_counter()
+    for item in inputs:
+        fn(item)
+    return (time.perf_counter() - start) / len(inputs) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark del armado de features de vuelos")
+    parser.add_argument("--synthetic", action="store_true", help="Usar un Random Forest sintético")
+    parser.add_argument("--trees", type=int, default=50, help="Árboles del modelo sintético")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    model_path = const.ML_MODELS_PATH / "flight_delay_v1_2025-10-25.pkl"
+    if args.synthetic or not os.path.exists(model_path):
+        print("ℹ️ Usando modelo sintético")
+        model_data = synthetic_model_data(args.trees)
+    else:
+        import joblib
+        model_data = joblib.load(model_path)
+
+    model = model_data['model']
+    feature_columns = model_data['feature_columns']
+    encoder = FlightFeatureEncoder.from_model_data(model_data, FALLBACK_MAPPINGS, CATEGORY_DEFAULTS)
+
+    rng = np.random.default_rng(1)
+    airports = list(AIRPORT_MAPPING)
+    inputs = [
+        transform_user_data_to_model_format({
+            'date': f"2025-{rng.integers(1, 13):02d}-{rng.integers(1, 29):02d}",
+            'departure_time': f"{rng.integers(0, 24):02d}:{rng.integers(0, 60):02d}",
+            'origin': rng.choice(airports), 'destination': rng.choice(airports),
+            'airline': rng.choice(list(AIRLINE_MAPPING)), 'delay_at_departure': float(rng.normal(5, 20))
+        })
+        for _ in range(args.requests)
+    ]
+
+    legacy_us = timed(lambda item: legacy_features(item, feature_columns), inputs)
+    encoder_us = timed(encoder.encode, inputs)
+
+    n_predict = min(args.requests, 300)
+    legacy_total = timed(lambda item: model.predict(legacy_features(item, feature_columns)), inputs[:n_predict])
+    encoder_total = timed(lambda item: model.predict(encoder.encode(item)), inputs[:n_predict])
+
+    print(f"🧩 Armado de features: anterior {legacy_us:,.1f} µs | encoder {encoder_us:,.1f} µs "
+          f"({legacy_us / encoder_us:.0f}x)")
+    print(f"🚀 Armado + predict:   anterior {legacy_total / 1000:,.2f} ms | encoder {encoder_total / 1000:,.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# tests/bench_movies_batch_ratings.py
+"""
+Benchmark de predicción de ratings en lote (pares usuario-película por segundo).
+
+Compara la predicción individual (un par por llamada) contra
+RatingsIndex.predict_batch sobre un índice sintético del tamaño de MovieLens.
+
+Uso:
+    python tests/bench_movies_batch_ratings.py --users 160000 --movies 60000 --pairs 2000000
+"""
+from pathlib import Path
+import argparse
+import sys
+import time
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from movies.ratings_index import RatingsIndex
+
+
+def build_index(n_users, n_movies, n_ratings, rng):
+    movie_ids = np.sort(rng.choice(n_movies * 3, n_movies, replace=False)).astype(np.int64)
+    user_ids = np.arange(1, n_users + 1, dtype=np.int64)
+    movie_codes = rng.integers(0, n_movies, n_ratings)
+    user_codes = rng.integers(0, n_users, n_ratings)
+    ratings = rng.integers(1, 11, n_ratings).astype(np.float32) / 2
+    return RatingsIndex(movie_ids, user_ids, movie_codes, user_codes, ratings)
+
+
+def predict_one(index, user_id, movie_id):
+    """Predicción individual (equivalente a la del endpoint /predict-rating)"""
+    user_avg, user_count = index.user_stats(user_id)
+    if index.movie_code(movie_id) is None:
+        return user_avg, 50.0
+    movie_avg, movie_count = index.movie_stats(movie_id)
+    return (user_avg * 0.6) + (movie_avg * 0.4), 60 + min(30, user_count * 3) + min(10, movie_count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de predicción de ratings en lote")
+    parser.add_argument("--users", type=int, default=160000)
+    parser.add_argument("--movies", type=int, default=60000)
+    parser.add_argument("--ratings", type=int, default=5000000)
+    parser.add_argument("--pairs", type=int, default=2000000)
+    parser.add_argument("--chunk", type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    index = build_index(args.users, args.movies, args.ratings, rng)
+
+    # Incluye usuarios y películas desconocidos
+    user_ids = rng.integers(1, int(args.users * 1.05), args.pairs)
+    movie_ids = rng.integers(0, args.movies * 3, args.pairs)
+
+    n_single = min(args.pairs, 50000)
+    start = time.perf_counter()
+    single = [predict_one(index, u, m) for u, m in zip(user_ids[:n_single].tolist(), movie_ids[:n_single].tolist())]
+    single_rate = n_single / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for offset in range(0, args.pairs, args.chunk):
+        index.predict_batch(user_ids[offset:offset + args.chunk], movie_ids[offset:offset + args.chunk])
+    batch_rate = args.pairs / (time.perf_counter() - start)
+
+    prediction, confidence = index.predict_batch(user_ids[:n_single], movie_ids[:n_single])
+    expected = np.array(single)
+    assert np.array_equal(prediction, expected[:, 0]) and np.array_equal(confidence, expected[:, 1]), \
+        "predict_batch no coincide con la predicción individual"
+
+    print(f"📊 Pares: {args.pairs:,} (bloques de {args.chunk:,})")
+    print(f"🐢 Individual: {single_rate:,.0f} pares/s")
+    print(f"🚀 Lote:       {batch_rate:,.0f} pares/s ({batch_rate / single_rate:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# tests/bench_tree_engine.py
+"""
+Benchmark del motor compilado de árboles (api/tree_engine.py) contra model.predict.
+
+Para cada tamaño de lote mide latencia por llamada y throughput (filas/s) de
+scikit-learn, del motor compilado y del despacho que usan las APIs
+(predict_rows: motor hasta COMPILED_MAX_ROWS filas), y verifica que las
+predicciones sean idénticas bit a bit.
+
+Uso:
+    python tests/bench_tree_engine.py --model flights       # ml_models/flight_delay_v1_2025-10-25.pkl
+    python tests/bench_tree_engine.py --model properties    # ml_models/random_forest_properties.pkl
+    python tests/bench_tree_engine.py --model synthetic --trees 200 --depth 20
+"""
+from pathlib import Path
+import argparse
+import sys
+import time
+import warnings
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from api import constants as const
+from api.tree_engine import COMPILED_MAX_ROWS, CompiledForest, predict_rows
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+
+def load_model(name, trees, depth, features):
+    if name == 'flights':
+        import joblib
+        return joblib.load(const.ML_MODELS_PATH / "flight_delay_v1_2025-10-25.pkl")['model']
+    if name == 'properties':
+        import pickle
+        with open(const.ML_MODELS_PATH / "random_forest_properties.pkl", 'rb') as f:
+            return pickle.load(f)
+
+    from sklearn.ensemble import RandomForestRegressor
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(20000, features))
+    y = 3 * X[:, 0] + 5 * np.sin(X[:, 1]) + X[:, 2] * X[:, 3] + rng.normal(size=len(X))
+    return RandomForestRegressor(n_estimators=trees, max_depth=depth, random_state=0).fit(X, y)
+
+
+def timed(fn, X, min_seconds):
+    """Mediana de la latencia por llamada (segundos)"""
+    samples = []
+    deadline = time.perf_counter() + min_seconds
+    while len(samples) < 3 or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn(X)
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del motor compilado de árboles")
+    parser.add_argument("--model", choices=["flights", "properties", "synthetic"], default="synthetic")
+    parser.add_argument("--trees", type=int, default=50, help="Árboles del modelo sintético")
+    parser.add_argument("--depth", type=int, default=15, help="Profundidad del modelo sintético")
+    parser.add_argument("--features", type=int, default=45, help="Columnas del modelo sintético")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--seconds", type=float, default=1.0, help="Tiempo mínimo por medición")
+    args = parser.parse_args()
+
+    model = load_model(args.model, args.trees, args.depth, args.features)
+    try:
+        engine = CompiledForest.from_sklearn(model)
+    except TypeError as e:
+        print(f"❌ Modelo no soportado: {e}")
+        return
+    print(f"🌲 {type(model).__name__}: {engine.n_trees} árboles, {engine.n_nodes:,} nodos, {engine.n_features} columnas")
+
+    for n_rows in args.sizes:
+        X = engine.probe_rows(n_rows, seed=n_rows)
+        identical = engine.verify(model, X)
+        sklearn_s = timed(model.predict, X, args.seconds)
+        engine_s = timed(engine.predict, X, args.seconds)
+        dispatch_s = timed(lambda rows: predict_rows(model, engine, rows), X, args.seconds)
+        print(f"📦 {n_rows:>6} filas | sklearn {sklearn_s * 1e3:9.3f} ms ({n_rows / sklearn_s:>10,.0f} filas/s) | "
+              f"motor {engine_s * 1e3:9.3f} ms ({n_rows / engine_s:>10,.0f} filas/s) | "
+              f"predict_rows {dispatch_s * 1e3:9.3f} ms | idéntico: {'✅' if identical else '❌'}")
+
+    print(f"ℹ️ predict_rows usa el motor hasta {COMPILED_MAX_ROWS} filas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# tests/bench_vehicles_batching.py
+"""
+Benchmark del micro-batching de detección de vehículos (vehicles/vehicles_service.py).
+
+Simula ``--clients`` requests concurrentes (un hilo por cliente, cada uno envía
+``--requests`` imágenes seguidas a detect_vehicles_in_image) y compara el servicio
+sin agrupar (max_batch_size=1) contra cada configuración de ``--batch-sizes`` y
+``--wait-ms``: throughput (imágenes/s), latencia p50/p95 por request y tamaño medio
+de los lotes ejecutados.
+
+Las imágenes se leen de ``--images`` (.jpg/.png) o se generan con ruido aleatorio.
+
+Uso:
+    python tests/bench_vehicles_batching.py
+    python tests/bench_vehicles_batching.py --images data/vehicle_samples --clients 16 --batch-sizes 4 8 16
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse
+import sys
+import time
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from vehicles.vehicles_service import BATCH_MAX_WAIT_MS, VehicleDetectionService
+
+
+def load_images(folder, n_images, width, height):
+    """Imágenes codificadas como JPEG (lo que recibe el endpoint)"""
+    import cv2
+    if folder:
+        paths = sorted(p for p in Path(folder).iterdir() if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+        return [path.read_bytes() for path in paths[:n_images]]
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(n_images):
+        image = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        images.append(cv2.imencode('.jpg', image)[1].tobytes())
+    return images
+
+
+def run_clients(service, images, clients, requests_per_client):
+    """Latencias de todos los requests (s) y tiempo total"""
+    def client(offset):
+        latencies = []
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            service.detect_vehicles_in_image(images[(offset + i) % len(images)])
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        latencies = [lat for result in executor.map(client, range(clients)) for lat in result]
+    return np.array(latencies), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del micro-batching de YOLO")
+    parser.add_argument("--model", default=str(ROOT / "dl_models" / "modelo_vehiculos.pkl"), help="Modelo YOLO (pickle)")
+    parser.add_argument("--images", default=None, help="Carpeta con imágenes (por defecto: ruido aleatorio)")
+    parser.add_argument("--size", type=int, nargs=2, default=[1280, 720], help="Ancho y alto de las imágenes sintéticas")
+    parser.add_argument("--clients", type=int, default=8, help="Requests concurrentes")
+    parser.add_argument("--requests", type=int, default=10, help="Requests por cliente")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[4, 8], help="max_batch_size a comparar")
+    parser.add_argument("--wait-ms", type=float, nargs="+", default=[BATCH_MAX_WAIT_MS], help="max_wait_ms a comparar")
+    args = parser.parse_args()
+
+    images = load_images(args.images, max(args.clients, 8), *args.size)
+    print(f"🚗 {args.clients} clientes x {args.requests} requests, {len(images)} imágenes distintas")
+
+    configs = [(1, 0.0)] + [(size, wait) for size in args.batch_sizes for wait in args.wait_ms]
+    baseline = None
+    for max_batch_size, max_wait_ms in configs:
+        service = VehicleDetectionService(args.model, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        # Calentamiento: primera inferencia y lotes de cada tamaño
+        run_clients(service, images, min(args.clients, max_batch_size), 1)
+        service.batcher.batches = service.batcher.images = 0
+
+        latencies, elapsed = run_clients(service, images, args.clients, args.requests)
+        throughput = len(latencies) / elapsed
+        baseline = baseline or throughput
+        label = "sin agrupar" if max_batch_size == 1 else f"lote ≤{max_batch_size}, espera {max_wait_ms:g} ms"
+        print(f"📊 {label:>26} | {throughput:7.2f} img/s ({throughput / baseline:4.2f}x) | "
+              f"p50 {np.percentile(latencies, 50) * 1e3:8.1f} ms | p95 {np.percentile(latencies, 95) * 1e3:8.1f} ms | "
+              f"lote medio {service.batcher.average_batch_size:4.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# tests/bench_vehicles_video.py
+"""
+Benchmark de la detección de vehículos en video (vehicles/video_pipeline.py).
+
+Sobre un video de referencia compara, en frames analizados por segundo:
+
+- secuencial, lote 1: decodificar, inferir y post-procesar frame por frame (como antes)
+- secuencial, lote N: inferencia por lotes sin solapar etapas
+- pipeline, lote N: hilo de decodificación + cola acotada + post-proceso solapado
+
+También mide la decodificación sola de los frames muestreados (cota superior de fps)
+y compara los vehículos por frame contra la referencia (con lotes, el letterbox sin
+relleno mínimo puede cambiar levemente alguna detección).
+Sin ``--video`` se genera un video sintético con rectángulos en movimiento.
+
+Uso:
+    python tests/bench_vehicles_video.py
+    python tests/bench_vehicles_video.py --video data/trafico.mp4 --max-frames 100 --batch-sizes 2 4 8
+"""
+from pathlib import Path
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from vehicles.vehicles_service import VehicleDetectionService
+from vehicles.video_reader import SampledVideoReader
+
+
+def make_reference_video(path, n_frames, width, height, fps=30):
+    """Video sintético: fondo gris con rectángulos que cruzan la imagen"""
+    import cv2
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    rng = np.random.default_rng(0)
+    boxes = rng.integers(0, [width, height, 80, 40], (12, 4)) + [0, 0, 60, 30]
+    speeds = rng.integers(2, 12, 12)
+    for i in range(n_frames):
+        frame = np.full((height, width, 3), 90, dtype=np.uint8)
+        for (x, y, w, h), speed in zip(boxes, speeds):
+            x = int((x + speed * i) % width)
+            cv2.rectangle(frame, (x, int(y)), (x + int(w), int(y) + int(h)), (40, 40, 200), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def detections_key(result):
+    return [(f["frame_number"], f["vehicle_count"]) for f in result["detections_per_frame"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de video de YOLO")
+    parser.add_argument("--model", default=str(ROOT / "dl_models" / "modelo_vehiculos.pkl"), help="Modelo YOLO (pickle)")
+    parser.add_argument("--video", default=None, help="Video de referencia (por defecto: sintético)")
+    parser.add_argument("--frames", type=int, default=900, help="Frames del video sintético")
+    parser.add_argument("--size", type=int, nargs=2, default=[1280, 720], help="Ancho y alto del video sintético")
+    parser.add_argument("--max-frames", type=int, default=100, help="Frames analizados")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[4, 8], help="Frames por predict")
+    parser.add_argument("--repeat", type=int, default=2, help="Repeticiones por configuración (se toma la mejor)")
+    args = parser.parse_args()
+
+    temp_path = None
+    video = args.video
+    if video is None:
+        fd, temp_path = tempfile.mkstemp(suffix=".mp4")
+        os.close(fd)
+        make_reference_video(temp_path, args.frames, *args.size)
+        video = temp_path
+
+    try:
+        start = time.perf_counter()
+        with SampledVideoReader(video, args.max_frames) as reader:
+            decoded = sum(1 for _ in reader)
+            total_frames = reader.total_frames
+        decode_fps = decoded / (time.perf_counter() - start)
+        print(f"🎞️ {video}: {total_frames} frames, {decoded} analizados | solo decodificación {decode_fps:7.1f} fps")
+
+        service = VehicleDetectionService(args.model)
+        service.detect_vehicles_in_video(video, min(args.max_frames, 8))  # Calentamiento
+
+        configs = [(1, False)] + [(size, pipelined) for size in args.batch_sizes for pipelined in (False, True)]
+        reference = None
+        baseline = None
+        for batch_size, pipelined in configs:
+            best = np.inf
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                result = service.detect_vehicles_in_video(video, args.max_frames, batch_size=batch_size, pipelined=pipelined)
+                best = min(best, time.perf_counter() - start)
+            fps = result["processed_frames"] / best
+            baseline = baseline or fps
+            reference = reference or detections_key(result)
+            same = detections_key(result) == reference
+            label = f"{'pipeline' if pipelined else 'secuencial'}, lote {batch_size}"
+            print(f"📊 {label:>20} | {fps:7.1f} fps ({fps / baseline:4.2f}x) | "
+                  f"mismos conteos: {'✅' if same else '❌'}")
+    finally:
+        if temp_path is not None:
+            os.unlink(temp_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# tests/test_flights_batch.py
+"""
+Predicción de vuelos en lote (/models/flights/predict-batch): las entradas CSV y NDJSON
+deben dar las mismas predicciones que /models/flights/predict vuelo por vuelo.
+
+Se entrena un Random Forest pequeño con el formato de flight_delay_v1_2025-10-25.pkl
+en un directorio temporal, junto con un DelayedFlights.csv mínimo para el índice de
+rutas (SFO-ORD sin distancia ni duración programada en ningún vuelo).
+
+Uso:
+    python -m pytest tests/test_flights_batch.py -q
+"""
+from pathlib import Path
+import io
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+joblib = pytest.importorskip("joblib")
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestRegressor
+
+from api import constants as const
+from api.routes import flights_api
+
+FEATURE_COLUMNS = ['Month', 'DayofMonth', 'DayOfWeek', 'DepTime', 'CRSDepTime', 'CRSArrTime',
+                   'UniqueCarrier', 'Origin', 'Dest', 'Distance', 'DepDelay']
+
+FLIGHTS = [
+    {"date": "2025-03-01", "departure_time": "07:00", "origin": "LAX", "destination": "JFK", "airline": "AA",
+     "distance": 2475.0, "delay_at_departure": 12.5},
+    {"date": "2025-12-31", "departure_time": "23:59", "origin": "SFO", "destination": "ORD", "airline": "UA",
+     "distance": None, "delay_at_departure": 0},
+    {"date": "2024-02-29", "departure_time": "05:30", "origin": "DEN", "destination": "LAS", "airline": "WN",
+     "distance": 628.0, "delay_at_departure": -3},
+    {"date": "2026-06-15", "departure_time": "12:45", "origin": "JFK", "destination": "LAX", "airline": "DL",
+     "distance": None, "delay_at_departure": 45},
+]
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    models_dir = tmp_path_factory.mktemp("ml_models")
+    rng = np.random.default_rng(0)
+    n = 2000
+    X = pd.DataFrame({
+        'Month': rng.integers(1, 13, n), 'DayofMonth': rng.integers(1, 29, n), 'DayOfWeek': rng.integers(1, 8, n),
+        'DepTime': rng.integers(0, 2400, n), 'CRSDepTime': rng.integers(0, 2400, n),
+        'CRSArrTime': rng.integers(0, 2400, n), 'UniqueCarrier': rng.integers(0, 20, n),
+        'Origin': rng.integers(0, 300, n), 'Dest': rng.integers(0, 300, n),
+        'Distance': rng.integers(50, 3000, n), 'DepDelay': rng.normal(10, 30, n)
+    })[FEATURE_COLUMNS]
+    y = X['DepDelay'] * 0.9 + X['DepTime'] / 200 + rng.normal(0, 10, n)
+    model = RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0).fit(X, y)
+    joblib.dump({'model': model, 'feature_columns': FEATURE_COLUMNS,
+                 'training_info': {'mae': 5.0, 'rmse': 7.0, 'r2_score': 0.9}},
+                models_dir / "flight_delay_v1_2025-10-25.pkl")
+
+    pd.DataFrame({
+        'Origin': ['LAX', 'LAX', 'SFO', 'SFO', 'JFK'], 'Dest': ['JFK', 'JFK', 'ORD', 'ORD', 'LAX'],
+        'Distance': [2475, 2475, np.nan, np.nan, 2475], 'CRSElapsedTime': [330, 320, np.nan, np.nan, 380],
+        'CRSDepTime': [700, 900, 800, 1500, 1000], 'CRSArrTime': [1530, 1720, 1400, 2100, 1320],
+        'ArrDelay': [5, 15, 30, np.nan, -2]
+    }).to_csv(models_dir / "DelayedFlights.csv", index=False)
+
+    patch = pytest.MonkeyPatch()
+    patch.setattr(const, "ML_MODELS_PATH", models_dir)
+    patch.setattr(const, "ROUTE_INDEX_PATH", models_dir / "route_index.npz")
+    patch.setattr(const, "CSV_FLIGHTS_PATH", models_dir / "DelayedFlights.csv")
+    for name, value in (("_loaded_model_data", None), ("_feature_encoder", None), ("_compiled_model", None),
+                        ("_route_index", None), ("_route_index_loaded", False)):
+        patch.setattr(flights_api, name, value)
+    yield TestClient(flights_api.app)
+    patch.undo()
+
+
+def single_predictions(client, flights=FLIGHTS):
+    predictions = []
+    for flight in flights:
+        payload = {"query": "retraso", **{key: value for key, value in flight.items() if value is not None}}
+        response = client.post("/models/flights/predict", json=payload)
+        assert response.status_code == 200, response.text
+        predictions.append(response.json()["prediction"])
+    return np.array(predictions)
+
+
+def test_batch_csv_matches_single(client):
+    body = pd.DataFrame(FLIGHTS).to_csv(index=False)
+    response = client.post("/models/flights/predict-batch", content=body, headers={"content-type": "text/csv"})
+    assert response.status_code == 200, response.text
+    result = pd.read_csv(io.StringIO(response.text))
+    assert result['error'].isna().all()
+    np.testing.assert_allclose(result['prediction'].to_numpy(), single_predictions(client), rtol=1e-9)
+
+
+def test_batch_ndjson_matches_single(client):
+    body = "\n".join(json.dumps(flight) for flight in FLIGHTS)
+    response = client.post("/models/flights/predict-batch", content=body,
+                           headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200, response.text
+    result = [json.loads(line) for line in response.text.splitlines()]
+    assert [row['error'] for row in result] == [None] * len(FLIGHTS)
+    assert [row['departure_time'] for row in result] == [flight['departure_time'] for flight in FLIGHTS]
+    np.testing.assert_allclose([row['prediction'] for row in result], single_predictions(client), rtol=1e-9)
+
+
+def test_route_without_medians_uses_fixed_estimates(client):
+    index = flights_api.load_route_index_data()
+    assert index.route_stats('LAX', 'JFK')['crs_elapsed'] == 325
+    stats = index.route_stats('SFO', 'ORD')
+    assert stats['distance'] is None and stats['crs_elapsed'] is None
+
+    flights = [flight for flight in FLIGHTS if flight['origin'] == 'SFO']
+    with_index = single_predictions(client, flights)
+    assert np.isfinite(with_index).all()
+
+    # Sin índice la ruta usa las mismas estimaciones fijas
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(flights_api, "_route_index", None)
+        np.testing.assert_allclose(single_predictions(client, flights), with_index, rtol=1e-9)
@@ -0,0 +1,69 @@
+# tests/test_tree_engine.py
+"""
+Motor compilado de árboles (api/tree_engine.py): las predicciones deben ser idénticas
+bit a bit a las de scikit-learn, también con modelos ajustados con valores faltantes.
+
+Uso:
+    python -m pytest tests/test_tree_engine.py -q
+"""
+from pathlib import Path
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+
+from api.tree_engine import compile_model, predict_rows
+
+
+def make_data(missing_rate=0.0, n_rows=2000, n_features=6, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.random((n_rows, n_features))
+    y = X @ np.arange(n_features) + rng.normal(0, 0.1, n_rows)
+    if missing_rate:
+        X[rng.random(X.shape) < missing_rate] = np.nan
+    return X, y
+
+
+def assert_identical(engine, model, X):
+    np.testing.assert_array_equal(engine.predict(X).view(np.int64),
+                                  np.asarray(model.predict(X), dtype=np.float64).view(np.int64))
+
+
+@pytest.mark.parametrize("n_jobs", [None, -1])
+def test_compiles_forest_trained_with_missing_values(n_jobs):
+    X, y = make_data(missing_rate=0.2)
+    model = RandomForestRegressor(n_estimators=20, random_state=0, n_jobs=n_jobs).fit(X, y)
+    assert np.isinf(model.estimators_[0].tree_.threshold).any()
+
+    engine = compile_model(model)
+    assert engine is not None
+    assert engine.allow_missing
+    model.n_jobs = None
+    assert_identical(engine, model, X[:300])
+    assert_identical(engine, model, engine.probe_rows(seed=7, missing_rate=0.5))
+
+
+def test_probe_rows_are_finite_unless_missing_requested():
+    X, y = make_data(missing_rate=0.2)
+    engine = compile_model(RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y))
+    assert np.isfinite(engine.probe_rows()).all()
+    assert np.isnan(engine.probe_rows(missing_rate=0.2)).any()
+
+
+def test_model_without_missing_support_keeps_rejecting_nan():
+    X, y = make_data()
+    model = ExtraTreesRegressor(n_estimators=5, random_state=0).fit(X, y)
+    engine = compile_model(model)
+    assert engine is not None
+    assert not engine.allow_missing
+    assert_identical(engine, model, X[:100])
+
+    rows = X[:4].copy()
+    rows[0, 0] = np.nan
+    with pytest.raises(ValueError):
+        predict_rows(model, engine, rows)
@@ -1,25 +1,124 @@
+import os
 import pickle
+import queue
+import threading
 import cv2
 import numpy as np
+from concurrent.futures import Future
 from pathlib import Path
-from typing import List, Tuple, Union
+from typing import Callable, List, Tuple, Union
 from io import BytesIO
 import time
 from datetime import datetime
 
+from vehicles.video_pipeline import VIDEO_BATCH_SIZE, VIDEO_QUEUE_FRAMES, run_video_pipeline
+from vehicles.video_reader import SampledVideoReader, spool_upload_to_file
+
+# Umbrales de detección de YOLO
+CONFIDENCE_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.45
+
+# Micro-batching de imágenes concurrentes: máximo de imágenes por predict y espera
+# máxima (ms) desde la primera imagen del lote antes de ejecutar con las que haya
+BATCH_MAX_SIZE = 8
+BATCH_MAX_WAIT_MS = 5.0
+
+
+class MicroBatcher:
+    """
+    Agrupa imágenes que llegan de requests concurrentes en un solo predict.
+
+    Un hilo trabajador toma la primera imagen pendiente, espera hasta ``max_wait_ms``
+    (o hasta juntar ``max_batch_size``) a que lleguen más, ejecuta ``predict_fn`` una
+    vez con la lista y entrega a cada request su resultado mediante un ``Future``.
+    Con un solo request en vuelo la espera extra es a lo sumo ``max_wait_ms``.
+    """
+
+    def __init__(self, predict_fn: Callable[[List[np.ndarray]], list],
+                 max_batch_size: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        """
+        Args:
+            predict_fn: Recibe una lista de imágenes y retorna un resultado por imagen (mismo orden)
+            max_batch_size: Máximo de imágenes por llamada a ``predict_fn`` (1: sin agrupar)
+            max_wait_ms: Espera máxima para completar un lote
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._pending: "queue.Queue[Tuple[np.ndarray, Future]]" = queue.Queue()
+        self.batches = 0
+        self.images = 0
+        self._worker = threading.Thread(target=self._run, name="vehicles-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, image: np.ndarray) -> Future:
+        """Encola una imagen; el ``Future`` se resuelve con su resultado"""
+        future = Future()
+        self._pending.put((image, future))
+        return future
+
+    def predict(self, image: np.ndarray):
+        """Resultado de una imagen (bloquea hasta que se procese su lote)"""
+        return self.submit(image).result()
+
+    @property
+    def average_batch_size(self) -> float:
+        return self.images / self.batches if self.batches else 0.0
+
+    def _collect(self) -> List[Tuple[np.ndarray, Future]]:
+        batch = [self._pending.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._pending.get(timeout=remaining) if remaining > 0 else self._pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Requests cancelados mientras esperaban no entran al lote
+            batch = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.predict_fn([image for image, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"Se esperaban {len(batch)} resultados, se recibieron {len(results)}")
+            except BaseException as e:
+                # Cualquier error (incluido SystemExit) se entrega a los requests del lote:
+                # el hilo sigue atendiendo la cola
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.images += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
 class VehicleDetectionService:
     """Servicio para detección de vehículos usando YOLO"""
     
-    def __init__(self, model_path: str = None):
+    def __init__(self, model_path: str = None, max_batch_size: int = BATCH_MAX_SIZE,
+                 max_wait_ms: float = BATCH_MAX_WAIT_MS):
         """
         Inicializa el servicio de detección
         
         Args:
             model_path: Ruta al archivo modelo_vehiculos.pkl
+            max_batch_size: Máximo de imágenes concurrentes por predict (1: sin agrupar)
+            max_wait_ms: Espera máxima para agrupar imágenes concurrentes
         """
         self.model = None
         self.model_path = model_path or "dl_models/modelo_vehiculos.pkl"
         self._load_model()
+        # El predictor de ultralytics guarda estado por llamada: una inferencia a la vez
+        # (lotes del MicroBatcher y lotes de video de varios requests)
+        self._predict_lock = threading.Lock()
+        self.batcher = MicroBatcher(self._predict_batch, max_batch_size, max_wait_ms)
         
     def _load_model(self):
         """Carga el modelo YOLO desde el archivo pickle"""
@@ -39,6 +138,35 @@ class VehicleDetectionService:
             print(f"❌ Error cargando modelo de vehículos: {e}")
             raise
     
+    def _predict_batch(self, images: List[np.ndarray]) -> list:
+        """
+        Un solo predict de YOLO para varias imágenes. Ultralytics lleva cada imagen con
+        letterbox al tamaño de entrada del modelo, las apila en un tensor y retorna las
+        cajas en las coordenadas de cada imagen original. Las llamadas se serializan: el
+        modelo no es seguro entre hilos.
+        """
+        with self._predict_lock:
+            return self.model.predict(images, conf=CONFIDENCE_THRESHOLD, iou=IOU_THRESHOLD,
+                                      batch=len(images), verbose=False)
+
+    @staticmethod
+    def _result_to_detections(result) -> List[dict]:
+        """Detecciones de un resultado de YOLO (cajas copiadas a CPU una vez por imagen)"""
+        boxes = result.boxes
+        if len(boxes) == 0:
+            return []
+        xyxy = boxes.xyxy.cpu().numpy().astype(np.float64)
+        confidences = boxes.conf.cpu().numpy().astype(np.float64)
+        class_ids = boxes.cls.cpu().numpy().astype(np.int64)
+        return [
+            {
+                "class_name": result.names[class_id],
+                "confidence": confidence,
+                "bounding_box": {"x1": x1, "y1": y1, "x2": x2, "y2": y2}
+            }
+            for (x1, y1, x2, y2), confidence, class_id in zip(xyxy.tolist(), confidences.tolist(), class_ids.tolist())
+        ]
+
     def detect_vehicles_in_image(self, image_data: Union[bytes, BytesIO, np.ndarray]) -> dict:
         """
         Detecta vehículos en una imagen
@@ -65,35 +193,13 @@ class VehicleDetectionService:
         if image is None:
             raise ValueError("No se pudo leer la imagen")
         
-        # Realizar detección con YOLO
-        results = self.model.predict(image, conf=0.25, iou=0.45)
+        # Detección con YOLO, agrupada con las imágenes de otros requests concurrentes
+        detections = self._result_to_detections(self.batcher.predict(image))
         
-        # Procesar resultados
-        detections = []
+        # Contar por tipo de vehículo
         vehicle_counts = {}
-        
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                # Extraer información de la detección
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                confidence = float(box.conf[0].cpu().numpy())
-                class_id = int(box.cls[0].cpu().numpy())
-                class_name = result.names[class_id]
-                
-                # Contar por tipo de vehículo
-                vehicle_counts[class_name] = vehicle_counts.get(class_name, 0) + 1
-                
-                detections.append({
-                    "class_name": class_name,
-                    "confidence": confidence,
-                    "bounding_box": {
-                        "x1": float(x1),
-                        "y1": float(y1),
-                        "x2": float(x2),
-                        "y2": float(y2)
-                    }
-                })
+        for det in detections:
+            vehicle_counts[det["class_name"]] = vehicle_counts.get(det["class_name"], 0) + 1
         
         processing_time = (time.time() - start_time) * 1000  # en ms
         
@@ -108,95 +214,61 @@ class VehicleDetectionService:
             }
         }
     
-    def detect_vehicles_in_video(self, video_data: bytes, max_frames: int = 30) -> dict:
+    def detect_vehicles_in_video(self, video: Union[bytes, str], max_frames: int = 30,
+                                 batch_size: int = VIDEO_BATCH_SIZE, pipelined: bool = True) -> dict:
         """
         Detecta vehículos en un video
         
         Args:
-            video_data: Datos del video en bytes
+            video: Ruta del video (p.ej. la subida copiada con spool_upload_to_file) o sus bytes
             max_frames: Máximo número de frames a procesar
+            batch_size: Frames por predict de YOLO
+            pipelined: Decodificación, inferencia y post-proceso en paralelo (False: en secuencia)
             
         Returns:
             Dict con detecciones por frame y estadísticas
         """
         start_time = time.time()
         
-        # Guardar video temporalmente
-        temp_video_path = f"data/temp_video_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
-        Path("data").mkdir(exist_ok=True)
-        
-        with open(temp_video_path, 'wb') as f:
-            f.write(video_data)
-        
-        # Abrir video
-        cap = cv2.VideoCapture(temp_video_path)
-        
-        if not cap.isOpened():
-            raise ValueError("No se pudo abrir el video")
-        
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        
-        # Calcular intervalo para procesar max_frames distribuidos uniformemente
-        frame_interval = max(1, total_frames // max_frames)
-        
-        detections_per_frame = []
-        all_vehicle_counts = {}
-        frame_count = 0
-        processed_count = 0
+        # Con bytes se escribe un archivo temporal único (OpenCV necesita una ruta)
+        temp_video_path = None
+        if isinstance(video, (bytes, bytearray)):
+            temp_video_path = spool_upload_to_file(BytesIO(video))
+            video = temp_video_path
         
-        while cap.isOpened() and processed_count < max_frames:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Procesar solo frames en el intervalo
-            if frame_count % frame_interval == 0:
-                # Detectar vehículos en el frame
-                results = self.model.predict(frame, conf=0.25, iou=0.45, verbose=False)
-                
-                frame_detections = []
-                for result in results:
-                    boxes = result.boxes
-                    for box in boxes:
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        confidence = float(box.conf[0].cpu().numpy())
-                        class_id = int(box.cls[0].cpu().numpy())
-                        class_name = result.names[class_id]
-                        
-                        # Contar vehículos
-                        all_vehicle_counts[class_name] = all_vehicle_counts.get(class_name, 0) + 1
-                        
-                        frame_detections.append({
-                            "class_name": class_name,
-                            "confidence": confidence,
-                            "bounding_box": {
-                                "x1": float(x1),
-                                "y1": float(y1),
-                                "x2": float(x2),
-                                "y2": float(y2)
-                            }
-                        })
+        try:
+            with SampledVideoReader(str(video), max_frames) as reader:
+                total_frames = reader.total_frames
                 
-                detections_per_frame.append({
-                    "frame_number": frame_count,
-                    "timestamp_seconds": frame_count / fps if fps > 0 else 0,
-                    "detections": frame_detections,
-                    "vehicle_count": len(frame_detections)
-                })
+                def summarize_frame(frame_number: int, result) -> dict:
+                    frame_detections = self._result_to_detections(result)
+                    return {
+                        "frame_number": frame_number,
+                        "timestamp_seconds": reader.timestamp(frame_number),
+                        "detections": frame_detections,
+                        "vehicle_count": len(frame_detections)
+                    }
                 
-                processed_count += 1
-            
-            frame_count += 1
-        
-        cap.release()
-        
-        # Limpiar archivo temporal
-        try:
-            Path(temp_video_path).unlink()
-        except:
-            pass
+                # Solo se decodifican los frames muestreados; se infieren por lotes
+                detections_per_frame = run_video_pipeline(
+                    reader, self._predict_batch, summarize_frame,
+                    batch_size=batch_size, queue_frames=VIDEO_QUEUE_FRAMES, pipelined=pipelined
+                )
+        finally:
+            # Limpiar archivo temporal
+            if temp_video_path is not None:
+                try:
+                    os.unlink(temp_video_path)
+                except OSError:
+                    pass
+        
+        # Contar vehículos
+        all_vehicle_counts = {}
+        for frame in detections_per_frame:
+            for det in frame["detections"]:
+                all_vehicle_counts[det["class_name"]] = all_vehicle_counts.get(det["class_name"], 0) + 1
         
+        processed_count = len(detections_per_frame)
         processing_time = (time.time() - start_time) * 1000
         
         # Calcular estadísticas
@@ -276,12 +348,15 @@ class VehicleDetectionService:
         return str(filepath)
 
 
-# Instancia global del servicio
+# Instancia global del servicio (los requests la piden desde hilos del threadpool)
 _vehicle_service = None
+_vehicle_service_lock = threading.Lock()
 
 def get_vehicle_service() -> VehicleDetectionService:
     """Obtiene la instancia del servicio de detección de vehículos"""
     global _vehicle_service
     if _vehicle_service is None:
-        _vehicle_service = VehicleDetectionService()
+        with _vehicle_service_lock:
+            if _vehicle_service is None:
+                _vehicle_service = VehicleDetectionService()
     return _vehicle_service
@@ -0,0 +1,157 @@
+"""
+Pipeline de detección en video: decodificación, inferencia por lotes y post-proceso en paralelo
+
+    hilo de decodificación --(cola acotada de frames)--> inferencia por lotes (hilo que llama)
+                                                              |
+                                              post-proceso del lote anterior (otro hilo)
+
+- La decodificación corre en su propio hilo y deja los frames en una cola de a lo sumo
+  ``queue_frames`` elementos: si la inferencia es más lenta, el hilo se bloquea
+  (backpressure) y la memoria queda acotada a ``queue_frames`` + dos lotes de frames.
+- La inferencia toma hasta ``batch_size`` frames de la cola (sin esperar a completar el
+  lote si la cola está vacía) y hace un solo predict.
+- El post-proceso de un lote (cajas a CPU y a diccionarios) corre mientras se infiere el
+  siguiente; como máximo hay un lote pendiente de post-proceso.
+
+OpenCV y PyTorch liberan el GIL durante la decodificación y la inferencia, así que las
+tres etapas usan núcleos distintos.
+"""
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Frames por predict y frames decodificados que pueden esperar en la cola
+VIDEO_BATCH_SIZE = 4
+VIDEO_QUEUE_FRAMES = 8
+
+_END = object()
+
+
+class _FrameProducer:
+    """Hilo que recorre los frames y los deja en una cola acotada"""
+
+    def __init__(self, frames: Iterable[Tuple[int, np.ndarray]], queue_frames: int):
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_frames))
+        self.error: Optional[BaseException] = None
+        self._stop = threading.Event()
+        self._frames = frames
+        self._thread = threading.Thread(target=self._run, name="vehicles-video-decode", daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        # Espera con timeout para poder cortar si el consumidor terminó con error
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            for item in self._frames:
+                if not self._put(item):
+                    return
+        except BaseException as e:
+            self.error = e
+        finally:
+            self._put(_END)
+
+    def batches(self, batch_size: int) -> Iterable[List[Tuple[int, np.ndarray]]]:
+        """Lotes de hasta ``batch_size`` frames en orden"""
+        finished = False
+        while not finished:
+            item = self.queue.get()
+            if item is _END:
+                break
+            batch = [item]
+            while len(batch) < batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _END:
+                    finished = True
+                    break
+                batch.append(item)
+            yield batch
+        self._raise_error()
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def stop(self):
+        self._stop.set()
+        # Desbloquear al productor si está esperando lugar en la cola
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self._thread.join()
+
+
+def run_video_pipeline(frames: Iterable[Tuple[int, np.ndarray]],
+                       predict_batch: Callable[[List[np.ndarray]], list],
+                       postprocess: Callable[[int, object], dict],
+                       batch_size: int = VIDEO_BATCH_SIZE,
+                       queue_frames: int = VIDEO_QUEUE_FRAMES,
+                       pipelined: bool = True) -> List[dict]:
+    """
+    Procesa los frames de un video por lotes.
+
+    Args:
+        frames: Iterable de (número de frame, imagen), p.ej. un ``SampledVideoReader``
+        predict_batch: Recibe una lista de imágenes y retorna un resultado por imagen
+        postprocess: Recibe (número de frame, resultado) y retorna el resumen del frame
+        batch_size: Máximo de frames por llamada a ``predict_batch``
+        queue_frames: Máximo de frames decodificados esperando la inferencia
+        pipelined: False ejecuta las etapas en secuencia en el hilo que llama (referencia)
+
+    Returns:
+        Resúmenes de los frames en orden
+    """
+    batch_size = max(1, batch_size)
+    if not pipelined:
+        outputs = []
+        batch = []
+        for item in frames:
+            batch.append(item)
+            if len(batch) == batch_size:
+                outputs.extend(_process_batch(batch, predict_batch(_images(batch)), postprocess))
+                batch = []
+        if batch:
+            outputs.extend(_process_batch(batch, predict_batch(_images(batch)), postprocess))
+        return outputs
+
+    producer = _FrameProducer(frames, queue_frames)
+    outputs: List[dict] = []
+    pending: Optional[Future] = None
+    try:
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="vehicles-video-post") as post_executor:
+            for batch in producer.batches(batch_size):
+                results = predict_batch(_images(batch))
+                # A lo sumo un lote esperando post-proceso: se recoge el anterior antes de encolar este
+                if pending is not None:
+                    outputs.extend(pending.result())
+                pending = post_executor.submit(_process_batch, batch, results, postprocess)
+            if pending is not None:
+                outputs.extend(pending.result())
+    finally:
+        producer.stop()
+    return outputs
+
+
+def _images(batch: List[Tuple[int, np.ndarray]]) -> List[np.ndarray]:
+    return [frame for _, frame in batch]
+
+
+def _process_batch(batch: List[Tuple[int, np.ndarray]], results: list, postprocess) -> List[dict]:
+    if len(results) != len(batch):
+        raise RuntimeError(f"Se esperaban {len(batch)} resultados, se recibieron {len(results)}")
+    return [postprocess(frame_number, result) for (frame_number, _), result in zip(batch, results)]
@@ -0,0 +1,117 @@
+"""
+Lectura de videos subidos para la detección de vehículos
+
+- ``spool_upload_to_file``: copia la subida por bloques a un archivo temporal con
+  nombre único (OpenCV necesita una ruta), sin cargar el video completo en memoria.
+- ``SampledVideoReader``: entrega solo los frames muestreados (a lo sumo ``max_frames``
+  repartidos uniformemente). Los frames intermedios no se convierten a imagen: con
+  saltos cortos se avanzan con ``grab()`` y con saltos largos se busca el frame
+  directamente (``CAP_PROP_POS_FRAMES``), de modo que el costo depende de ``max_frames``
+  y no de la duración del video.
+"""
+import os
+import shutil
+import tempfile
+from typing import IO, Iterator, List, Tuple
+
+import cv2
+import numpy as np
+
+# Tamaño de los bloques copiados desde la subida
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+# Desde cuántos frames salteados conviene buscar el siguiente frame en vez de avanzar
+# con grab(): la búsqueda salta al keyframe previo y decodifica desde ahí, así que solo
+# gana cuando el salto es mayor que el intervalo típico entre keyframes (~2 s)
+SEEK_MIN_GAP = 60
+
+
+def spool_upload_to_file(source: IO[bytes], suffix: str = ".mp4") -> str:
+    """
+    Copia la subida (p.ej. ``UploadFile.file``) a un archivo temporal único.
+
+    Returns:
+        Ruta del archivo; quien llama debe borrarlo
+    """
+    source.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="vehicles_video_", suffix=suffix, delete=False) as spool:
+        try:
+            shutil.copyfileobj(source, spool, SPOOL_CHUNK_SIZE)
+        except BaseException:
+            spool.close()
+            os.unlink(spool.name)
+            raise
+        return spool.name
+
+
+def sample_frame_indices(total_frames: int, max_frames: int) -> List[int]:
+    """Frames a analizar: cada ``total_frames // max_frames`` frames, a lo sumo ``max_frames``"""
+    frame_interval = max(1, total_frames // max_frames)
+    return list(range(0, total_frames, frame_interval))[:max_frames]
+
+
+class SampledVideoReader:
+    """Frames muestreados de un video, decodificando solo los que se analizan"""
+
+    def __init__(self, video_path: str, max_frames: int, seek_min_gap: int = SEEK_MIN_GAP):
+        """
+        Args:
+            video_path: Ruta del video
+            max_frames: Máximo de frames a entregar
+            seek_min_gap: Frames salteados desde los cuales se busca en vez de usar grab()
+        """
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise ValueError("No se pudo abrir el video")
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.max_frames = max_frames
+        self.seek_min_gap = seek_min_gap
+        self.decoded_frames = 0
+        self.skipped_frames = 0
+        self.seeks = 0
+
+    def timestamp(self, frame_number: int) -> float:
+        return frame_number / self.fps if self.fps > 0 else 0
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """(número de frame, imagen BGR) de cada frame muestreado"""
+        if self.total_frames <= 0:
+            # Sin cantidad de frames conocida: los primeros max_frames
+            targets = range(self.max_frames)
+        else:
+            targets = sample_frame_indices(self.total_frames, self.max_frames)
+
+        position = 0  # Próximo frame que entrega read()/grab()
+        can_seek = True
+        for target in targets:
+            gap = target - position
+            if can_seek and gap >= self.seek_min_gap:
+                can_seek = self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                if can_seek:
+                    self.seeks += 1
+                    position = target
+                    gap = 0
+            # Saltos cortos (o sin búsqueda): avanzar sin convertir los frames a imagen
+            while gap > 0:
+                if not self.cap.grab():
+                    return
+                self.skipped_frames += 1
+                position += 1
+                gap -= 1
+
+            ret, frame = self.cap.read()
+            if not ret:
+                return
+            self.decoded_frames += 1
+            position += 1
+            yield target, frame
+
+    def close(self):
+        self.cap.release()
+
+    def __enter__(self) -> "SampledVideoReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()